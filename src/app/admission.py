@@ -0,0 +1,204 @@
+# app/admission.py
+"""
+Admission control cho /chat: mỗi lượt chat có thể kéo theo vài lời gọi OpenAI, nên
+một đợt burst không được phép dùng hết rate limit OpenAI của mọi người dùng.
+
+- Token bucket theo thread_id (CHAT_THREAD_RATE lượt/s, burst CHAT_THREAD_BURST) và
+  theo IP (CHAT_IP_RATE, CHAT_IP_BURST) → vượt quá: 429 + Retry-After.
+- Tối đa CHAT_MAX_CONCURRENCY lượt chạy đồng thời mỗi worker; lượt đến sau xếp hàng
+  FIFO tối đa CHAT_QUEUE_MAX, chờ tối đa CHAT_QUEUE_TIMEOUT_S → hàng đầy / chờ quá
+  lâu: 503 + Retry-After (ước lượng từ thời gian xử lý gần đây).
+
+chat_api gọi `check_rate` khi request đến, còn `slot()` chỉ sau khi lượt đã qua hàng chờ
+của thread (thread_turns.py): lượt đang chờ lượt trước của cùng hội thoại không giữ slot.
+
+Lượt bị từ chối trả lời ngay thay vì làm chậm mọi lượt khác, nên throughput khi quá
+tải đi ngang ở mức CHAT_MAX_CONCURRENCY thay vì sụp. Rate = 0 tắt giới hạn tương ứng.
+Giới hạn tính theo từng worker process. Số liệu: `GET /metrics/admission`.
+
+Lưu ý: endpoint /chat là sync (chạy trong threadpool của FastAPI, mặc định 40 thread),
+nên CHAT_MAX_CONCURRENCY + CHAT_QUEUE_MAX nên nhỏ hơn số thread đó.
+"""
+
+from __future__ import annotations
+import os
+import math
+import time
+import threading
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+CHAT_THREAD_RATE = float(os.getenv("CHAT_THREAD_RATE", "1"))
+CHAT_THREAD_BURST = float(os.getenv("CHAT_THREAD_BURST", "5"))
+CHAT_IP_RATE = float(os.getenv("CHAT_IP_RATE", "10"))
+CHAT_IP_BURST = float(os.getenv("CHAT_IP_BURST", "30"))
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+CHAT_QUEUE_MAX = int(os.getenv("CHAT_QUEUE_MAX", "16"))
+CHAT_QUEUE_TIMEOUT_S = float(os.getenv("CHAT_QUEUE_TIMEOUT_S", "2"))
+# Số bucket giữ trong bộ nhớ (LRU) cho mỗi loại key
+CHAT_RATE_MAX_KEYS = int(os.getenv("CHAT_RATE_MAX_KEYS", "10000"))
+ADMISSION_METRICS_WINDOW = int(os.getenv("ADMISSION_METRICS_WINDOW", "500"))
+
+
+class AdmissionRejected(Exception):
+    """Lượt chat bị từ chối: status 429 (rate limit) hoặc 503 (quá tải)."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """Token bucket cho mỗi key (rate token/s, tối đa burst token), LRU theo key."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = CHAT_RATE_MAX_KEYS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, updated]
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> Optional[float]:
+        """Lấy một token; None nếu được phép, ngược lại số giây đến khi có token."""
+        if self.rate <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None) or [self.burst, now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return None
+            return (1.0 - bucket[0]) / self.rate
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int = CHAT_MAX_CONCURRENCY, queue_max: int = CHAT_QUEUE_MAX,
+                 queue_timeout: float = CHAT_QUEUE_TIMEOUT_S):
+        self.max_concurrency = max_concurrency
+        self.queue_max = queue_max
+        self.queue_timeout = queue_timeout
+        self.thread_buckets = TokenBuckets(CHAT_THREAD_RATE, CHAT_THREAD_BURST)
+        self.ip_buckets = TokenBuckets(CHAT_IP_RATE, CHAT_IP_BURST)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: deque = deque()  # threading.Event của các lượt đang xếp hàng, FIFO
+        self._max_queue_depth = 0
+        self._service: deque = deque(maxlen=ADMISSION_METRICS_WINDOW)  # thời gian xử lý (s)
+        self._waits: deque = deque(maxlen=ADMISSION_METRICS_WINDOW)    # thời gian chờ trong hàng (s)
+        self.counts: Counter = Counter()
+
+    def _retry_after_overload(self) -> float:
+        # Thời gian ước lượng để hàng đợi hiện tại được xử lý hết
+        with self._lock:
+            service = sum(self._service) / len(self._service) if self._service else 1.0
+            depth = len(self._waiters)
+        return max(1.0, service * (depth + 1) / max(1, self.max_concurrency))
+
+    def _reject(self, status_code: int, reason: str, retry_after: float) -> AdmissionRejected:
+        with self._lock:
+            self.counts["rejected"] += 1
+            self.counts[f"rejected_{reason}"] += 1
+        print(f"⚠️ Chat rejected ({status_code} {reason}), retry after {retry_after:.1f}s")
+        return AdmissionRejected(status_code, reason, retry_after)
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._in_flight < self.max_concurrency and not self._waiters:
+                self._in_flight += 1
+                return
+            full = len(self._waiters) >= self.queue_max
+            if not full:
+                waiter = threading.Event()
+                self._waiters.append(waiter)
+                self.counts["queued"] += 1
+                self._max_queue_depth = max(self._max_queue_depth, len(self._waiters))
+        if full:
+            raise self._reject(503, "queue_full", self._retry_after_overload())
+        started = time.monotonic()
+        if not waiter.wait(self.queue_timeout):
+            with self._lock:
+                # Slot có thể vừa được nhường đúng lúc hết giờ
+                timed_out = not waiter.is_set()
+                if timed_out:
+                    self._waiters.remove(waiter)
+            if timed_out:
+                raise self._reject(503, "queue_timeout", self._retry_after_overload())
+        with self._lock:
+            self._waits.append(time.monotonic() - started)
+
+    def _release(self, duration: float) -> None:
+        with self._lock:
+            self._service.append(duration)
+            if self._waiters:
+                self._waiters.popleft().set()  # nhường slot cho lượt chờ lâu nhất, in_flight giữ nguyên
+            else:
+                self._in_flight -= 1
+
+    def check_rate(self, thread_id: Optional[str], client_ip: Optional[str]) -> None:
+        """Lấy token của IP và của thread; raise AdmissionRejected (429) nếu hết."""
+        retry_after = self.ip_buckets.take(client_ip or "unknown")
+        if retry_after is not None:
+            raise self._reject(429, "rate_ip", retry_after)
+        retry_after = self.thread_buckets.take(thread_id or f"ip:{client_ip}")
+        if retry_after is not None:
+            raise self._reject(429, "rate_thread", retry_after)
+
+    @contextmanager
+    def admit(self, thread_id: Optional[str], client_ip: Optional[str]) -> Iterator[None]:
+        """Kiểm tra rate limit rồi giữ một slot trong suốt lượt chat; raise AdmissionRejected nếu bị từ chối."""
+        self.check_rate(thread_id, client_ip)
+        with self.slot():
+            yield
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Giữ một slot chạy (xếp hàng FIFO nếu hết); raise AdmissionRejected (503) nếu hàng đầy / chờ quá lâu."""
+        self._acquire()
+        with self._lock:
+            self.counts["admitted"] += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            service = sorted(self._service)
+            ms = lambda values, q: round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 1) if values else None
+            return {
+                "max_concurrency": self.max_concurrency,
+                "queue_max": self.queue_max,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiters),
+                "max_queue_depth": self._max_queue_depth,
+                **self.counts,
+                "queue_wait_p50_ms": ms(waits, 0.5), "queue_wait_p95_ms": ms(waits, 0.95),
+                "service_p50_ms": ms(service, 0.5), "service_p95_ms": ms(service, 0.95),
+            }
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
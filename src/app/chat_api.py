@@ -1,17 +1,39 @@
 # app/chat_api.py
 from __future__ import annotations
-from fastapi import FastAPI
+import os
+import time
+from fastapi import FastAPI, HTTPException, Header, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
 
 from langchain_core.messages import HumanMessage
-from src.orchestrator import app_graph  # đã compile sẵn với memory
+from src.orchestrator.graph import CHECKPOINT_BACKEND, compile_graph
+from src.orchestrator.budget import turn_config
+from src.orchestrator.rag_faq import get_faq_rag, reload_faq, start_faq_reload, start_faq_watcher, faq_status
+from src.orchestrator.media.attachments import AttachmentError, MEDIA_MAX_BYTES
+from src.orchestrator.media.store import MediaTooLarge, get_media_store, store_inline_attachments
+from src.libs.llm_gateway import get_llm_gateway
+from src.libs.single_flight import single_flight_metrics
+from src.orchestrator.model_router import get_model_router
+from src.app.admission import AdmissionRejected, get_admission, retry_after_header
+from src.app.thread_turns import get_thread_turns, turn_fingerprint
+from src.app.warmup import WARMUP_ON_STARTUP, readiness, start_warmup
+
+FAQ_SEARCH_MAX_QUERIES = int(os.getenv("FAQ_SEARCH_MAX_QUERIES", "1000"))
+MEDIA_MAX_FILES = int(os.getenv("MEDIA_MAX_FILES", "5"))
+# Nếu đặt, các endpoint /admin/* yêu cầu header X-Admin-Token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 app = FastAPI(title="Chat Orchestrator API")
+app_graph = compile_graph()  # compile một lần mỗi worker, kèm checkpointer
 
 class ChatIn(BaseModel):
     message: str
     thread_id: Optional[str] = "demo1"
+    # Handle media:// (từ /chat/upload), URL hoặc data URL/base64 (sẽ được chuyển vào media store)
+    attachments: Optional[List[str]] = None
+    media_type: Optional[str] = None  # image | audio (trống = tự nhận diện)
 
 class ChatOut(BaseModel):
     reply: str
@@ -22,18 +44,115 @@ class ChatOut(BaseModel):
     trip_id: Optional[str] = None
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    # Bước bị giảm cấp để trả lời trong TURN_BUDGET_S (vd "extract_heuristic", "faq_lexical", "availability_cached")
+    degradations: List[str] = []
+
+class FAQReloadIn(BaseModel):
+    csv_path: Optional[str] = None
+    force: bool = False
+    wait: bool = False
+
+class FAQSearchIn(BaseModel):
+    queries: List[str]
+    top_k: int = 3
+
+class FAQMatch(BaseModel):
+    faq_index: int
+    similarity: float
+    source: str
+    question: str
+    answer: str
+
+class FAQSearchOut(BaseModel):
+    results: List[List[FAQMatch]]
+
+@app.on_event("startup")
+def start_background_tasks():
+    # Theo dõi faq_data.csv + phiên bản do worker khác publish để hot reload
+    start_faq_watcher()
+    # Nạp trước FAQ index, cache, kết nối... ở background; /ready báo khi xong
+    if WARMUP_ON_STARTUP:
+        start_warmup(app_graph)
+
+@app.middleware("http")
+async def stamp_arrival(request: Request, call_next):
+    # Budget của lượt chat tính từ lúc request đến: gồm cả upload, xếp hàng admission và chờ lượt trước
+    request.state.received_at = time.time()
+    return await call_next(request)
+
+def _check_admin(token: Optional[str]):
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Sai admin token")
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "pid": os.getpid(), "checkpoint_backend": CHECKPOINT_BACKEND}
 
-@app.post("/chat", response_model=ChatOut)
-def chat(body: ChatIn):
-    # Giữ “tiến trình hội thoại” theo thread_id
-    config = {"configurable": {"thread_id": body.thread_id or "default"}}
+@app.get("/ready")
+def ready():
+    # 200 khi worker đã warmup xong (các bước bắt buộc), 503 + báo cáo từng bước nếu chưa
+    is_ready, report = readiness()
+    body = {"pid": os.getpid(), **report}
+    return body if is_ready else JSONResponse(status_code=503, content=body, headers={"Retry-After": "2"})
+
+@app.post("/admin/warmup")
+def admin_warmup(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    return {"started": start_warmup(app_graph, force=True), **readiness()[1]}
+
+@app.get("/metrics/llm")
+def llm_metrics():
+    # Độ trễ p50/p95/p99, lỗi/timeout/retry/hedge và trạng thái circuit breaker (theo worker process)
+    # + quyết định định tuyến model (fast/strong/escalated) và độ trễ/chi phí theo model
+    return {"pid": os.getpid(), **get_llm_gateway().metrics(), "routing": get_model_router().metrics()}
+
+@app.get("/metrics/coalescing")
+def coalescing_metrics():
+    # Single-flight: số lookup FAQ/chỗ trống trùng nhau đã được gộp vào một lời gọi (theo worker process)
+    return {"pid": os.getpid(), **single_flight_metrics()}
+
+@app.get("/metrics/admission")
+def admission_metrics():
+    # Số lượt đang chạy / đang xếp hàng, số lượt bị từ chối theo lý do (theo worker process)
+    return {"pid": os.getpid(), **get_admission().metrics(), "threads": get_thread_turns().metrics()}
 
-    # Gửi message người dùng vào graph
-    out = app_graph.invoke({"messages": [HumanMessage(content=body.message)]}, config)
+def _run_chat(message: str, thread_id: Optional[str], attachments: List[str], media_type: Optional[str],
+              received_at: Optional[float] = None) -> ChatOut:
+    # Các lượt cùng thread_id chạy lần lượt (không tranh nhau checkpoint); lượt gửi trùng
+    # trong CHAT_DEDUP_WINDOW_S trả lại kết quả của lượt đầu thay vì chạy graph lần nữa.
+    # Chờ lượt trước và gộp lượt trùng xong mới lấy slot admission: lượt chỉ đang chờ
+    # không giữ slot của các hội thoại khác.
+    thread_id = thread_id or "default"
+    turns = get_thread_turns()
+    fingerprint = turn_fingerprint(message, attachments, media_type)
+    with turns.serialize(thread_id):
+        recent = turns.recent(thread_id, fingerprint)
+        if recent is not None:
+            return ChatOut(**recent)
+        with get_admission().slot():
+            try:
+                attachments = store_inline_attachments(attachments)
+            except AttachmentError as e:
+                raise _attachment_error(e)
+            out = _invoke_graph(message, thread_id, attachments, media_type, received_at)
+        turns.remember(thread_id, fingerprint, out.model_dump())
+        return out
+
+def _invoke_graph(message: str, thread_id: str, attachments: List[str], media_type: Optional[str],
+                  received_at: Optional[float] = None) -> ChatOut:
+    # Giữ “tiến trình hội thoại” theo thread_id; mỗi lượt có deadline TURN_BUDGET_S tính từ lúc request đến
+    config = turn_config(thread_id, started_at=received_at)
+
+    # Gửi message người dùng vào graph. State chỉ giữ handle của media (không giữ bytes),
+    # và media của lượt trước được xóa để không xử lý lại.
+    out = app_graph.invoke({
+        "messages": [HumanMessage(content=message)],
+        "attachments": attachments,
+        "media_type": media_type,
+        "media_text": None,
+        "structured_entities": None,
+        "degradations": None,
+    }, config)
 
     # Lấy câu trả lời cuối cùng (được LangGraph + LLM tạo ở node tương ứng)
     reply = ""
@@ -48,4 +167,83 @@ def chat(body: ChatIn):
         trip_id=out.get("trip_id"),
         result=out.get("result"),
         error=out.get("error"),
+        degradations=out.get("degradations") or [],
     )
+
+def _attachment_error(e: AttachmentError) -> HTTPException:
+    return HTTPException(status_code=413 if isinstance(e, MediaTooLarge) else 400, detail=str(e))
+
+def _admission_error(e: AdmissionRejected) -> HTTPException:
+    detail = {
+        409: "Tin nhắn trước của hội thoại này vẫn đang được xử lý",
+        429: "Bạn gửi tin nhắn quá nhanh, vui lòng thử lại sau",
+    }.get(e.status_code, "Hệ thống đang quá tải, vui lòng thử lại sau")
+    return HTTPException(status_code=e.status_code, detail=f"{detail} ({e.reason})", headers=retry_after_header(e.retry_after))
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def _received_at(request: Request) -> float:
+    return getattr(request.state, "received_at", None) or time.time()
+
+@app.post("/chat", response_model=ChatOut)
+def chat(body: ChatIn, request: Request):
+    if len(body.attachments or []) > MEDIA_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Tối đa {MEDIA_MAX_FILES} file mỗi tin nhắn")
+    try:
+        get_admission().check_rate(body.thread_id, _client_ip(request))
+        return _run_chat(body.message, body.thread_id, body.attachments or [], body.media_type, _received_at(request))
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+
+@app.post("/chat/upload", response_model=ChatOut)
+def chat_upload(
+    request: Request,
+    message: str = Form(""),
+    thread_id: Optional[str] = Form("demo1"),
+    media_type: Optional[str] = Form(None),
+    files: List[UploadFile] = File(...),
+):
+    # Multipart: file được ghi từng khúc vào media store (giới hạn MEDIA_MAX_BYTES/file),
+    # graph chỉ nhận handle media://<sha256>
+    if int(request.headers.get("content-length") or 0) > MEDIA_MAX_BYTES * MEDIA_MAX_FILES + 64 * 1024:
+        raise HTTPException(status_code=413, detail="Request quá lớn")
+    if len(files) > MEDIA_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Tối đa {MEDIA_MAX_FILES} file mỗi tin nhắn")
+    try:
+        get_admission().check_rate(thread_id, _client_ip(request))
+        store = get_media_store()
+        try:
+            handles = [store.put_stream(f.file, f.content_type, f.filename) for f in files]
+        except AttachmentError as e:
+            raise _attachment_error(e)
+        finally:
+            for f in files:
+                f.file.close()
+        return _run_chat(message, thread_id, handles, media_type, _received_at(request))
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+
+
+@app.post("/faq/search", response_model=FAQSearchOut)
+def faq_search(body: FAQSearchIn):
+    # Batch: một lần gọi embeddings + một lần truy vấn vector cho cả danh sách
+    if len(body.queries) > FAQ_SEARCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"Tối đa {FAQ_SEARCH_MAX_QUERIES} câu hỏi mỗi request")
+    if not 1 <= body.top_k <= 20:
+        raise HTTPException(status_code=422, detail="top_k phải trong khoảng 1..20")
+    matches = get_faq_rag().search_many(body.queries, top_k=body.top_k)
+    return FAQSearchOut(results=[[FAQMatch(**m) for m in per_query] for per_query in matches])
+
+@app.post("/admin/faq/reload")
+def admin_faq_reload(body: FAQReloadIn, x_admin_token: Optional[str] = Header(None)):
+    # Build index mới ở background rồi swap; request FAQ đang chạy vẫn dùng bản cũ
+    _check_admin(x_admin_token)
+    if body.wait:
+        return reload_faq(body.csv_path, force=body.force)
+    return start_faq_reload(body.csv_path, force=body.force)
+
+@app.get("/admin/faq/status")
+def admin_faq_status(x_admin_token: Optional[str] = Header(None)):
+    _check_admin(x_admin_token)
+    return faq_status()
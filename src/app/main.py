@@ -2,6 +2,7 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from datetime import datetime
 from src.services.booking_sqlite import BookingServiceSQL
+from src.libs.single_flight import get_single_flight, single_flight_metrics
 
 app = FastAPI(title="Mock Booking API (SQLite)")
 svc = BookingServiceSQL("src/data/mock.db")
@@ -72,7 +73,10 @@ def get_available_trips(route_from: str, route_to: str, date: str):
         Danh sách các chuyến khả dụng với thông tin chi tiết
     """
     try:
-        trips = svc.get_available_trips(route_from, route_to, date)
+        # Nhiều request cùng tuyến/ngày đến cùng lúc dùng chung một truy vấn SQLite
+        trips = get_single_flight("trips_available").do(
+            (route_from, route_to, date), lambda: svc.get_available_trips(route_from, route_to, date)
+        )
         return {
             "route_from": route_from,
             "route_to": route_to,
@@ -83,6 +87,10 @@ def get_available_trips(route_from: str, route_to: str, date: str):
     except Exception as e:
         raise HTTPException(400, f"Error getting available trips: {str(e)}")
 
+@app.get("/metrics/coalescing")
+def coalescing_metrics():
+    return single_flight_metrics()
+
 @app.post("/change-time")
 def change_time(body: ChangeIn):
     # Thực tế: bạn có thể gọi /candidates trước cho UI, ở đây coi như đã chọn trip_id
@@ -0,0 +1,143 @@
+# app/thread_turns.py
+"""
+Tuần tự hóa các lượt chat của cùng một hội thoại (thread_id).
+
+Hai request /chat cùng thread_id chạy song song (bấm gửi 2 lần, client retry) sẽ
+cùng đọc một checkpoint, cùng phân loại bằng LLM rồi ghi đè kết quả của nhau — có
+thể gọi booking API (đổi/hủy vé) hai lần. Vì vậy:
+
+- Mỗi thread_id có một lock trong process; các thread khác nhau vẫn chạy song song.
+  Với `CHECKPOINT_BACKEND=sqlite` (mọi worker dùng chung checkpoint) còn giữ thêm
+  lease `turn:<thread_id>` trong SharedCache để tuần tự hóa giữa các worker; lease
+  được gia hạn suốt lượt chạy, TTL chỉ giới hạn thời gian một worker chết giữ nó.
+- Việc chờ lock và gộp lượt trùng diễn ra trước admission (chat_api): lượt đang chờ
+  không chiếm slot CHAT_MAX_CONCURRENCY.
+- Lượt chờ lock tối đa CHAT_THREAD_LOCK_TIMEOUT_S (→ 409); mỗi thread có tối đa
+  CHAT_THREAD_MAX_PENDING lượt chờ (→ 429).
+- Lượt trùng (cùng thread, cùng message/attachment) trong CHAT_DEDUP_WINDOW_S giây
+  được gộp: lượt sau chờ lượt đầu xong rồi trả lại đúng kết quả đó, không chạy graph.
+"""
+
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.libs.shared_cache import LockTimeout, get_shared_cache
+from src.app.admission import AdmissionRejected
+from src.orchestrator.graph import CHECKPOINT_BACKEND
+
+CHAT_THREAD_LOCK_TIMEOUT_S = float(os.getenv("CHAT_THREAD_LOCK_TIMEOUT_S", "10"))
+CHAT_THREAD_MAX_PENDING = int(os.getenv("CHAT_THREAD_MAX_PENDING", "3"))
+# Lease giữa các worker hết hạn sau thời gian này nếu worker giữ nó bị chết
+CHAT_THREAD_LEASE_TTL_S = float(os.getenv("CHAT_THREAD_LEASE_TTL_S", "60"))
+CHAT_DEDUP_WINDOW_S = float(os.getenv("CHAT_DEDUP_WINDOW_S", "5"))
+
+
+def turn_fingerprint(message: str, attachments: List[str], media_type: Optional[str]) -> str:
+    # Attachment là handle media://<sha256> nên cùng file → cùng fingerprint
+    payload = json.dumps([(message or "").strip(), list(attachments or []), media_type], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class _ThreadSlot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = 0  # lượt đang giữ hoặc đang chờ lock
+
+
+class ThreadTurns:
+    def __init__(self, shared: bool = False):
+        self.shared = shared
+        self._slots: Dict[str, _ThreadSlot] = {}
+        self._lock = threading.Lock()
+        self.counts: Counter = Counter()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    @contextmanager
+    def serialize(self, thread_id: str) -> Iterator[None]:
+        """Giữ quyền chạy lượt duy nhất của thread_id (trong process và, nếu shared, giữa các worker)."""
+        with self._lock:
+            slot = self._slots.setdefault(thread_id, _ThreadSlot())
+            if slot.pending >= CHAT_THREAD_MAX_PENDING:
+                self.counts["rejected_thread_pending"] += 1
+                raise AdmissionRejected(429, "thread_pending", 1.0)
+            slot.pending += 1
+            if slot.pending > 1:
+                self.counts["waited"] += 1
+        try:
+            started = time.monotonic()
+            if not slot.lock.acquire(timeout=CHAT_THREAD_LOCK_TIMEOUT_S):
+                self._count("rejected_thread_busy")
+                raise AdmissionRejected(409, "thread_busy", 1.0)
+            try:
+                with ExitStack() as stack:
+                    if self.shared:
+                        left = max(0.0, CHAT_THREAD_LOCK_TIMEOUT_S - (time.monotonic() - started))
+                        try:
+                            stack.enter_context(get_shared_cache().lock(
+                                f"turn:{thread_id}", ttl=CHAT_THREAD_LEASE_TTL_S, timeout=left, poll=0.05, renew=True,
+                            ))
+                        except LockTimeout:
+                            self._count("rejected_thread_busy")
+                            raise AdmissionRejected(409, "thread_busy", 1.0)
+                    yield
+            finally:
+                slot.lock.release()
+        finally:
+            with self._lock:
+                slot.pending -= 1
+                if slot.pending == 0:
+                    self._slots.pop(thread_id, None)
+
+    def recent(self, thread_id: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Kết quả của lượt giống hệt vừa chạy trong CHAT_DEDUP_WINDOW_S (None nếu không có)."""
+        if CHAT_DEDUP_WINDOW_S <= 0:
+            return None
+        try:
+            result = get_shared_cache().get(f"turn_result:{thread_id}:{fingerprint}")
+        except Exception as e:
+            print(f"❌ Error reading recent turn: {str(e)}")
+            return None
+        if result is not None:
+            self._count("collapsed")
+            print(f"🔄 Duplicate turn on thread {thread_id} collapsed into the previous run")
+        return result
+
+    def remember(self, thread_id: str, fingerprint: str, result: Dict[str, Any]) -> None:
+        if CHAT_DEDUP_WINDOW_S <= 0:
+            return
+        try:
+            get_shared_cache().set(f"turn_result:{thread_id}:{fingerprint}", result, ttl=CHAT_DEDUP_WINDOW_S)
+        except Exception as e:
+            print(f"❌ Error caching turn result: {str(e)}")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threads_active": len(self._slots),
+                "turns_pending": sum(s.pending for s in self._slots.values()),
+                "shared_lease": self.shared,
+                **self.counts,
+            }
+
+
+_turns: Optional[ThreadTurns] = None
+_turns_lock = threading.Lock()
+
+
+def get_thread_turns() -> ThreadTurns:
+    global _turns
+    if _turns is None:
+        with _turns_lock:
+            if _turns is None:
+                _turns = ThreadTurns(shared=CHECKPOINT_BACKEND != "memory")
+    return _turns
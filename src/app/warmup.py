@@ -0,0 +1,176 @@
+# app/warmup.py
+"""
+Warmup + readiness cho chat_api.
+
+`/health` chỉ cho biết process còn sống; request thật đầu tiên vẫn phải trả giá cho
+việc nạp FAQ index, truy vấn vector đầu tiên, kết nối OpenAI, page cache SQLite... Nên
+mỗi worker chạy `run_warmup(app_graph)` ở background khi khởi động và `/ready` chỉ trả 200 khi
+các bước bắt buộc đã xong — orchestrator (k8s readinessProbe, load balancer) chỉ đưa
+traffic vào instance đã "ấm".
+
+Các bước (bắt buộc *):
+- faq_index*      FAQ index đang phục vụ đã nạp dữ liệu
+- databases*      mở connection SharedCache / checkpointer, đọc bảng trips/bookings
+- faq_search*     truy vấn WARMUP_TOP_FAQ câu hỏi đầu của FAQ (một lần gọi embeddings,
+                  lưu vào cache embedding dùng chung, nạp index vector)
+- llm_connection  mở sẵn kết nối tới OpenAI (`models.list`, không tốn token; bỏ qua với stub)
+- routes          lấy trước chỗ trống của WARMUP_TOP_ROUTES tuyến/ngày nhiều chuyến nhất
+                  (ưu tiên từ hôm nay trở đi; cần booking API) vào cache availability
+- graph_pass*     chạy graph với vài câu mẫu mà các tầng local tự giải được (không gọi
+                  LLM trích xuất) trên một thread_id riêng rồi xóa checkpoint của nó
+"""
+
+from __future__ import annotations
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+WARMUP_TOP_ROUTES = int(os.getenv("WARMUP_TOP_ROUTES", "10"))
+WARMUP_TOP_FAQ = int(os.getenv("WARMUP_TOP_FAQ", "20"))
+WARMUP_DB_PATH = os.getenv("WARMUP_DB_PATH", "src/data/mock.db")
+# Các lượt mẫu cho graph_pass: FAQ (từ khóa) và xem chuyến (địa điểm) đều được giải ở tầng local
+WARMUP_TURNS = ["Quy định hành lý mang theo thế nào?", "Xem chuyến HCM đi Đà Lạt ngày mai"]
+
+_state: Dict[str, Any] = {"status": "cold", "started_at": None, "finished_at": None, "steps": {}}
+_state_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_graph: Any = None  # graph đã compile của worker (chat_api truyền vào)
+
+
+def _faq_index() -> Dict[str, Any]:
+    from src.orchestrator.rag_faq import get_faq_rag
+    rag = get_faq_rag()
+    if not rag.faq_data:
+        raise RuntimeError("FAQ index is empty")
+    return {"entries": len(rag.faq_data), "corpus_hash": rag.corpus_hash[:12]}
+
+
+def _databases() -> Dict[str, Any]:
+    from src.libs.shared_cache import get_shared_cache
+    get_shared_cache().get("warmup:ping")
+    _graph.checkpointer.get_tuple({"configurable": {"thread_id": f"warmup-{os.getpid()}"}})
+    # Đọc hết các bảng nhỏ để nạp page cache của SQLite / OS
+    with sqlite3.connect(WARMUP_DB_PATH) as con:
+        rows = {table: len(con.execute(f"SELECT * FROM {table}").fetchall()) for table in ("trips", "bookings")}
+    return rows
+
+
+def _faq_search() -> Dict[str, Any]:
+    from src.orchestrator.rag_faq import get_faq_rag
+    rag = get_faq_rag()
+    questions = [item["question"] for item in rag.faq_data[:WARMUP_TOP_FAQ]]
+    matches = rag.search_many(questions, top_k=3)
+    return {"questions": len(questions), "matched": sum(1 for m in matches if m)}
+
+
+def _llm_connection() -> Dict[str, Any]:
+    from src.libs.llm_client import LLM_BACKEND
+    from src.orchestrator.llm_extractor import oai_client
+    models = getattr(oai_client, "models", None)
+    if models is None:
+        return {"skipped": LLM_BACKEND}
+    models.list(timeout=5)
+    return {"backend": LLM_BACKEND}
+
+
+def _top_routes() -> List[Tuple[str, str, str]]:
+    today = time.strftime("%Y-%m-%d")
+    with sqlite3.connect(WARMUP_DB_PATH) as con:
+        return con.execute(
+            """
+            SELECT route_from, route_to, substr(depart_time,1,10) AS day
+            FROM trips
+            GROUP BY route_from, route_to, day
+            ORDER BY day >= ? DESC, COUNT(*) DESC LIMIT ?
+            """,
+            (today, WARMUP_TOP_ROUTES),
+        ).fetchall()
+
+
+def _routes() -> Dict[str, Any]:
+    from src.orchestrator.nodes import _available_trips
+    routes = _top_routes()
+    primed = 0
+    for route_from, route_to, day in routes:
+        data, status, _ = _available_trips(route_from, route_to, day, None)
+        primed += status == 200
+    if routes and not primed:
+        raise RuntimeError("booking API unavailable")
+    return {"routes": len(routes), "primed": primed}
+
+
+def _graph_pass() -> Dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+    from src.orchestrator.budget import turn_config
+    thread_id = f"warmup-{os.getpid()}"
+    intents = []
+    try:
+        for text in WARMUP_TURNS:
+            out = _graph.invoke({"messages": [HumanMessage(content=text)], "degradations": None}, turn_config(thread_id))
+            if not (out.get("messages") and out["messages"][-1].content):
+                raise RuntimeError(f"empty reply for {text!r}")
+            intents.append(out.get("intent"))
+    finally:
+        delete_thread = getattr(_graph.checkpointer, "delete_thread", None)
+        if delete_thread:
+            delete_thread(thread_id)
+    return {"turns": len(WARMUP_TURNS), "intents": intents}
+
+
+# (tên bước, hàm, bắt buộc cho /ready)
+WARMUP_STEPS: List[Tuple[str, Callable[[], Dict[str, Any]], bool]] = [
+    ("faq_index", _faq_index, True),
+    ("databases", _databases, True),
+    ("faq_search", _faq_search, True),
+    ("llm_connection", _llm_connection, False),
+    ("routes", _routes, False),
+    ("graph_pass", _graph_pass, True),
+]
+
+
+def run_warmup(graph: Any) -> Dict[str, Any]:
+    """Chạy lần lượt các bước warmup trên `graph`; lỗi ở một bước không dừng các bước sau."""
+    global _graph
+    _graph = graph
+    with _state_lock:
+        # Chạy lại trên worker đã ready (/admin/warmup) không rút nó khỏi traffic
+        status = "ready" if _state["status"] == "ready" else "warming"
+        _state.update(status=status, started_at=time.time(), finished_at=None, steps={})
+    ready = True
+    for name, step, required in WARMUP_STEPS:
+        started = time.perf_counter()
+        try:
+            info = {"ok": True, **(step() or {})}
+        except Exception as e:
+            print(f"⚠️ Warmup step {name} failed: {str(e)}")
+            info = {"ok": False, "error": str(e)}
+            ready = ready and not required
+        info.update(required=required, ms=round((time.perf_counter() - started) * 1000, 1))
+        with _state_lock:
+            _state["steps"][name] = info
+    with _state_lock:
+        _state.update(status="ready" if ready else "failed", finished_at=time.time())
+        elapsed = _state["finished_at"] - _state["started_at"]
+    print(f"{'✅' if ready else '❌'} Warmup {'ready' if ready else 'failed'} in {elapsed:.1f}s")
+    return readiness()[1]
+
+
+def start_warmup(graph: Any, force: bool = False) -> bool:
+    """Chạy warmup ở background (một lần mỗi process, `force` để chạy lại); False nếu
+    đang chạy hoặc đã ready."""
+    global _thread
+    with _state_lock:
+        if _thread is not None and _thread.is_alive() or (_state["status"] == "ready" and not force):
+            return False
+        _thread = threading.Thread(target=run_warmup, args=(graph,), name="warmup", daemon=True)
+        _thread.start()
+    return True
+
+
+def readiness() -> Tuple[bool, Dict[str, Any]]:
+    with _state_lock:
+        report = {**_state, "steps": dict(_state["steps"])}
+    return report["status"] == "ready", report
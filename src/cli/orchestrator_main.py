@@ -7,11 +7,13 @@ This is the entry point that replaces the original orchestrator_langgraph.py
 from __future__ import annotations
 
 from langchain_core.messages import HumanMessage, AIMessage
-from orchestrator import app_graph, State
+from orchestrator import State
+from orchestrator.graph import compile_graph
 
 def run_cli(thread_id: str = "demo1") -> None:
     """CLI demo function."""
     print("=== Demo đổi giờ (LangGraph + LLM-only extraction). Gõ 'q' để thoát. ===")
+    app_graph = compile_graph()
     config = {"configurable": {"thread_id": thread_id}}
     while True:
         txt = input("Bạn: ").strip()
@@ -0,0 +1,51 @@
+# llm_client.py
+"""
+Factory tạo OpenAI client dùng chung cho orchestrator và libs.
+
+`LLM_BACKEND=openai` (mặc định) → `openai.OpenAI` thật, cần OPENAI_API_KEY.
+`LLM_BACKEND=stub`               → `StubOpenAI` chạy local (benchmark/warmup/dev).
+`LLM_BACKEND=record`             → OpenAI thật, ghi response vào `LLM_REPLAY_PATH`.
+`LLM_BACKEND=replay`             → phát lại response đã ghi, không gọi mạng (eval offline).
+
+Mọi backend được bọc bởi `llm_gateway.GatewayOpenAI` (deadline, hedging, retry,
+giới hạn đồng thời, circuit breaker) trừ khi `LLM_GATEWAY=0`.
+"""
+
+from __future__ import annotations
+import os
+from typing import Any
+from dotenv import load_dotenv
+from .llm_gateway import LLM_GATEWAY, GatewayOpenAI
+
+load_dotenv()
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
+
+def create_openai_client(responses_op: str = "responses") -> Any:
+    """Return an OpenAI-compatible client for the configured backend; `responses_op` is the
+    gateway op used for `responses.create` (e.g. "responses_vision")."""
+    client = _create_backend_client()
+    if not LLM_GATEWAY:
+        return client
+    return GatewayOpenAI(client, responses_op=responses_op)
+
+
+def _create_backend_client() -> Any:
+    if LLM_BACKEND == "stub":
+        from .llm_stub import StubOpenAI
+        return StubOpenAI()
+    if LLM_BACKEND == "replay":
+        from .llm_replay import ReplayOpenAI
+        return ReplayOpenAI()
+
+    from openai import OpenAI
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("Thiếu OPENAI_API_KEY (đặt env hoặc .env).")
+    # Retry do gateway quản lý (có jitter + deadline), SDK không tự retry thêm
+    client = OpenAI(api_key=api_key, max_retries=0 if LLM_GATEWAY else 2)
+    if LLM_BACKEND == "record":
+        from .llm_replay import RecordingOpenAI
+        return RecordingOpenAI(client)
+    return client
@@ -0,0 +1,365 @@
+# llm_gateway.py
+"""
+Gateway dùng chung cho mọi lời gọi OpenAI (`responses.create`, `embeddings.create`,
+`audio.transcriptions.create`, `models.list`).
+
+Mỗi lời gọi đi qua:
+- deadline: tối đa `LLM_TIMEOUT_S` mỗi lần thử, `LLM_DEADLINE_S` cho cả lời gọi
+  (kể cả retry); caller có thể truyền `timeout=` nhỏ hơn (budget còn lại của lượt chat).
+- hedging: nếu lần thử chưa xong sau percentile `LLM_HEDGE_PERCENTILE` của độ trễ gần
+  đây, gửi thêm một request trùng, lấy kết quả về trước.
+- retry có giới hạn (`LLM_MAX_RETRIES`) với backoff + jitter, chỉ cho lỗi tạm thời
+  (timeout, mất kết nối, 429, 5xx); lỗi request (400, schema) trả ngay cho caller.
+- giới hạn đồng thời (`LLM_MAX_CONCURRENCY` request upstream mỗi process).
+- circuit breaker theo loại lời gọi: sau `LLM_BREAKER_FAILURES` lỗi liên tiếp thì
+  fail fast (`CircuitOpen`) trong `LLM_BREAKER_COOLDOWN_S`, để caller dùng heuristic local.
+
+Mỗi op có breaker, số liệu và ngưỡng hedge riêng. Ảnh (`responses_vision`, client tạo bằng
+`create_openai_client(responses_op="responses_vision")`) chậm hơn nhiều so với trích xuất
+text nên tách khỏi `responses`: timeout mỗi lần thử `LLM_VISION_TIMEOUT_S`, không hedge.
+Chuyển giọng nói (`audio_transcriptions`) cũng vậy với `LLM_AUDIO_TIMEOUT_S`: upload lại
+một đoạn audio chỉ để hedge quá tốn.
+
+`get_llm_gateway().metrics()` trả độ trễ p50/p95/p99, số lỗi/timeout/retry/hedge và
+trạng thái breaker (API: `GET /metrics/llm`). Tắt bằng `LLM_GATEWAY=0`.
+"""
+
+from __future__ import annotations
+import os, time, random, threading
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+LLM_GATEWAY = os.getenv("LLM_GATEWAY", "1") == "1"
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "10"))
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_S = float(os.getenv("LLM_RETRY_BASE_S", "0.2"))
+LLM_RETRY_MAX_S = float(os.getenv("LLM_RETRY_MAX_S", "2"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_MS = float(os.getenv("LLM_HEDGE_MIN_MS", "100"))
+# Batch embeddings lớn (ingest) không hedge: request trùng quá tốn
+LLM_HEDGE_MAX_INPUTS = int(os.getenv("LLM_HEDGE_MAX_INPUTS", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_S = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+LLM_METRICS_WINDOW = int(os.getenv("LLM_METRICS_WINDOW", "1000"))
+LLM_VISION_TIMEOUT_S = float(os.getenv("LLM_VISION_TIMEOUT_S", "20"))
+LLM_AUDIO_TIMEOUT_S = float(os.getenv("LLM_AUDIO_TIMEOUT_S", "20"))
+# Chính sách riêng theo op: timeout mỗi lần thử, có hedge hay không
+LLM_OP_POLICIES: Dict[str, Dict[str, Any]] = {
+    "responses_vision": {"attempt_timeout": LLM_VISION_TIMEOUT_S, "hedge": False},
+    "audio_transcriptions": {"attempt_timeout": LLM_AUDIO_TIMEOUT_S, "hedge": False},
+}
+
+_RETRYABLE_ERRORS = {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError"}
+
+
+class LLMGatewayError(RuntimeError):
+    """The LLM call was not answered; callers fall back to local heuristics."""
+
+
+class LLMTimeout(LLMGatewayError):
+    """No attempt finished before the deadline."""
+
+
+class LLMOverloaded(LLMGatewayError):
+    """No concurrency slot freed up before the deadline."""
+
+
+class CircuitOpen(LLMGatewayError):
+    """The circuit breaker is open: upstream has been failing, fail fast."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (LLMTimeout, TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in _RETRYABLE_ERRORS:
+        return True
+    status = getattr(error, "status_code", None)
+    return status in (408, 409, 429) or (isinstance(status, int) and status >= 500)
+
+
+class CircuitBreaker:
+    """closed → open after N consecutive failures → half_open after the cooldown
+    (one trial call) → closed on success / open again on failure."""
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN_S):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state, self._trial = "half_open", False
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def cancel_trial(self) -> None:
+        """The half-open trial never reached upstream (e.g. no free slot); allow another."""
+        with self._lock:
+            self._trial = False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.state, self.consecutive = "closed", 0
+                return
+            self.consecutive += 1
+            if self.state == "half_open" or self.consecutive >= self.failures:
+                if self.state != "open":
+                    print(f"⚠️ LLM circuit breaker open after {self.consecutive} failure(s)")
+                self.state, self.opened_at = "open", time.monotonic()
+
+
+class _OpStats:
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.latency: deque = deque(maxlen=LLM_METRICS_WINDOW)   # caller-observed, successful calls
+        self.upstream: deque = deque(maxlen=LLM_METRICS_WINDOW)  # single attempts (drives hedging)
+        self.lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        with self.lock:
+            self.counts.update(counts)
+
+    @staticmethod
+    def percentile(values, q: float) -> Optional[float]:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * q))] if values else None
+
+
+class LLMGateway:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._stats: Dict[str, _OpStats] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _op(self, op: str):
+        with self._lock:
+            if op not in self._stats:
+                self._stats[op] = _OpStats()
+                self._breakers[op] = CircuitBreaker()
+            return self._stats[op], self._breakers[op]
+
+    def call(self, op: str, fn: Callable[[float], Any], timeout: Optional[float] = None, hedge: bool = True,
+             attempt_timeout: float = LLM_TIMEOUT_S) -> Any:
+        """Run `fn(attempt_timeout)` under the deadline/hedging/retry/breaker policy."""
+        stats, breaker = self._op(op)
+        stats.add(calls=1)
+        if not breaker.allow():
+            stats.add(short_circuited=1)
+            raise CircuitOpen(f"LLM {op} circuit open")
+        started = time.monotonic()
+        deadline = started + min(timeout or LLM_DEADLINE_S, LLM_DEADLINE_S)
+        attempt = 0
+        while True:
+            try:
+                result = self._attempt(op, fn, stats, deadline, hedge, attempt_timeout)
+            except Exception as e:
+                if not is_retryable(e):
+                    if isinstance(e, LLMOverloaded):
+                        stats.add(overloaded=1)
+                        breaker.cancel_trial()
+                    else:
+                        stats.add(errors=1)  # request error (400, schema...): upstream is healthy
+                        breaker.record(True)
+                    raise
+                attempt += 1
+                remaining = deadline - time.monotonic()
+                if attempt > LLM_MAX_RETRIES or remaining <= 0:
+                    if isinstance(e, (LLMTimeout, TimeoutError)):
+                        stats.add(timeouts=1)
+                    else:
+                        stats.add(errors=1)
+                    breaker.record(False)
+                    if isinstance(e, LLMGatewayError):
+                        raise
+                    raise LLMGatewayError(f"LLM {op} failed after {attempt} attempt(s): {str(e)}") from e
+                backoff = random.uniform(0, min(LLM_RETRY_MAX_S, LLM_RETRY_BASE_S * 2 ** attempt))
+                stats.add(retries=1)
+                time.sleep(min(backoff, remaining))
+                continue
+            breaker.record(True)
+            with stats.lock:
+                stats.counts["ok"] += 1
+                stats.latency.append(time.monotonic() - started)
+            return result
+
+    def _submit(self, fn: Callable[[float], Any], attempt_timeout: float, stats: _OpStats) -> Future:
+        def run():
+            t0 = time.monotonic()
+            try:
+                result = fn(attempt_timeout)
+            finally:
+                self._slots.release()
+                with self._lock:
+                    self._in_flight -= 1
+            with stats.lock:
+                stats.upstream.append(time.monotonic() - t0)
+            return result
+
+        with self._lock:
+            self._in_flight += 1
+        return self._pool.submit(run)
+
+    def _attempt(self, op: str, fn: Callable[[float], Any], stats: _OpStats, deadline: float, hedge: bool,
+                 attempt_timeout: float) -> Any:
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise LLMOverloaded(f"LLM {op}: {self.max_concurrency} calls already in flight")
+        attempt_deadline = min(deadline, time.monotonic() + attempt_timeout)
+        futures = [self._submit(fn, attempt_deadline - time.monotonic(), stats)]
+
+        hedge_after = self._hedge_delay(stats) if hedge and LLM_HEDGE else None
+        if hedge_after is not None and hedge_after < attempt_deadline - time.monotonic():
+            done, _ = wait(futures, timeout=hedge_after)
+            # Hedge only when a slot is free right now; never queue behind real traffic
+            if not done and self._slots.acquire(blocking=False):
+                stats.add(hedges=1)
+                futures.append(self._submit(fn, attempt_deadline - time.monotonic(), stats))
+
+        pending, error = list(futures), None
+        while pending:
+            done, _ = wait(pending, timeout=max(0.0, attempt_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                pending.remove(future)
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        stats.add(hedge_wins=1)
+                    return future.result()
+                error = error or future.exception()
+        if error is not None and not pending:
+            raise error
+        raise LLMTimeout(f"LLM {op} timed out after {attempt_timeout:.1f}s")
+
+    def _hedge_delay(self, stats: _OpStats) -> Optional[float]:
+        with stats.lock:
+            if len(stats.upstream) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            value = _OpStats.percentile(stats.upstream, LLM_HEDGE_PERCENTILE)
+        return max(value, LLM_HEDGE_MIN_MS / 1000.0)
+
+    def metrics(self) -> Dict[str, Any]:
+        ops = {}
+        for op, stats in list(self._stats.items()):
+            with stats.lock:
+                latency = list(stats.latency)
+                counts = dict(stats.counts)
+            ms = lambda q: round(_OpStats.percentile(latency, q) * 1000, 1) if latency else None
+            ops[op] = {
+                **counts,
+                "p50_ms": ms(0.5), "p95_ms": ms(0.95), "p99_ms": ms(0.99),
+                "breaker": self._breakers[op].state,
+            }
+        return {"in_flight": self._in_flight, "max_concurrency": self.max_concurrency, "ops": ops}
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Process-wide gateway (limiter and breakers are per worker process)."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+class _GatewayEndpoint:
+    """One client resource: `create`/`list` go through the gateway, other methods pass through."""
+
+    def __init__(self, endpoint: Any, op: str, gateway: LLMGateway):
+        self._endpoint = endpoint
+        self._op = op
+        self._gateway = gateway
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._endpoint, name)
+
+    def create(self, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        hedge = None
+        if self._op == "embeddings":
+            inputs = kwargs.get("input")
+            hedge = isinstance(inputs, str) or len(inputs or []) <= LLM_HEDGE_MAX_INPUTS
+        return self._call(self._endpoint.create, args, kwargs, timeout, hedge)
+
+    def list(self, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        return self._call(self._endpoint.list, args, kwargs, timeout)
+
+    def _call(self, method: Callable[..., Any], args: tuple, kwargs: Dict[str, Any], timeout: Optional[float],
+              hedge: Optional[bool] = None) -> Any:
+        policy = LLM_OP_POLICIES.get(self._op, {})
+        hedge = policy.get("hedge", True) if hedge is None else hedge
+        # Each attempt also carries its own HTTP timeout so abandoned attempts free their thread
+        call = lambda attempt_timeout: method(*args, timeout=max(attempt_timeout, 0.1), **kwargs)
+        return self._gateway.call(
+            self._op, call, timeout=timeout, hedge=hedge, attempt_timeout=policy.get("attempt_timeout", LLM_TIMEOUT_S),
+        )
+
+
+class _GatewayAudio:
+    """`audio` resource: `transcriptions` goes through the gateway, the rest passes through."""
+
+    def __init__(self, audio: Any, gateway: LLMGateway):
+        self._audio = audio
+        self.transcriptions = _GatewayEndpoint(audio.transcriptions, "audio_transcriptions", gateway)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._audio, name)
+
+
+class GatewayOpenAI:
+    """Wraps an OpenAI-compatible client; `responses`, `embeddings`, `audio.transcriptions`
+    and `models` go through the gateway, everything else (e.g. `files`) is passed through
+    unchanged. `responses_op` names the
+    op (breaker, stats, LLM_OP_POLICIES) used for `responses.create`.
+
+    Resources are wrapped on first use, so a client without one of them (e.g. an SDK
+    without the Responses API) only fails on the call that needs it."""
+
+    def __init__(self, client: Any, gateway: Optional[LLMGateway] = None, responses_op: str = "responses"):
+        self.client = client
+        self.gateway = gateway or get_llm_gateway()
+        self.responses_op = responses_op
+
+    def _wrap(self, name: str, resource: Any) -> Any:
+        if name == "responses":
+            return _GatewayEndpoint(resource, self.responses_op, self.gateway)
+        if name in ("embeddings", "models"):
+            return _GatewayEndpoint(resource, name, self.gateway)
+        if name == "audio":
+            return _GatewayAudio(resource, self.gateway)
+        return None
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ("client", "gateway", "responses_op"):
+            raise AttributeError(name)
+        resource = getattr(self.client, name)
+        wrapped = self._wrap(name, resource)
+        if wrapped is None:
+            return resource
+        self.__dict__[name] = wrapped
+        return wrapped
+
+    def with_options(self, **kwargs) -> "GatewayOpenAI":
+        return GatewayOpenAI(self.client.with_options(**kwargs), self.gateway, self.responses_op)
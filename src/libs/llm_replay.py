@@ -0,0 +1,120 @@
+# llm_replay.py
+"""
+Ghi/phát lại response của `responses.create` để chạy eval/benchmark offline mà vẫn
+dùng đúng output thật của model.
+
+- `LLM_BACKEND=record`: gọi OpenAI thật và ghi mỗi response (output_text, usage,
+  latency) vào `LLM_REPLAY_PATH` (JSONL, khóa = hash của model + input).
+- `LLM_BACKEND=replay`: chỉ đọc file đó, không gọi mạng. Request chưa được ghi thì
+  dùng `StubOpenAI` (`LLM_REPLAY_FALLBACK=stub`, mặc định) hoặc báo lỗi (`error`).
+  `LLM_REPLAY_LATENCY=1` giả lập lại độ trễ đã ghi.
+
+Embeddings luôn đi qua client bên dưới (OpenAI khi record, stub khi replay).
+"""
+
+from __future__ import annotations
+import os, json, time, hashlib, threading
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+LLM_REPLAY_PATH = os.getenv("LLM_REPLAY_PATH", "src/data/llm_replay.jsonl")
+LLM_REPLAY_FALLBACK = os.getenv("LLM_REPLAY_FALLBACK", "stub")  # stub | error
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "0") == "1"
+
+
+def replay_key(model: str, input: Any) -> str:
+    payload = json.dumps({"model": model, "input": input}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _response(record: Dict) -> Any:
+    usage = record.get("usage") or {}
+    return SimpleNamespace(
+        output_text=record.get("output_text", ""),
+        usage=SimpleNamespace(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0)),
+        model=record.get("model"),
+    )
+
+
+class _ReplayResponses:
+    def __init__(self, owner: "ReplayOpenAI"):
+        self._owner = owner
+
+    def create(self, model: str, input: Any, **kwargs) -> Any:
+        owner = self._owner
+        key = replay_key(model, input)
+        record = owner.records.get(key)
+        if record is not None:
+            owner.hits += 1
+            if LLM_REPLAY_LATENCY and record.get("latency_ms"):
+                time.sleep(record["latency_ms"] / 1000.0)
+            return _response(record)
+        owner.misses += 1
+        if owner.fallback is None:
+            raise KeyError(f"No recorded response for {key[:12]} in {owner.path}")
+        return owner.fallback.responses.create(model=model, input=input, **kwargs)
+
+
+class ReplayOpenAI:
+    """Client chỉ đọc từ file ghi sẵn (subset của `openai.OpenAI` mà project dùng)."""
+
+    def __init__(self, path: str = LLM_REPLAY_PATH, fallback: Optional[str] = LLM_REPLAY_FALLBACK):
+        from .llm_stub import StubOpenAI
+        self.path = path
+        self.records: Dict[str, Dict] = {}
+        self.hits = self.misses = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records[record["key"]] = record
+        stub = StubOpenAI()
+        self.fallback = stub if fallback == "stub" else None
+        self.responses = _ReplayResponses(self)
+        self.embeddings = stub.embeddings
+        print(f"✅ Loaded {len(self.records)} recorded LLM responses from {path}")
+
+    def with_options(self, **kwargs) -> "ReplayOpenAI":
+        return self
+
+
+class _RecordingResponses:
+    def __init__(self, owner: "RecordingOpenAI"):
+        self._owner = owner
+
+    def create(self, model: str, input: Any, **kwargs) -> Any:
+        started = time.perf_counter()
+        resp = self._owner.client.responses.create(model=model, input=input, **kwargs)
+        usage = getattr(resp, "usage", None)
+        record = {
+            "key": replay_key(model, input),
+            "model": model,
+            "output_text": getattr(resp, "output_text", "") or "",
+            "usage": {
+                "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+                "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            },
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        self._owner.write(record)
+        return resp
+
+
+class RecordingOpenAI:
+    """Bọc client thật, ghi lại mọi response của `responses.create`."""
+
+    def __init__(self, client: Any, path: str = LLM_REPLAY_PATH):
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        self.responses = _RecordingResponses(self)
+        self.embeddings = client.embeddings
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(self, record: Dict) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def with_options(self, **kwargs) -> "RecordingOpenAI":
+        return RecordingOpenAI(self.client.with_options(**kwargs), self.path)
@@ -0,0 +1,127 @@
+# llm_stub.py
+"""
+Stand-in OpenAI client chạy hoàn toàn local (không gọi mạng).
+
+Dùng cho benchmark, warmup và môi trường không có OPENAI_API_KEY:
+- `responses.create` trả JSON trích xuất bằng luật đơn giản (intent + trường).
+- `embeddings.create` trả vector hashing (bag of syllables + bigrams), ổn định giữa các process.
+
+Bật bằng env `LLM_BACKEND=stub`. `LLM_STUB_LATENCY_MS` giả lập độ trễ upstream.
+"""
+
+from __future__ import annotations
+import os, re, json, time, math, zlib, unicodedata
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+STUB_EMBEDDING_DIM = 1536
+
+_INTENT_KEYWORDS = [
+    ("create_complaint", ("khieu nai", "phan anh")),
+    ("cancel_booking", ("huy ve", "huy chuyen", "khong di nua")),
+    ("get_invoice", ("hoa don",)),
+    ("change_time", ("doi gio", "doi chuyen", "doi ve", "doi sang")),
+    ("view_trips", ("xem chuyen", "lich trinh", "danh sach chuyen")),
+    ("check_booking", ("kiem tra ve", "thong tin ve", "xem ve")),
+    ("faq", ("lam the nao", "chinh sach", "quy dinh", "giay to", "thu tuc", "hanh ly", "hoan tien", "?")),
+]
+
+_PLACES = {
+    "ho chi minh": "HCM", "tphcm": "HCM", "hcm": "HCM", "sai gon": "HCM",
+    "ha noi": "Hanoi", "hanoi": "Hanoi", "da lat": "Da Lat", "dalat": "Da Lat",
+    "nha trang": "Nha Trang", "vung tau": "Vung Tau", "can tho": "Can Tho",
+}
+
+
+def _fold(text: str) -> str:
+    text = text.lower().replace("đ", "d")
+    text = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+
+
+def _stub_extract(user_text: str) -> Dict[str, Optional[str]]:
+    folded = _fold(user_text)
+    out: Dict[str, Optional[str]] = {
+        "intent": None, "booking_id": None, "date": None, "trip_id": None,
+        "route_from": None, "route_to": None, "complaint_type": None, "description": None,
+    }
+    for intent, keywords in _INTENT_KEYWORDS:
+        if any(k in folded for k in keywords):
+            out["intent"] = intent
+            break
+    m = re.search(r"\b(VX\d{5,12})\b", user_text, flags=re.IGNORECASE)
+    if m:
+        out["booking_id"] = m.group(1).upper()
+    m = re.search(r"\b(T\d{2,6})\b", user_text, flags=re.IGNORECASE)
+    if m:
+        out["trip_id"] = m.group(1).upper()
+    m = (re.search(r"\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{4}))?\b", folded)
+         or re.search(r"\b(\d{1,2}) thang (\d{1,2})(?: nam (\d{4}))?\b", folded))
+    if m:
+        year = int(m.group(3)) if m.group(3) else 2025
+        out["date"] = f"{year:04d}-{int(m.group(2)):02d}-{int(m.group(1)):02d}"
+    m = re.search(r"tu (.+?) (?:den|di|toi) (.+?)(?: ngay|$|\s\d)", folded)
+    if m:
+        out["route_from"] = _PLACES.get(m.group(1).strip(" .,"), None)
+        out["route_to"] = _PLACES.get(m.group(2).strip(" .,"), None)
+    if out["intent"] == "create_complaint":
+        out["complaint_type"] = "REFUND" if "hoan tien" in folded else "SERVICE"
+        out["description"] = user_text
+    return out
+
+
+def _stub_embedding(text: str, dim: int) -> List[float]:
+    tokens = re.findall(r"\w+", _fold(text))
+    features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    vec = [0.0] * dim
+    for feat in features:
+        h = zlib.crc32(feat.encode("utf-8"))
+        vec[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def _simulate_latency() -> None:
+    if STUB_LATENCY_MS > 0:
+        time.sleep(STUB_LATENCY_MS / 1000.0)
+
+
+def _last_user_text(input_: Any) -> str:
+    if isinstance(input_, str):
+        return input_
+    for msg in reversed(input_ or []):
+        if msg.get("role") == "user":
+            content = msg.get("content")
+            return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+    return ""
+
+
+class _StubResponses:
+    def create(self, model: str, input: Any, **kwargs) -> Any:
+        _simulate_latency()
+        text = _last_user_text(input)
+        output_text = json.dumps(_stub_extract(text), ensure_ascii=False)
+        usage = SimpleNamespace(input_tokens=max(1, len(text) // 4), output_tokens=len(output_text) // 4)
+        return SimpleNamespace(output_text=output_text, usage=usage, model=model)
+
+
+class _StubEmbeddings:
+    def create(self, model: str, input: Any, dimensions: Optional[int] = None, **kwargs) -> Any:
+        _simulate_latency()
+        texts = [input] if isinstance(input, str) else list(input)
+        dim = dimensions or STUB_EMBEDDING_DIM
+        data = [SimpleNamespace(embedding=_stub_embedding(t, dim), index=i) for i, t in enumerate(texts)]
+        usage = SimpleNamespace(prompt_tokens=sum(len(t) // 4 for t in texts), total_tokens=sum(len(t) // 4 for t in texts))
+        return SimpleNamespace(data=data, usage=usage, model=model)
+
+
+class StubOpenAI:
+    """Drop-in subset of `openai.OpenAI` used by this project."""
+
+    def __init__(self, *args, **kwargs):
+        self.responses = _StubResponses()
+        self.embeddings = _StubEmbeddings()
+
+    def with_options(self, **kwargs) -> "StubOpenAI":
+        return self
@@ -0,0 +1,203 @@
+# shared_cache.py
+"""
+Shared local key-value store backed by SQLite.
+
+Dùng để chia sẻ cache và lock giữa nhiều worker process (uvicorn --workers N)
+trên cùng một máy/container. Mỗi thread có connection riêng; SQLite ở chế độ WAL
+nên reader không bị block bởi writer.
+"""
+
+from __future__ import annotations
+import os, json, time, sqlite3, threading, uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "src/data/shared_cache.db")
+
+
+class LockTimeout(TimeoutError):
+    """Raised when a shared lock cannot be acquired in time."""
+
+
+class SharedCache:
+    """Process-safe TTL key-value cache + named leases on top of one SQLite file."""
+
+    def __init__(self, path: str = SHARED_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._con() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                " name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA busy_timeout = 30000;")
+            con.execute("PRAGMA journal_mode = WAL;")
+            con.execute("PRAGMA synchronous = NORMAL;")
+            self._local.con = con
+        return con
+
+    # --- key-value ---
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._con().execute(
+            "SELECT value, expires_at FROM kv WHERE key=?;", (key,)
+        ).fetchone()
+        if not row:
+            return default
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return default
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        self._con().execute(
+            "INSERT OR REPLACE INTO kv(key, value, expires_at) VALUES (?,?,?);",
+            (key, json.dumps(value, ensure_ascii=False), expires_at),
+        )
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Return {key: value} for the live keys among `keys` (missing ones are omitted)."""
+        found: Dict[str, Any] = {}
+        now = time.time()
+        con = self._con()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = con.execute(
+                f"SELECT key, value, expires_at FROM kv WHERE key IN ({','.join('?' * len(chunk))});", chunk
+            ).fetchall()
+            for key, value, expires_at in rows:
+                if expires_at is None or expires_at >= now:
+                    found[key] = json.loads(value)
+        return found
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """Write many keys in one transaction."""
+        expires_at = time.time() + ttl if ttl else None
+        con = self._con()
+        con.execute("BEGIN IMMEDIATE;")
+        try:
+            con.executemany(
+                "INSERT OR REPLACE INTO kv(key, value, expires_at) VALUES (?,?,?);",
+                [(key, json.dumps(value, ensure_ascii=False), expires_at) for key, value in items.items()],
+            )
+            con.execute("COMMIT;")
+        except Exception:
+            con.execute("ROLLBACK;")
+            raise
+
+    def delete(self, key: str) -> None:
+        self._con().execute("DELETE FROM kv WHERE key=?;", (key,))
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        """Atomically add `delta` to an integer counter and return the new value."""
+        con = self._con()
+        con.execute(
+            "INSERT INTO kv(key, value, expires_at) VALUES (?, ?, NULL) "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value;",
+            (key, str(delta)),
+        )
+        row = con.execute("SELECT value FROM kv WHERE key=?;", (key,)).fetchone()
+        return int(row[0])
+
+    def items(self, prefix: str) -> List[Tuple[str, Any]]:
+        """Return all live (key, value) pairs whose key starts with `prefix`."""
+        rows = self._con().execute(
+            "SELECT key, value FROM kv WHERE key >= ? AND key < ? "
+            "AND (expires_at IS NULL OR expires_at >= ?);",
+            (prefix, prefix + "\uffff", time.time()),
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def purge_expired(self) -> int:
+        cur = self._con().execute(
+            "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at < ?;", (time.time(),)
+        )
+        return cur.rowcount
+
+    # --- cross-process leases ---
+    def try_acquire(self, name: str, ttl: float, owner: Optional[str] = None) -> Optional[str]:
+        """Take lease `name` if free (or expired). Return owner token or None."""
+        owner = owner or uuid.uuid4().hex
+        now = time.time()
+        con = self._con()
+        con.execute("BEGIN IMMEDIATE;")
+        try:
+            row = con.execute("SELECT owner, expires_at FROM leases WHERE name=?;", (name,)).fetchone()
+            if row and row[1] >= now and row[0] != owner:
+                con.execute("COMMIT;")
+                return None
+            con.execute(
+                "INSERT OR REPLACE INTO leases(name, owner, expires_at) VALUES (?,?,?);",
+                (name, owner, now + ttl),
+            )
+            con.execute("COMMIT;")
+            return owner
+        except Exception:
+            con.execute("ROLLBACK;")
+            raise
+
+    def release(self, name: str, owner: str) -> None:
+        self._con().execute("DELETE FROM leases WHERE name=? AND owner=?;", (name, owner))
+
+    def renew(self, name: str, owner: str, ttl: float) -> bool:
+        """Extend a lease we still hold. False if it expired and was taken by someone else."""
+        cur = self._con().execute(
+            "UPDATE leases SET expires_at=? WHERE name=? AND owner=?;", (time.time() + ttl, name, owner)
+        )
+        return cur.rowcount > 0
+
+    @contextmanager
+    def lock(self, name: str, ttl: float = 600.0, timeout: float = 600.0, poll: float = 0.1, renew: bool = False):
+        """Cross-process mutex. The lease expires after `ttl` if the holder dies.
+        `renew=True` keeps extending it (every ttl/3) for as long as the block runs, so
+        `ttl` only bounds how long a crashed holder blocks the others."""
+        deadline = time.monotonic() + timeout
+        owner = self.try_acquire(name, ttl)
+        while owner is None:
+            if time.monotonic() >= deadline:
+                raise LockTimeout(f"Timeout acquiring shared lock '{name}'")
+            time.sleep(poll)
+            owner = self.try_acquire(name, ttl)
+        stop = threading.Event()
+        if renew:
+            threading.Thread(
+                target=self._keep_alive, args=(name, owner, ttl, stop), name=f"lease:{name}", daemon=True,
+            ).start()
+        try:
+            yield owner
+        finally:
+            stop.set()
+            self.release(name, owner)
+
+    def _keep_alive(self, name: str, owner: str, ttl: float, stop: threading.Event) -> None:
+        while not stop.wait(ttl / 3):
+            try:
+                if not self.renew(name, owner, ttl):
+                    print(f"⚠️ Lost shared lock '{name}' (lease expired)")
+                    return
+            except Exception as e:
+                print(f"❌ Error renewing shared lock '{name}': {str(e)}")
+
+
+_shared_cache: Optional[SharedCache] = None
+_shared_cache_guard = threading.Lock()
+
+def get_shared_cache() -> SharedCache:
+    """Return the process-wide SharedCache (lazily opened)."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_guard:
+            if _shared_cache is None:
+                _shared_cache = SharedCache()
+    return _shared_cache
@@ -0,0 +1,136 @@
+# single_flight.py
+"""
+Gộp các lời gọi giống nhau đang chạy đồng thời (single-flight).
+
+Khi nhiều request cùng hỏi một câu FAQ hay cùng xem một tuyến/ngày trong cùng một
+lúc, chỉ request đầu tiên (leader) thực sự chạy phép tính; các request đến sau với
+cùng key chờ và nhận chung kết quả (hoặc chung exception). Key được xóa ngay khi
+leader xong, nên đây không phải cache — chỉ gộp các lời gọi đang bay.
+
+- `do(key, fn, wait=None)`: đường sync (thread của FastAPI / LangGraph). `wait` giới
+  hạn thời gian chờ của request đến sau; hết giờ thì báo `SingleFlightTimeout` để
+  caller tự degrade theo budget của mình.
+- `ado(key, coro_fn, wait=None)`: đường async (coroutine trên event loop).
+
+Mỗi nhóm (`get_single_flight(name)`) đếm số lời gọi, số lần chạy thật và số lời gọi
+đã được gộp; xem `single_flight_metrics()`.
+"""
+
+from __future__ import annotations
+import asyncio
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlightTimeout(TimeoutError):
+    """A coalesced caller gave up waiting for the in-flight call."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Any, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.counts: Counter = Counter()
+
+    def _count(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self.counts[name] += 1
+
+    def do(self, key: Hashable, fn: Callable[[], Any], wait: Optional[float] = None) -> Any:
+        with self._lock:
+            self.counts["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counts["executions"] += 1
+            else:
+                self.counts["coalesced"] += 1
+        if not leader:
+            print(f"DEBUG: single-flight {self.name} coalesced {key!r}")
+            if not call.done.wait(wait):
+                self._count("wait_timeouts")
+                raise SingleFlightTimeout(f"{self.name}: in-flight call for {key!r} not done in {wait:.2f}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            self._count("errors")
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def ado(self, key: Hashable, coro_fn: Callable[[], Awaitable[Any]], wait: Optional[float] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            self.counts["calls"] += 1
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = loop.create_task(coro_fn())
+                self.counts["executions"] += 1
+                task.add_done_callback(lambda t: self._finish(task_key, t))
+            else:
+                self.counts["coalesced"] += 1
+                print(f"DEBUG: single-flight {self.name} coalesced {key!r}")
+        # shield: một caller bị hủy/hết giờ không hủy phép tính chung của các caller khác
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), wait)
+        except asyncio.TimeoutError:
+            self._count("wait_timeouts")
+            raise SingleFlightTimeout(f"{self.name}: in-flight call for {key!r} not done in {wait:.2f}s")
+
+    def _finish(self, task_key: Any, task: asyncio.Future) -> None:
+        with self._lock:
+            self._tasks.pop(task_key, None)
+            if not task.cancelled() and task.exception() is not None:
+                self.counts["errors"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+            in_flight = len(self._calls) + len(self._tasks)
+        calls = counts.get("calls", 0)
+        return {
+            "calls": calls,
+            "executions": counts.get("executions", 0),
+            "coalesced": counts.get("coalesced", 0),
+            "coalesced_ratio": round(counts.get("coalesced", 0) / calls, 3) if calls else 0.0,
+            "wait_timeouts": counts.get("wait_timeouts", 0),
+            "errors": counts.get("errors", 0),
+            "in_flight": in_flight,
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def single_flight_metrics() -> Dict[str, Dict[str, Any]]:
+    with _groups_lock:
+        groups = dict(_groups)
+    return {name: group.metrics() for name, group in groups.items()}
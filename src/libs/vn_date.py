@@ -0,0 +1,240 @@
+# vn_date.py
+"""
+Bộ phân tích ngày/giờ tiếng Việt bằng luật (không gọi LLM).
+
+Hiểu các cách nói thường gặp và quy về ISO `YYYY-MM-DD` (+ giờ `HH:MM` nếu có):
+- tuyệt đối: "2025-09-06", "6/9", "06-09-2025", "15 tháng 9", "mùng 5 tháng 10 năm 2025", "ngày 15"
+- tương đối: "hôm nay", "ngày mai", "ngày mốt", "ngày kia", "hôm qua", "3 ngày nữa"
+- thứ trong tuần: "thứ 7 tuần này", "chủ nhật tuần sau", "thứ hai tới", "ngày thứ 6", "cuối tuần"
+
+"mot" không dấu và "thứ N" đứng một mình (không có "ngày", "hôm", "tuần", "sáng"...
+trước hoặc "tuần này/sau" sau) có thể là "một" hoặc số thứ tự ("chuyến thứ 2") nên chỉ
+được confidence dưới DATE_CONFIDENCE_THRESHOLD; "mốt" gõ có dấu thì không.
+- giờ: "8h", "8h30", "20:15", "7 giờ tối"
+
+Mốc thời gian lấy từ clock có thể thay thế (`set_clock`, tham số `today`, hoặc env
+`DATE_PARSER_TODAY=2025-09-05` để cố định ngày khi demo với dữ liệu mẫu). Mỗi kết quả
+kèm `confidence` (0..1) để bên gọi quyết định có cần hỏi lại LLM hay không.
+"""
+
+from __future__ import annotations
+import os, re, unicodedata
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional
+
+DATE_PARSER_TODAY = os.getenv("DATE_PARSER_TODAY")  # ISO date, trống = ngày hiện tại
+# Dưới ngưỡng này kết quả chỉ là gợi ý, bên gọi vẫn hỏi LLM
+DATE_CONFIDENCE_THRESHOLD = float(os.getenv("DATE_CONFIDENCE_THRESHOLD", "0.8"))
+
+
+def _system_today() -> date:
+    if DATE_PARSER_TODAY:
+        return date.fromisoformat(DATE_PARSER_TODAY)
+    return datetime.now().date()
+
+
+_clock: Callable[[], date] = _system_today
+
+
+def set_clock(clock: Optional[Callable[[], date]]) -> None:
+    """Thay clock (test/eval); None = clock hệ thống."""
+    global _clock
+    _clock = clock or _system_today
+
+
+@dataclass
+class DateParse:
+    date: str                   # YYYY-MM-DD
+    time: Optional[str]         # HH:MM
+    confidence: float
+    start: int                  # vị trí đoạn khớp trong câu
+    end: int
+    rule: str
+
+
+def _fold(text: str) -> str:
+    """NFC + lowercase + bỏ dấu, giữ nguyên độ dài (mỗi ký tự NFC → 1 ký tự)."""
+    text = unicodedata.normalize("NFC", text).lower()
+    out = []
+    for ch in text:
+        if ch == "đ":
+            out.append("d")
+            continue
+        base = "".join(c for c in unicodedata.normalize("NFD", ch) if unicodedata.category(c) != "Mn")
+        out.append(base[:1] or ch)
+    return "".join(out)
+
+
+_WEEKDAYS = {  # thứ hai = Monday (0)
+    "2": 0, "hai": 0, "3": 1, "ba": 1, "4": 2, "tu": 2, "5": 3, "nam": 3,
+    "6": 4, "sau": 4, "7": 5, "bay": 5,
+}
+# (pattern trên text bỏ dấu, số ngày, confidence, tên luật, đuôi có dấu phải tránh / bắt buộc)
+# Bỏ dấu làm trùng "kia"/"kìa" và "mốt"/"một": nếu câu gõ có dấu thì dấu quyết định.
+# "mot" không dấu, không có từ chỉ ngày đứng trước dễ là "một" ("toi muon dat mot ve");
+# "mốt" gõ có dấu thì không nhầm được
+_RELATIVE = [
+    (r"\b(?:hom|bua|ngay|sang|trua|chieu|toi|dem) nay\b", 0, 0.95, "today", None, None),
+    (r"\b(?:ngay|sang|trua|chieu|toi) mai\b", 1, 0.95, "tomorrow", None, None),
+    (r"\b(?:ngay|hom) kia\b", 2, 0.85, "day_after", "kìa", None),
+    (r"\b(?:ngay|hom|bua|sang|trua|chieu) mot\b", 2, 0.85, "day_after", "một", None),
+    (r"\bmot\b", 2, 0.85, "day_after", None, "mốt"),
+    (r"\bmot\b", 2, 0.6, "day_after", "một", None),
+    (r"\bngay kia\b", 3, 0.8, "in_3_days", None, "kìa"),
+    (r"\b(?:hom|bua) qua\b", -1, 0.9, "yesterday", None, None),
+    (r"\bmai\b", 1, 0.75, "tomorrow", None, None),
+]
+# Từ chỉ ngày đứng ngay trước "thứ N": không có thì "thứ 2" có thể là thứ tự ("chuyến thứ 2")
+_WEEKDAY_CONTEXT_RE = re.compile(
+    r"\b(?:ngay|hom|bua|sang|trua|chieu|vao|tuan(?:\s+(nay|sau|toi|truoc))?)\s+$"
+)
+_TIME_RE = re.compile(
+    r"\b(?:luc\s+)?(\d{1,2})\s*(?:h|g|gio|:)\s*(\d{2})?(?:\s*(?:phut|p))?\s*(sang|trua|chieu|toi|dem)?\b"
+)
+
+
+def _valid(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _upcoming(today: date, month: int, day: int) -> Optional[date]:
+    """Ngày/tháng không có năm: năm nay, hoặc năm sau nếu đã qua."""
+    candidate = _valid(today.year, month, day)
+    if candidate and candidate < today:
+        candidate = _valid(today.year + 1, month, day)
+    return candidate
+
+
+def _year(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    year = int(value)
+    return 2000 + year if year < 100 else year
+
+
+def _parse_time(folded: str) -> Optional[str]:
+    m = _TIME_RE.search(folded)
+    if not m:
+        return None
+    hour, minute, period = int(m.group(1)), int(m.group(2) or 0), m.group(3)
+    if period in ("chieu", "toi") and hour < 12:
+        hour += 12
+    elif period == "dem" and 6 <= hour < 12:
+        hour += 12
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _candidates(text: str, folded: str, today: date) -> List[DateParse]:
+    found: List[DateParse] = []
+
+    def add(d: Optional[date], conf: float, m: re.Match, rule: str, start: Optional[int] = None) -> None:
+        if d:
+            found.append(DateParse(d.isoformat(), None, conf, m.start() if start is None else start, m.end(), rule))
+
+    for m in re.finditer(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b", folded):
+        add(_valid(int(m.group(1)), int(m.group(2)), int(m.group(3))), 1.0, m, "iso")
+
+    for m in re.finditer(r"(?<![\d-])(\d{1,2})[/.-](\d{1,2})(?:[/.-](\d{2,4}))?\b(?![/.-]\d)", folded):
+        day, month, year = int(m.group(1)), int(m.group(2)), _year(m.group(3))
+        if year:
+            add(_valid(year, month, day), 0.98, m, "dmy")
+        elif "." not in m.group(0):  # "6.5" thường là số thập phân
+            add(_upcoming(today, month, day), 0.9, m, "dm")
+
+    for m in re.finditer(
+        r"\b(?:(?:ngay|mung|mong)\s+)?(\d{1,2})\s+thang\s+(\d{1,2})(?:\s*(?:nam|,)?\s*(\d{4}))?\b", folded
+    ):
+        day, month, year = int(m.group(1)), int(m.group(2)), _year(m.group(3))
+        add(_valid(year, month, day) if year else _upcoming(today, month, day), 0.95, m, "day_month")
+
+    for pattern, delta, conf, rule, avoid, require in _RELATIVE:
+        for m in re.finditer(pattern, folded):
+            raw = text[m.start():m.end()]
+            if (avoid and raw.endswith(avoid)) or (require and not raw.endswith(require)):
+                continue
+            add(today + timedelta(days=delta), conf, m, rule)
+
+    for m in re.finditer(r"\b(\d{1,2})\s+ngay\s+(?:nua|toi)\b|\bsau\s+(\d{1,2})\s+ngay\b", folded):
+        add(today + timedelta(days=int(m.group(1) or m.group(2))), 0.85, m, "in_n_days")
+
+    weekday_re = (
+        r"\b(?:(thu)\s+(2|3|4|5|6|7|hai|ba|tu|nam|sau|bay)|(chu nhat|cn))"
+        r"(?:\s+(tuan\s+(?:nay|sau|toi|truoc)|(?:sau|toi)))?\b"
+    )
+    for m in re.finditer(weekday_re, folded):
+        if m.group(2) == "tu" and text[m.start(2):m.end(2)] == "tự":  # "thứ tự"
+            continue
+        target = 6 if m.group(3) else _WEEKDAYS[m.group(2)]
+        context = _WEEKDAY_CONTEXT_RE.search(folded[:m.start()])
+        qualifier = (m.group(4) or "").replace("tuan ", "").strip() or (context and context.group(1)) or ""
+        monday = today - timedelta(days=today.weekday())
+        if qualifier == "nay":
+            d, conf = monday + timedelta(days=target), 0.9
+        elif qualifier in ("sau", "toi"):
+            d, conf = monday + timedelta(days=7 + target), 0.9
+        elif qualifier == "truoc":
+            d, conf = monday + timedelta(days=target - 7), 0.85
+        else:  # không nói tuần nào: lần tới gần nhất (kể cả hôm nay)
+            d = today + timedelta(days=(target - today.weekday()) % 7)
+            conf = 0.8 if context or m.group(3) == "chu nhat" else 0.6
+        add(d, conf, m, "weekday", context.start() if context else None)
+
+    for m in re.finditer(r"\bcuoi tuan(?:\s+(nay|sau|toi))?\b", folded):
+        monday = today - timedelta(days=today.weekday())
+        add(monday + timedelta(days=5 + (7 if m.group(1) in ("sau", "toi") else 0)), 0.7, m, "weekend")
+
+    for m in re.finditer(r"\b(?:ngay|mung|mong)\s+(\d{1,2})\b(?!\s*(?:thang|[/.-]\d|ngay))", folded):
+        day = int(m.group(1))
+        d = _valid(today.year, today.month, day)
+        if d and d < today:
+            next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+            d = _valid(next_month.year, next_month.month, day)
+        add(d, 0.7, m, "day_only")
+    return found
+
+
+def parse_vn_date(text: str, today: Optional[date] = None) -> Optional[DateParse]:
+    """Ngày (và giờ) tốt nhất trong câu, None nếu không thấy. Ưu tiên confidence cao,
+    rồi đoạn khớp dài hơn, rồi vị trí sớm hơn."""
+    if not text:
+        return None
+    today = today or _clock()
+    nfc = unicodedata.normalize("NFC", text).lower()
+    folded = _fold(nfc)
+    found = _candidates(nfc, folded, today)
+    if not found:
+        return None
+    best = max(found, key=lambda p: (p.confidence, p.end - p.start, -p.start))
+    # Giờ: tìm ngoài đoạn ngày đã khớp để "6/9" không bị đọc thành 6 giờ
+    rest = folded[:best.start] + " " * (best.end - best.start) + folded[best.end:]
+    best.time = _parse_time(rest)
+    return best
+
+
+# Từ đệm/hư từ: câu chỉ gồm các từ này cùng ngày/giờ (hoặc mã) là câu bổ sung thông tin
+FILLER_WORDS = {
+    "a", "ah", "nhe", "nha", "vay", "thi", "sao", "con", "ngay", "vao", "la", "nhu", "the",
+    "ok", "oke", "duoc", "khong", "k", "em", "anh", "chi", "minh", "cho", "luc", "hay",
+    "hoac", "roi", "sang", "di",
+}
+
+
+def strip_date(text: str, parsed: Optional[DateParse]) -> str:
+    """Câu (bỏ dấu, chữ thường) sau khi xóa đoạn ngày đã khớp và các cụm giờ."""
+    folded = _fold(unicodedata.normalize("NFC", text or ""))
+    if parsed:
+        folded = folded[:parsed.start] + " " + folded[parsed.end:]
+    return _TIME_RE.sub(" ", folded)
+
+
+def is_date_only(text: str, parsed: Optional[DateParse]) -> bool:
+    """Câu chỉ bổ sung ngày/giờ ("ngày mai nhé", "còn thứ 7 tuần sau thì sao")."""
+    if not parsed:
+        return False
+    return all(w in FILLER_WORDS for w in re.findall(r"[a-z0-9]+", strip_date(text, parsed)))
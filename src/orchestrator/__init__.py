@@ -1,12 +1,12 @@
 # orchestrator/__init__.py
 """
 Orchestrator package for Vexere chatbot.
+
+The graph is not built on import: callers compile it explicitly with
+`graph.compile_graph()`, so lightweight submodules (faq_config, faq_ingest, ...)
+can be imported by CLIs without building it.
 """
 
-from .graph import compile_graph
 from .types import State
 
-# Main graph instance
-app_graph = compile_graph()
-
-__all__ = ["app_graph", "State"]
+__all__ = ["State"]
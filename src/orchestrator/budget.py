@@ -0,0 +1,62 @@
+"""
+Per-turn latency budget.
+
+`chat_api` puts an absolute deadline in the graph config
+(`config["configurable"]["turn_deadline"]`, epoch seconds), counted from the moment
+the request arrived. Each node checks the
+remaining budget before expensive work and degrades instead of blowing through it:
+
+- classify / apply:  local extraction tiers only, no LLM call
+- faq:               lexical (BM25) search only, no query embedding
+- view_trips:        last cached availability for the route/date instead of the API
+- image / audio:     media analysis skipped
+
+Nodes report what they did in `State.degradations`, which `ChatOut` returns.
+Without a deadline in the config (CLI, scripts) nothing is degraded.
+"""
+
+import os
+import time
+from typing import Any, Dict, Optional
+
+TURN_BUDGET_S = float(os.getenv("TURN_BUDGET_S", "8"))
+# Minimum budget left to still try each expensive step
+LLM_MIN_BUDGET_S = float(os.getenv("LLM_MIN_BUDGET_S", "1.5"))
+FAQ_VECTOR_MIN_BUDGET_S = float(os.getenv("FAQ_VECTOR_MIN_BUDGET_S", "1.0"))
+MEDIA_MIN_BUDGET_S = float(os.getenv("MEDIA_MIN_BUDGET_S", "3.0"))
+HTTP_MIN_BUDGET_S = float(os.getenv("HTTP_MIN_BUDGET_S", "0.5"))
+# Upper bound for loopback HTTP calls to the booking API
+BOOKING_API_TIMEOUT_S = float(os.getenv("BOOKING_API_TIMEOUT_S", "5"))
+# Time kept back for the nodes after the current one (formatting, checkpoint write)
+BUDGET_RESERVE_S = float(os.getenv("BUDGET_RESERVE_S", "0.3"))
+
+
+def turn_config(thread_id: str, budget_s: Optional[float] = None, started_at: Optional[float] = None) -> Dict[str, Any]:
+    """Graph config for one chat turn with its deadline. `started_at` (epoch seconds) is
+    when the request arrived, so admission queueing and waiting for the thread's previous
+    turn are spent from the same budget; default now."""
+    budget = TURN_BUDGET_S if budget_s is None else budget_s
+    started = time.time() if started_at is None else started_at
+    return {"configurable": {"thread_id": thread_id, "turn_deadline": started + budget}}
+
+
+def remaining(config: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Seconds left in this turn (None = no deadline)."""
+    deadline = ((config or {}).get("configurable") or {}).get("turn_deadline")
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def has_budget(config: Optional[Dict[str, Any]], needed: float) -> bool:
+    left = remaining(config)
+    return left is None or left >= needed
+
+
+def call_timeout(config: Optional[Dict[str, Any]], cap: Optional[float] = None) -> Optional[float]:
+    """Timeout for one downstream call: what is left minus the reserve, at most `cap`."""
+    left = remaining(config)
+    if left is None:
+        return cap
+    left = max(0.1, left - BUDGET_RESERVE_S)
+    return min(left, cap) if cap else left
@@ -0,0 +1,271 @@
+"""
+Tiered field extraction: cheap local tiers first, the LLM only when needed.
+
+Tiers run in order and each one only overwrites a field it finds with a higher
+confidence than what is already there:
+
+1. regex   – booking_id (VX…), trip_id (T…)
+2. date    – rule-based Vietnamese date parser (src/libs/vn_date.py)
+3. places  – alias automaton (places.py), canonical route_from/route_to
+4. intent  – keyword rules over diacritic-folded text (+ complaint fields)
+5. llm     – structured-output extraction (llm_extractor.py) on the model picked by
+             model_router.py (fast model first, escalation on bad answers)
+
+The engine stops before the LLM as soon as the turn is resolved: the intent and the
+fields that intent needs are all above EXTRACT_CONFIDENCE_THRESHOLD, or the turn only
+supplies fields ("VX123456", "T002", "ngày mai nhé") so the intent comes from the
+conversation. Every field records the tier that produced it.
+
+`parse_awaited_reply` is the even cheaper path for follow-up turns: when the graph is
+waiting for one field (State.awaiting) and the reply is just that value, it is
+validated here and the graph skips media ingest and classification entirely.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from src.libs.llm_gateway import LLMGatewayError
+from src.libs.vn_date import FILLER_WORDS, parse_vn_date, strip_date
+from .model_router import get_model_router
+from .places import FROM_MARKERS, TO_MARKERS, canonicalize_place, extract_route, find_places, get_place_matcher
+from .text_norm import fold_diacritics, normalize_text
+
+EXTRACT_CONFIDENCE_THRESHOLD = float(os.getenv("EXTRACT_CONFIDENCE_THRESHOLD", "0.8"))
+# Confidence given to fields returned by the LLM tier
+LLM_FIELD_CONFIDENCE = float(os.getenv("LLM_FIELD_CONFIDENCE", "0.85"))
+
+FIELDS = ("intent", "booking_id", "date", "trip_id", "route_from", "route_to", "complaint_type", "description")
+
+# Fields an intent cannot proceed without (missing ones are asked for by the nodes;
+# we only go to the LLM when it could plausibly find them)
+REQUIRED_FIELDS: Dict[str, Sequence[str]] = {
+    "change_time": ("booking_id",),
+    "check_booking": ("booking_id",),
+    "cancel_booking": ("booking_id",),
+    "get_invoice": ("booking_id",),
+    "view_trips": ("route_from", "route_to"),
+    "create_complaint": ("complaint_type", "description"),
+    "faq": (),
+}
+
+# (intent, folded keywords, confidence) – first match wins, so specific intents come first
+INTENT_RULES = [
+    ("create_complaint", ("khieu nai", "phan anh", "to cao", "buc xuc"), 0.9),
+    ("cancel_booking", ("huy ve", "huy chuyen", "huy dat", "huy booking", "khong di nua"), 0.9),
+    ("get_invoice", ("hoa don", "vat"), 0.9),
+    ("change_time", ("doi gio", "doi chuyen", "doi ve", "doi ngay", "doi lich", "doi sang", "chuyen sang"), 0.9),
+    ("check_booking", ("kiem tra ve", "thong tin ve", "xem ve", "tra cuu ve", "check ve", "ve cua toi"), 0.9),
+    ("view_trips", ("xem chuyen", "lich trinh", "danh sach chuyen", "chuyen nao", "con chuyen", "co chuyen"), 0.85),
+    ("faq", ("lam the nao", "lam sao", "chinh sach", "quy dinh", "giay to", "thu tuc", "hanh ly",
+             "hoan tien", "bao lau", "co duoc", "the nao"), 0.8),
+]
+COMPLAINT_TYPES = [
+    ("REFUND", ("hoan tien", "tra tien", "refund"), 0.85),
+    ("CANCELLATION", ("huy", "bi huy"), 0.8),
+    ("SERVICE", ("tai xe", "nha xe", "phuc vu", "thai do", "tre gio", "xe tre", "don tre"), 0.8),
+]
+
+def _keyword_re(keywords: Sequence[str]) -> "re.Pattern":
+    return re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")\b")
+
+
+_INTENT_PATTERNS = [(intent, _keyword_re(keywords), conf) for intent, keywords, conf in INTENT_RULES]
+_COMPLAINT_PATTERNS = [(ctype, _keyword_re(keywords), conf) for ctype, keywords, conf in COMPLAINT_TYPES]
+_BOOKING_RE = re.compile(r"\b(VX\d{5,12})\b", flags=re.IGNORECASE)
+_TRIP_RE = re.compile(r"\b(T\d{2,6})\b", flags=re.IGNORECASE)
+# Confidence of an id when the turn mentions several different ones ("T001 hay T002"):
+# below the threshold, so the LLM (or the user) decides which one is meant
+AMBIGUOUS_ID_CONFIDENCE = 0.5
+
+
+@dataclass
+class FieldValue:
+    value: Optional[str]
+    confidence: float
+    tier: str
+
+
+@dataclass
+class ExtractionResult:
+    fields: Dict[str, FieldValue] = field(default_factory=dict)
+    tiers: List[str] = field(default_factory=list)  # tiers that ran, in order
+    stopped_after: Optional[str] = None
+    degraded: Optional[str] = None  # why the LLM tier was skipped or failed (budget, gateway error)
+    models: List[str] = field(default_factory=list)  # LLMs called by the llm tier (model_router.py)
+
+    def put(self, name: str, value: Optional[str], confidence: float, tier: str) -> None:
+        if value and confidence > self.confidence(name):
+            self.fields[name] = FieldValue(value, confidence, tier)
+
+    def get(self, name: str) -> Optional[str]:
+        fv = self.fields.get(name)
+        return fv.value if fv else None
+
+    def confidence(self, name: str) -> float:
+        fv = self.fields.get(name)
+        return fv.confidence if fv else 0.0
+
+    def resolved(self, name: str, threshold: float = EXTRACT_CONFIDENCE_THRESHOLD) -> bool:
+        return self.confidence(name) >= threshold
+
+    def values(self) -> Dict[str, Optional[str]]:
+        """Same shape as `extract_fields_llm` output."""
+        return {name: self.get(name) for name in FIELDS}
+
+    def sources(self) -> Dict[str, str]:
+        return {name: fv.tier for name, fv in self.fields.items()}
+
+    @property
+    def llm_called(self) -> bool:
+        return "llm" in self.tiers
+
+
+# --- Tiers ---
+
+def regex_tier(text: str, result: ExtractionResult) -> None:
+    for name, pattern, confidence in (("booking_id", _BOOKING_RE, 0.99), ("trip_id", _TRIP_RE, 0.97)):
+        found = list(dict.fromkeys(m.upper() for m in pattern.findall(text)))
+        if found:
+            result.put(name, found[0], confidence if len(found) == 1 else AMBIGUOUS_ID_CONFIDENCE, "regex")
+
+
+def date_tier(text: str, result: ExtractionResult) -> None:
+    parsed = parse_vn_date(text)
+    if parsed:
+        result.put("date", parsed.date, parsed.confidence, "date")
+
+
+def places_tier(text: str, result: ExtractionResult) -> None:
+    for name, value in extract_route(text).items():
+        result.put(name, value, 0.9, "places")
+
+
+def intent_tier(text: str, result: ExtractionResult) -> None:
+    folded = " ".join(fold_diacritics(text.lower()).split())
+    for intent, pattern, confidence in _INTENT_PATTERNS:
+        if pattern.search(folded):
+            result.put("intent", intent, confidence, "intent")
+            break
+    else:
+        if result.get("route_from") and result.get("route_to"):
+            result.put("intent", "view_trips", 0.85, "intent")
+        elif folded.rstrip().endswith("?"):
+            result.put("intent", "faq", 0.6, "intent")
+    if result.get("intent") == "create_complaint":
+        result.put("description", text.strip(), 0.8, "intent")
+        for complaint_type, pattern, confidence in _COMPLAINT_PATTERNS:
+            if pattern.search(folded):
+                result.put("complaint_type", complaint_type, confidence, "intent")
+                break
+
+
+def llm_tier(text: str, result: ExtractionResult, timeout: Optional[float] = None) -> None:
+    try:
+        answer = get_model_router().extract(text, result, REQUIRED_FIELDS, timeout=timeout)
+    except LLMGatewayError as e:
+        print(f"⚠️ LLM extraction unavailable, using local tiers only: {str(e)}")
+        result.degraded = "llm_unavailable"
+        return
+    result.models = answer.models
+    for name in FIELDS:
+        value = answer.data.get(name)
+        if name in ("route_from", "route_to"):
+            value = canonicalize_place(value) or value
+        if name == "intent" and value == "unknown":
+            continue
+        result.put(name, value, LLM_FIELD_CONFIDENCE, "llm")
+
+
+LOCAL_TIERS: List[Callable[[str, ExtractionResult], None]] = [regex_tier, date_tier, places_tier, intent_tier]
+_TIER_NAMES = {regex_tier: "regex", date_tier: "date", places_tier: "places", intent_tier: "intent", llm_tier: "llm"}
+
+
+# --- Early exit ---
+
+_MARKERS = {fold_diacritics(m) for m in FROM_MARKERS | TO_MARKERS}
+# Words that may surround an id in a reply ("chọn chuyến T002", "lấy mã T001"), folded
+_ID_REPLY_WORDS = {"chuyen", "ma", "chon", "lay"}
+
+
+def is_fields_only(text: str) -> bool:
+    """The turn only supplies ids/date/places ("VX123456", "chuyến T002 nhé", "thứ 7 tuần sau")."""
+    rest = strip_date(text, parse_vn_date(text))
+    has_id = bool(_BOOKING_RE.search(rest) or _TRIP_RE.search(rest))
+    rest = _TRIP_RE.sub(" ", _BOOKING_RE.sub(" ", rest))
+    sylls = normalize_text(rest).split()
+    covered = set()
+    for match in get_place_matcher().find(sylls):
+        covered.update(range(match.start, match.end))
+    leftover = [
+        s for i, s in enumerate(sylls)
+        if i not in covered and s not in _MARKERS and not (has_id and s in _ID_REPLY_WORDS)
+    ]
+    return all(s in FILLER_WORDS for s in leftover)
+
+
+def is_resolved(text: str, result: ExtractionResult, required: Optional[Sequence[str]] = None,
+                threshold: float = EXTRACT_CONFIDENCE_THRESHOLD) -> bool:
+    if required is not None:
+        return all(result.resolved(name, threshold) for name in required)
+    intent = result.get("intent")
+    if result.resolved("intent", threshold):
+        return all(result.resolved(name, threshold) for name in REQUIRED_FIELDS.get(intent, ()))
+    # No intent in this turn: fine if it only supplies confident fields (the intent is the conversation's)
+    return (
+        not result.fields.get("intent") and bool(result.fields)
+        and all(fv.confidence >= threshold for fv in result.fields.values())
+        and is_fields_only(text)
+    )
+
+
+# Fields the graph can wait for between turns
+AWAITABLE_FIELDS = ("trip_id",)
+
+
+def parse_awaited_reply(text: str, awaiting: Optional[str], options: Optional[Sequence[str]] = None) -> Optional[str]:
+    """Value of the awaited field when the turn is only that answer ("T001", "chuyến T002 nhé").
+
+    None when the reply does not fit: another field/date/place is mentioned, several
+    candidates, or a value outside `options` (the trips that were offered).
+    """
+    if awaiting not in AWAITABLE_FIELDS or not text:
+        return None
+    trips = {m.upper() for m in _TRIP_RE.findall(text)}
+    if len(trips) != 1 or _BOOKING_RE.search(text) or parse_vn_date(text) or find_places(text):
+        return None
+    if not is_fields_only(text):
+        return None
+    trip = trips.pop()
+    if options and trip not in {o.upper() for o in options}:
+        return None
+    return trip
+
+
+def extract_fields(text: str, required: Optional[Sequence[str]] = None,
+                   threshold: float = EXTRACT_CONFIDENCE_THRESHOLD, use_llm: bool = True,
+                   timeout: Optional[float] = None) -> ExtractionResult:
+    """Run the tiers in order and stop once the turn is resolved.
+
+    `required`: fields the caller needs (e.g. ["trip_id"] when waiting for a trip);
+    by default the detected intent and its REQUIRED_FIELDS.
+    `timeout`: budget for the LLM tier (see budget.py).
+    """
+    result = ExtractionResult()
+    for tier in LOCAL_TIERS:
+        tier(text or "", result)
+        result.tiers.append(_TIER_NAMES[tier])
+        if required is not None and is_resolved(text, result, required, threshold):
+            break
+    resolved = is_resolved(text, result, required, threshold)
+    if resolved or not use_llm:
+        result.stopped_after = result.tiers[-1]
+        if not resolved:
+            result.degraded = "llm_skipped"
+    else:
+        llm_tier(text or "", result, timeout=timeout)
+        result.tiers.append("llm")
+        result.stopped_after = "llm"
+    print(f"DEBUG: Extraction tiers={result.tiers} sources={result.sources()}")
+    return result
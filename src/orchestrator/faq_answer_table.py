@@ -0,0 +1,149 @@
+"""
+Exact-match FAQ answer table with popularity tracking.
+
+Maps normalized question text (NFC, lowercase, diacritics kept: questions that differ
+only in tone marks are different questions) → fully rendered FAQ answer. A query typed
+without any diacritics falls back to the diacritic-folded form of the seeded CSV
+questions when that form is unambiguous. Seeded from the CSV
+questions and grown from real traffic: every lookup is counted, and once a
+phrasing reaches `FAQ_HOT_THRESHOLD` lookups (summed over all workers via the
+shared store) its rendered answer is promoted into the table. A hit is a dict
+lookup – no embedding call, no Chroma query.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import Counter
+from typing import Dict, Optional, Sequence, Union
+
+from src.libs.shared_cache import get_shared_cache
+from .text_norm import has_diacritics, normalize_exact, normalize_text
+
+FAQ_HOT_THRESHOLD = int(os.getenv("FAQ_HOT_THRESHOLD", "5"))
+FAQ_HOT_MAX_ENTRIES = int(os.getenv("FAQ_HOT_MAX_ENTRIES", "5000"))
+# Local lookup counts are pushed to the shared store in batches
+FAQ_HOT_FLUSH_EVERY = int(os.getenv("FAQ_HOT_FLUSH_EVERY", "50"))
+FAQ_HOT_FLUSH_INTERVAL = float(os.getenv("FAQ_HOT_FLUSH_INTERVAL", "10"))
+
+def _key_hash(key: str) -> str:
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+class FAQAnswerTable:
+    """Normalized question → rendered answer, scoped to one FAQ corpus version."""
+
+    def __init__(self, corpus_hash: str):
+        self.corpus_hash = corpus_hash
+        # Seeded CSV questions point at their row (answer text is read from `rows` on a hit)
+        self.answers: Dict[str, Union[str, int]] = {}
+        # Folded CSV question → its row, None when several questions fold to the same text
+        self.folded: Dict[str, Optional[int]] = {}
+        self.rows: Sequence[Dict[str, str]] = []
+        self.pending_counts: Counter = Counter()
+        self.global_counts: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.promoted = 0
+        self._pending_total = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Shared-store key layout (namespaced by corpus so a new CSV starts clean)
+    # (v2: keys keep diacritics; v1 entries were keyed on folded text)
+    def _count_key(self, key: str) -> str:
+        return f"faq_hot:v2:{self.corpus_hash}:count:{_key_hash(key)}"
+
+    def _answer_prefix(self) -> str:
+        return f"faq_hot:v2:{self.corpus_hash}:answer:"
+
+    def seed(self, faq_data: Sequence[Dict[str, str]]) -> None:
+        """Add every CSV question (its rendered answer is the answer itself) and
+        every phrasing already promoted by any worker."""
+        self.rows = faq_data
+        for row, item in enumerate(faq_data):
+            key = normalize_exact(item['question'])
+            self.answers.setdefault(key, row)
+            folded = normalize_text(item['question'])
+            self.folded[folded] = row if self.folded.get(folded, row) == row else None
+        self.load_promoted()
+
+    def load_promoted(self) -> None:
+        """Pull phrasings promoted by other workers from the shared store."""
+        try:
+            for _, entry in get_shared_cache().items(self._answer_prefix()):
+                if len(self.answers) >= FAQ_HOT_MAX_ENTRIES:
+                    break
+                self.answers.setdefault(entry["query"], entry["answer"])
+        except Exception as e:
+            print(f"❌ Error loading hot FAQ answers: {str(e)}")
+
+    def lookup(self, query: str) -> Optional[str]:
+        """Return the rendered answer for an exact (normalized) match and count the lookup."""
+        key = normalize_exact(query)
+        with self._lock:
+            self.pending_counts[key] += 1
+            self._pending_total += 1
+            answer = self.answers.get(key)
+            if answer is None and key and not has_diacritics(key):
+                # Typed without diacritics: only a seeded question that folds to it unambiguously
+                answer = self.folded.get(key)
+            if isinstance(answer, int):
+                answer = self.rows[answer]['answer']
+            if answer is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            should_flush = (
+                self._pending_total >= FAQ_HOT_FLUSH_EVERY
+                or time.monotonic() - self._last_flush >= FAQ_HOT_FLUSH_INTERVAL
+            )
+        if should_flush:
+            self.flush()
+        return answer
+
+    def popularity(self, key: str) -> int:
+        return self.global_counts.get(key, 0) + self.pending_counts.get(key, 0)
+
+    def observe(self, query: str, rendered_answer: str) -> bool:
+        """Promote `query` → `rendered_answer` once the phrasing is hot. Returns True if promoted."""
+        key = normalize_exact(query)
+        if not key or key in self.answers or len(self.answers) >= FAQ_HOT_MAX_ENTRIES:
+            return False
+        if self.popularity(key) < FAQ_HOT_THRESHOLD:
+            return False
+        with self._lock:
+            self.answers[key] = rendered_answer
+            self.promoted += 1
+        try:
+            get_shared_cache().set(
+                self._answer_prefix() + _key_hash(key), {"query": key, "answer": rendered_answer}
+            )
+        except Exception as e:
+            print(f"❌ Error publishing hot FAQ answer: {str(e)}")
+        return True
+
+    def flush(self) -> None:
+        """Push pending lookup counts to the shared store and refresh global counts."""
+        with self._lock:
+            pending, self.pending_counts = self.pending_counts, Counter()
+            self._pending_total = 0
+            self._last_flush = time.monotonic()
+        try:
+            cache = get_shared_cache()
+            if len(self.global_counts) > FAQ_HOT_MAX_ENTRIES * 10:
+                # Long tail of one-off phrasings: forget local copies, shared counts remain
+                self.global_counts.clear()
+            for key, delta in pending.items():
+                self.global_counts[key] = cache.incr(self._count_key(key), delta)
+        except Exception as e:
+            print(f"❌ Error flushing FAQ popularity counts: {str(e)}")
+        self.load_promoted()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.answers),
+            "hits": self.hits,
+            "misses": self.misses,
+            "promoted": self.promoted,
+        }
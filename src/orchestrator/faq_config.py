@@ -0,0 +1,76 @@
+"""
+Shared configuration for the FAQ index (embedding model, ChromaDB location, ingestion).
+"""
+
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Embeddings
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+# Optional shortened vectors via the API's `dimensions` parameter (0 = model default, 1536)
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+# Serving-side vector storage: none (Chroma float32) | float16 | int8
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none")
+
+# ChromaDB configuration
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "src/data/chroma_db")
+COLLECTION_NAME = "faq_embeddings"
+
+def collection_name_for(corpus_hash: str) -> str:
+    """One collection per CSV version, so a new index is built next to the one being served."""
+    return f"{COLLECTION_NAME}_{corpus_hash[:12]}" if corpus_hash else COLLECTION_NAME
+
+# Serving backend: chroma (per-worker Chroma client) | mmap (one read-only index file
+# mapped by every worker, built from Chroma when missing or stale)
+FAQ_INDEX_BACKEND = os.getenv("FAQ_INDEX_BACKEND", "chroma")
+FAQ_INDEX_PATH = os.getenv("FAQ_INDEX_PATH", "src/data/faq_index.bin")
+# Verify the index file checksum before serving it
+FAQ_INDEX_VERIFY = os.getenv("FAQ_INDEX_VERIFY", "1") == "1"
+# Index file missing / built for another CSV or settings: rebuild (via Chroma, logged) | fail (refuse to start)
+FAQ_INDEX_ON_MISMATCH = os.getenv("FAQ_INDEX_ON_MISMATCH", "rebuild")
+if FAQ_INDEX_ON_MISMATCH not in ("rebuild", "fail"):
+    raise ValueError(f"Unknown FAQ_INDEX_ON_MISMATCH: {FAQ_INDEX_ON_MISMATCH}")
+
+# Hot reload: poll the CSV (and the reload generation shared by workers) every N seconds; 0 = off
+FAQ_WATCH_INTERVAL = float(os.getenv("FAQ_WATCH_INTERVAL", "10"))
+
+# ANN index (Chroma HNSW). Distance: cosine | l2 (squared) | ip
+DISTANCE_METRICS = ("cosine", "l2", "ip")
+FAQ_DISTANCE_METRIC = os.getenv("FAQ_DISTANCE_METRIC", "cosine")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", "100"))
+HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", "10"))
+if FAQ_DISTANCE_METRIC not in DISTANCE_METRICS:
+    raise ValueError(f"Unknown FAQ_DISTANCE_METRIC: {FAQ_DISTANCE_METRIC}")
+
+def hnsw_metadata(
+    space: str = FAQ_DISTANCE_METRIC, m: int = HNSW_M,
+    construction_ef: int = HNSW_CONSTRUCTION_EF, search_ef: int = HNSW_SEARCH_EF,
+) -> dict:
+    return {"hnsw:space": space, "hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+
+def collection_metadata() -> dict:
+    """Chroma collection metadata; a mismatch with the stored one triggers a rebuild."""
+    return {
+        "description": "FAQ embeddings for Vexere chatbot",
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_dimensions": EMBEDDING_DIMENSIONS or 0,
+        **hnsw_metadata(),
+    }
+
+def distance_to_similarity(distance: float, space: str = FAQ_DISTANCE_METRIC) -> float:
+    """Chroma distance → cosine similarity (embeddings are unit-length).
+    cosine: d = 1 - cos; ip: d = 1 - dot = 1 - cos; l2: d = |a-b|^2 = 2 - 2cos."""
+    if space == "l2":
+        return 1 - distance / 2
+    return 1 - distance
+
+# Streaming ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "4"))
+
+# Default faq path after src/ move
+DEFAULT_FAQ_PATH = os.getenv("FAQ_CSV_PATH") or (Path(__file__).resolve().parents[1] / "data" / "faq_data.csv").as_posix()
@@ -0,0 +1,288 @@
+"""
+Read-only, memory-mapped FAQ index file shared by all worker processes.
+
+Layout:
+  [0:8]      magic b"VXFAQIDX"
+  [8:12]     format version (uint32, little endian)
+  [12:16]    header JSON length (uint32)
+  [16:...]   header JSON: version, csv hash, model, rows, dims, quantization and
+             {name: {offset, dtype, shape}} for every section
+  HEADER_BYTES onwards, 64-byte aligned sections:
+             vectors        rows x dims (float32 | float16 | int8)
+             scales         rows float32 (int8 only)
+             text_offsets   2*rows+1 uint64 into `text` (question_i, answer_i, ...)
+             text           UTF-8 question/answer blob
+             + any extra arrays (BM25 postings, vocab, ...)
+
+Every process maps the same file with mmap, so vectors, FAQ text and the lexical
+index live once in the page cache whatever the worker count. Writers build a temp
+file and os.replace() it: processes that still map the old file keep a valid view
+until they remap.
+"""
+
+import os
+import json
+import mmap
+import time
+import uuid
+import struct
+import hashlib
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.libs.llm_client import LLM_BACKEND
+from .faq_config import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS
+from .lexical_index import BM25Index
+from .vector_store import VectorStore, QUANTIZATIONS
+
+MAGIC = b"VXFAQIDX"
+FORMAT_VERSION = 1
+HEADER_BYTES = 4096
+_ALIGN = 64
+_DTYPES = {"none": np.float32, "float16": np.float16, "int8": np.int8}
+
+class FAQIndexMismatch(RuntimeError):
+    """The index file cannot be served for the current CSV/settings and fallback is disabled."""
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def pack_strings(strings: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 blob + offsets (len n+1), the layout used for FAQ text and the BM25 vocab."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded], dtype=np.uint64)
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def expected_index_meta(csv_hash: str, quantization: str) -> Dict[str, Any]:
+    """Header fields an index file must carry to be served for this CSV and these settings."""
+    return {
+        "csv_hash": csv_hash,
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_dimensions": EMBEDDING_DIMENSIONS or 0,
+        "llm_backend": LLM_BACKEND,
+        "quantization": quantization,
+    }
+
+def header_mismatches(header: Optional[Dict[str, Any]], expected: Dict[str, Any]) -> List[str]:
+    """Human-readable differences between an index header and `expected` ([] = usable)."""
+    if header is None:
+        return ["missing or not a FAQ index file"]
+    return [
+        f"{key}: index has {header.get(key)!r}, expected {value!r}"
+        for key, value in expected.items() if header.get(key) != value
+    ]
+
+def lexical_index_arrays(index: BM25Index, self_scores: Sequence) -> Dict[str, np.ndarray]:
+    """BM25 index + self scores as flat arrays for the index file."""
+    vocab_blob, vocab_offsets = pack_strings(index.vocab)  # dict order == term id
+    return {
+        **{f"bm25_{name}": array for name, array in index.to_arrays().items()},
+        "bm25_vocab": vocab_blob,
+        "bm25_vocab_offsets": vocab_offsets,
+        "lexical_self_scores": np.asarray(self_scores, dtype=np.float32),
+    }
+
+def _body_sha256(buffer, start: int, end: int) -> str:
+    digest = hashlib.sha256()
+    view = memoryview(buffer)
+    for offset in range(start, end, 1 << 24):
+        digest.update(view[offset:min(offset + (1 << 24), end)])
+    return digest.hexdigest()
+
+def read_header(path: str) -> Optional[Dict[str, Any]]:
+    """Header of the index file at `path`, or None if missing/invalid."""
+    try:
+        with open(path, "rb") as file:
+            prefix = file.read(16)
+            if len(prefix) < 16 or prefix[:8] != MAGIC:
+                return None
+            fmt, length = struct.unpack("<II", prefix[8:16])
+            if fmt != FORMAT_VERSION:
+                return None
+            return json.loads(file.read(length).decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def write_faq_index(
+    path: str,
+    faq_data: Sequence,
+    embedding_chunks: Iterable[np.ndarray],
+    quantization: str = "none",
+    meta: Optional[Dict[str, Any]] = None,
+    arrays: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict[str, Any]:
+    """Write the index for `faq_data` (row order) from embedding chunks in the same order,
+    plus any extra named `arrays`."""
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization: {quantization}")
+    rows = len(faq_data)
+    text, text_offsets = pack_strings(s for item in faq_data for s in (item["question"], item["answer"]))
+    extra = {"text_offsets": text_offsets, "text": text, **(arrays or {})}
+
+    chunks = iter(embedding_chunks)
+    first_chunk = next(chunks, None) if rows else None
+    if rows and first_chunk is None:
+        raise ValueError(f"no embeddings given for {rows} rows")
+    store = VectorStore.from_embeddings(first_chunk, quantization) if rows else None
+    dims = store.dimensions if store else 0
+    vector_dtype = np.dtype(_DTYPES[quantization])
+
+    sections: Dict[str, Dict[str, Any]] = {}
+    offset = HEADER_BYTES
+    def reserve(name: str, dtype: np.dtype, shape: Tuple[int, ...]) -> None:
+        nonlocal offset
+        sections[name] = {"offset": offset, "dtype": np.dtype(dtype).str, "shape": list(shape)}
+        offset = _align(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    reserve("vectors", vector_dtype, (rows, dims))
+    if quantization == "int8":
+        reserve("scales", np.float32, (rows,))
+    for name, array in extra.items():
+        reserve(name, array.dtype, array.shape)
+    total = offset
+
+    header = {
+        **(meta or {}),
+        "version": f"{int(time.time())}-{uuid.uuid4().hex[:8]}",
+        "rows": rows,
+        "dims": dims,
+        "quantization": quantization,
+        "sections": sections,
+    }
+    header_json = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    if 16 + len(header_json) > HEADER_BYTES:
+        raise ValueError("index header too large")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.truncate(total)
+    out = np.memmap(tmp_path, dtype=np.uint8, mode="r+")
+    try:
+        out[:16] = np.frombuffer(MAGIC + struct.pack("<II", FORMAT_VERSION, len(header_json)), dtype=np.uint8)
+        out[16:16 + len(header_json)] = np.frombuffer(header_json, dtype=np.uint8)
+        row = 0
+        while store is not None:
+            start = sections["vectors"]["offset"] + row * dims * vector_dtype.itemsize
+            codes = np.ascontiguousarray(store.codes, dtype=vector_dtype).view(np.uint8).ravel()
+            out[start:start + codes.size] = codes
+            if store.scales is not None:
+                start = sections["scales"]["offset"] + row * 4
+                out[start:start + store.count * 4] = store.scales.astype(np.float32).view(np.uint8)
+            row += store.count
+            chunk = next(chunks, None)
+            store = VectorStore.from_embeddings(chunk, quantization) if chunk is not None else None
+        if row != rows:
+            raise ValueError(f"got embeddings for {row} rows, expected {rows}")
+        for name, array in extra.items():
+            data = np.ascontiguousarray(array).view(np.uint8).ravel()
+            start = sections[name]["offset"]
+            out[start:start + data.size] = data
+        # Checksum of everything after the header, recorded in the header itself
+        header["checksum"] = "sha256:" + _body_sha256(out, HEADER_BYTES, total)
+        header_json = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        if 16 + len(header_json) > HEADER_BYTES:
+            raise ValueError("index header too large")
+        out[:HEADER_BYTES] = 0
+        out[:16] = np.frombuffer(MAGIC + struct.pack("<II", FORMAT_VERSION, len(header_json)), dtype=np.uint8)
+        out[16:16 + len(header_json)] = np.frombuffer(header_json, dtype=np.uint8)
+        out.flush()
+    except Exception:
+        del out
+        os.remove(tmp_path)
+        raise
+    del out
+    os.replace(tmp_path, path)
+    print(f"✅ Wrote FAQ index {path} ({rows} rows, {dims} dims, {quantization}, {total / 2**20:.1f} MiB)")
+    return header
+
+class MappedStrings(Sequence):
+    """Strings decoded on access from a mapped UTF-8 blob + offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._blob[int(self._offsets[i]):int(self._offsets[i + 1])].tobytes().decode("utf-8")
+
+class MappedRows(Sequence):
+    """FAQ rows ({'question', 'answer'}) decoded on access from the mapped text."""
+
+    def __init__(self, texts: MappedStrings):
+        self._texts = texts
+
+    def __len__(self) -> int:
+        return len(self._texts) // 2
+
+    def __getitem__(self, row: int) -> Dict[str, str]:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return {"question": self._texts[2 * row], "answer": self._texts[2 * row + 1]}
+
+class MappedFAQIndex:
+    """Zero-copy view of an index file: `rows`, `vector_store` and raw `arrays`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header = read_header(path)
+        if self.header is None:
+            raise ValueError(f"not a FAQ index file: {path}")
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.stat = os.fstat(file.fileno())
+        buffer = memoryview(self._mmap)
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, section in self.header["sections"].items():
+            dtype = np.dtype(section["dtype"])
+            count = int(np.prod(section["shape"]))
+            if section["offset"] + count * dtype.itemsize > len(self._mmap):
+                raise ValueError(f"truncated FAQ index file: {path}")
+            self.arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=count, offset=section["offset"]
+            ).reshape(section["shape"])
+        self.vector_store = VectorStore(
+            self.arrays["vectors"], self.arrays.get("scales"), self.header["quantization"]
+        )
+        self.rows = MappedRows(MappedStrings(self.arrays["text"], self.arrays["text_offsets"]))
+
+    @property
+    def version(self) -> str:
+        return self.header["version"]
+
+    def verify(self) -> bool:
+        """Recompute the body checksum (reads the whole file once)."""
+        expected = self.header.get("checksum", "")
+        end = max((s["offset"] + int(np.prod(s["shape"])) * np.dtype(s["dtype"]).itemsize
+                   for s in self.header["sections"].values()), default=HEADER_BYTES)
+        return expected == "sha256:" + _body_sha256(self._mmap, HEADER_BYTES, _align(end))
+
+    def lexical_index(self) -> Optional[Tuple[BM25Index, np.ndarray]]:
+        """BM25 index over the mapped postings (only the vocab dict is built per process)."""
+        if "bm25_offsets" not in self.arrays:
+            return None
+        vocab = {token: term for term, token in enumerate(self.strings("bm25_vocab"))}
+        index = BM25Index.from_arrays(
+            vocab, self.arrays["bm25_offsets"], self.arrays["bm25_docs"],
+            self.arrays["bm25_tfs"], self.arrays["bm25_doc_lengths"],
+        )
+        return index, self.arrays["lexical_self_scores"]
+
+    def strings(self, name: str) -> MappedStrings:
+        """String list stored with pack_strings as `name` + `name_offsets`."""
+        return MappedStrings(self.arrays[name], self.arrays[f"{name}_offsets"])
+
+    def is_stale(self) -> bool:
+        """True once the file at `path` has been replaced by another build."""
+        try:
+            current = os.stat(self.path)
+        except OSError:
+            return False
+        return (current.st_ino, current.st_mtime_ns) != (self.stat.st_ino, self.stat.st_mtime_ns)
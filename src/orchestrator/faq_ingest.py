@@ -0,0 +1,229 @@
+"""
+Streaming, resumable ingestion of FAQ/knowledge-base CSVs into ChromaDB.
+
+- The CSV is read lazily, one batch at a time (memory stays bounded).
+- Up to `max_workers` embedding batches run concurrently. Retries of transient
+  errors happen once, in the LLM gateway (src/libs/llm_gateway.py), not here.
+- Every completed batch is upserted immediately and recorded in a checkpoint
+  file, so an interrupted build resumes at the first unfinished batch.
+"""
+
+import os
+import csv
+import json
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .faq_config import (
+    EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, CHROMA_DB_PATH, COLLECTION_NAME, INGEST_BATCH_SIZE, INGEST_MAX_WORKERS,
+    collection_metadata, hnsw_metadata,
+)
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def embed_texts(
+    client: Any, texts: List[str], model: str = EMBEDDING_MODEL, dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+    timeout: Optional[float] = None,
+) -> List[List[float]]:
+    """One embeddings API call for a batch of texts (order preserved)."""
+    extra = {"dimensions": dimensions} if dimensions else {}
+    if timeout:
+        extra["timeout"] = timeout
+    response = client.embeddings.create(model=model, input=texts, **extra)
+    return [item.embedding for item in response.data]
+
+def iter_faq_rows(csv_path: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield (row index, {'question', 'answer'}) lazily from the CSV."""
+    with open(csv_path, "r", encoding="utf-8", newline="") as file:
+        for i, row in enumerate(csv.DictReader(file)):
+            yield i, row
+
+def iter_batches(rows: Iterator[Tuple[int, Dict[str, str]]], batch_size: int) -> Iterator[List[Tuple[int, Dict[str, str]]]]:
+    batch: List[Tuple[int, Dict[str, str]]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def build_record(i: int, item: Dict[str, str]) -> Dict[str, Any]:
+    """Chroma record for one FAQ row. Question + answer are embedded together, but only
+    the row index is stored: the text itself is served from the CSV already in memory."""
+    return {
+        "id": f"faq_{i}",
+        "text": f"{item['question']}\n\n{item['answer']}",
+        "metadata": {"index": i, "type": "faq"},
+    }
+
+def open_collection(client: Any, name: str) -> Any:
+    """Get `name`, recreating it (empty) if it was built with different index settings."""
+    desired = collection_metadata()
+    try:
+        collection = client.get_collection(name=name)
+    except Exception:
+        collection = None
+    if collection is not None:
+        current = collection.metadata or {}
+        # Collections created before settings were recorded used the defaults (Chroma: L2)
+        legacy = {"embedding_model": "text-embedding-3-small", "embedding_dimensions": 0, **hnsw_metadata("l2", 16, 100, 10)}
+        current = {**legacy, **current}
+        if all(current.get(key) == value for key, value in desired.items() if key != "description"):
+            print(f"✅ Connected to existing ChromaDB collection: {name}")
+            return collection
+        print(f"🔄 Index settings changed for {name}; rebuilding collection")
+        client.delete_collection(name)
+    collection = client.create_collection(name=name, metadata=desired)
+    print(f"✅ Created new ChromaDB collection: {name}")
+    return collection
+
+def prune_collections(client: Any, keep: List[str]) -> List[str]:
+    """Delete FAQ collections (and their ingest checkpoints) other than `keep`."""
+    removed = []
+    for collection in client.list_collections():
+        name = getattr(collection, "name", collection)
+        if not name.startswith(COLLECTION_NAME) or name in keep:
+            continue
+        try:
+            client.delete_collection(name)
+        except Exception as e:
+            print(f"⚠️ Could not delete old collection {name}: {str(e)}")
+            continue
+        try:
+            os.remove(checkpoint_path_for(name))
+        except FileNotFoundError:
+            pass
+        removed.append(name)
+    if removed:
+        print(f"🧹 Removed old FAQ collections: {', '.join(removed)}")
+    return removed
+
+def checkpoint_path_for(collection_name: str) -> str:
+    return os.path.join(CHROMA_DB_PATH, f"ingest_{collection_name}.json")
+
+def load_ingest_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(tmp_path, path)
+
+def embed_csv_in_order(
+    csv_path: str,
+    embed_fn: EmbedFn,
+    batch_size: int = INGEST_BATCH_SIZE,
+    max_workers: int = INGEST_MAX_WORKERS,
+) -> Iterator[np.ndarray]:
+    """Yield one float32 embedding matrix per CSV batch, in row order. Batches are embedded
+    concurrently (bounded look-ahead), like ingest_faq_csv."""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        try:
+            for batch in iter_batches(iter_faq_rows(csv_path), batch_size):
+                texts = [build_record(i, item)["text"] for i, item in batch]
+                pending.append(pool.submit(embed_fn, texts))
+                if len(pending) >= max_workers * 2:
+                    yield np.asarray(pending.popleft().result(), dtype=np.float32)
+            while pending:
+                yield np.asarray(pending.popleft().result(), dtype=np.float32)
+        finally:
+            for future in pending:
+                future.cancel()
+
+def ingest_faq_csv(
+    csv_path: str,
+    collection: Any,
+    embed_fn: EmbedFn,
+    batch_size: int = INGEST_BATCH_SIZE,
+    max_workers: int = INGEST_MAX_WORKERS,
+    checkpoint_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Embed `csv_path` into `collection`, resuming from `checkpoint_path` if it matches the CSV."""
+    checkpoint_path = checkpoint_path or checkpoint_path_for(collection.name)
+    csv_hash = file_sha256(csv_path)
+    state = load_ingest_checkpoint(checkpoint_path)
+    previous_rows = max((state or {}).get("rows", 0), collection.count())
+    resumable = (
+        state and not state.get("complete") and collection.count() > 0
+        and state.get("csv_hash") == csv_hash and state.get("batch_size") == batch_size
+    )
+    if not resumable:
+        state = {"csv_hash": csv_hash, "batch_size": batch_size, "done": [], "complete": False, "rows": previous_rows}
+    done = set(state["done"])
+    if done:
+        print(f"🔄 Resuming ingestion: {len(done)} batches already stored")
+
+    started = time.perf_counter()
+    stored_rows = 0
+    rows_seen = 0
+
+    def run_batch(batch_no: int, batch: List[Tuple[int, Dict[str, str]]]):
+        records = [build_record(i, item) for i, item in batch]
+        embeddings = embed_fn([r["text"] for r in records])
+        return batch_no, records, embeddings
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = set()
+
+        def drain(return_when):
+            nonlocal stored_rows
+            finished, still_running = wait(in_flight, return_when=return_when)
+            for future in finished:
+                batch_no, records, embeddings = future.result()
+                # Writes happen on this thread only, as soon as each batch completes
+                collection.upsert(
+                    ids=[r["id"] for r in records],
+                    embeddings=embeddings,
+                    metadatas=[r["metadata"] for r in records],
+                )
+                done.add(batch_no)
+                stored_rows += len(records)
+                state["done"] = sorted(done)
+                _save_checkpoint(checkpoint_path, state)
+            return still_running
+
+        try:
+            for batch_no, batch in enumerate(iter_batches(iter_faq_rows(csv_path), batch_size)):
+                rows_seen += len(batch)
+                if batch_no in done:
+                    continue
+                # Bounded queue: never read further ahead than the worker pool can absorb
+                while len(in_flight) >= max_workers * 2:
+                    in_flight = drain(FIRST_COMPLETED)
+                in_flight.add(pool.submit(run_batch, batch_no, batch))
+            while in_flight:
+                in_flight = drain(FIRST_COMPLETED)
+        except Exception:
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    # Drop rows left over from a previous, longer version of the CSV
+    stale_ids = [f"faq_{i}" for i in range(rows_seen, state.get("rows", 0))]
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+    state.update({"complete": True, "rows": rows_seen})
+    _save_checkpoint(checkpoint_path, state)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Ingested {stored_rows} rows ({rows_seen} total) in {elapsed:.1f}s")
+    return {"rows": rows_seen, "stored": stored_rows, "seconds": elapsed, "csv_hash": csv_hash}
@@ -2,6 +2,8 @@
 LangGraph workflow definition and compilation.
 """
 
+import os
+import sqlite3
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.memory import InMemorySaver
 
@@ -11,15 +13,22 @@ from .nodes import (
     check_booking_node, view_trips_node, cancel_booking_node,
     get_invoice_node, create_complaint_node, faq_node, fallback_node,
     media_ingest_node, image_vision_node, audio_transcribe_node,
-    ticket_parse_node, merge_media_text_node
+    ticket_parse_node, merge_media_text_node, resume_node
 )
-from .routing import route_from_classify, route_from_extract, route_from_media_ingest
+from .routing import (
+    route_from_start, route_from_resume, route_from_classify, route_from_extract, route_from_media_ingest
+)
+
+# Checkpoint backend: "memory" (1 process) | "sqlite" (shared giữa nhiều worker process)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory")
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "src/data/checkpoints.db")
 
 def create_graph() -> StateGraph:
     """Create and configure the LangGraph workflow."""
     graph = StateGraph(State)
     
     # Add nodes
+    graph.add_node("resume", resume_node)
     graph.add_node("media_ingest", media_ingest_node)
     graph.add_node("image_vision", image_vision_node)
     graph.add_node("audio_transcribe", audio_transcribe_node)
@@ -38,8 +47,13 @@ def create_graph() -> StateGraph:
     graph.add_node("fallback", fallback_node)
 
     # Add edges
+    # Start → resume (short reply to the question asked last turn, e.g. "T001") → apply
     # Start → media ingest → (image/audio parsing) → merge → classify
-    graph.add_edge(START, "media_ingest")
+    graph.add_conditional_edges(START, route_from_start, {
+        "resume": "resume",
+        "media_ingest": "media_ingest",
+    })
+    graph.add_conditional_edges("resume", route_from_resume, {"apply": "apply"})
     graph.add_conditional_edges("media_ingest", route_from_media_ingest, {
         "image_vision": "image_vision",
         "audio_transcribe": "audio_transcribe",
@@ -89,8 +103,25 @@ def create_graph() -> StateGraph:
 
     return graph
 
-def compile_graph() -> StateGraph:
-    """Compile the graph with memory checkpointing."""
+def create_checkpointer():
+    """Create the conversation checkpointer for the configured backend.
+
+    With `CHECKPOINT_BACKEND=sqlite` every worker process opens the same SQLite
+    file (WAL mode), so any worker can continue any `thread_id`.
+    """
+    if CHECKPOINT_BACKEND == "sqlite":
+        from langgraph.checkpoint.sqlite import SqliteSaver
+        os.makedirs(os.path.dirname(os.path.abspath(CHECKPOINT_DB_PATH)), exist_ok=True)
+        con = sqlite3.connect(CHECKPOINT_DB_PATH, check_same_thread=False, timeout=30)
+        con.execute("PRAGMA busy_timeout = 30000;")
+        con.execute("PRAGMA journal_mode = WAL;")
+        return SqliteSaver(con)
+    if CHECKPOINT_BACKEND != "memory":
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND: {CHECKPOINT_BACKEND}")
+    return InMemorySaver()
+
+def compile_graph(checkpointer=None) -> StateGraph:
+    """Compile the graph with the configured checkpointer."""
     graph = create_graph()
-    memory = InMemorySaver()
+    memory = checkpointer if checkpointer is not None else create_checkpointer()
     return graph.compile(checkpointer=memory)
@@ -0,0 +1,108 @@
+"""
+In-memory BM25 index for short Vietnamese documents (FAQ questions/answers).
+
+Postings are kept as flat numpy arrays (CSR layout: one slice of doc ids / term
+frequencies per term), so the index can also be stored in and served from the
+memory-mapped FAQ index file without a per-worker copy.
+"""
+
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .text_norm import tokenize
+
+class BM25Index:
+    """Okapi BM25 over pre-tokenized documents, built once at load time."""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        vocab: Dict[str, int] = {}
+        term_postings: List[List[Tuple[int, int]]] = []
+        for doc_id, doc in enumerate(documents):
+            for token, tf in Counter(doc).items():
+                term = vocab.setdefault(token, len(vocab))
+                if term == len(term_postings):
+                    term_postings.append([])
+                term_postings[term].append((doc_id, tf))
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(posts) for posts in term_postings])
+        flat = [post for posts in term_postings for post in posts]
+        docs = np.fromiter((doc_id for doc_id, _ in flat), dtype=np.int32, count=len(flat))
+        tfs = np.fromiter((tf for _, tf in flat), dtype=np.float32, count=len(flat))
+        doc_lengths = np.fromiter((len(doc) for doc in documents), dtype=np.float32, count=len(documents))
+        self._init_arrays(vocab, offsets, docs, tfs, doc_lengths, k1, b)
+
+    @classmethod
+    def from_arrays(
+        cls, vocab: Dict[str, int], offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray,
+        doc_lengths: np.ndarray, k1: float = 1.5, b: float = 0.75,
+    ) -> "BM25Index":
+        """Rebuild an index from `to_arrays()` output (arrays are used as-is, e.g. mmap views)."""
+        index = cls.__new__(cls)
+        index._init_arrays(vocab, offsets, docs, tfs, doc_lengths, k1, b)
+        return index
+
+    def _init_arrays(self, vocab, offsets, docs, tfs, doc_lengths, k1, b) -> None:
+        self.k1 = k1
+        self.b = b
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.doc_count = len(doc_lengths)
+        self.avg_doc_length = float(doc_lengths.mean()) if self.doc_count else 0.0
+        doc_freq = np.diff(offsets).astype(np.float64)
+        self.idf = np.log(1 + (self.doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"offsets": self.offsets, "docs": self.docs, "tfs": self.tfs, "doc_lengths": self.doc_lengths}
+
+    def _length_norm(self, doc_ids):
+        return 1 - self.b + self.b * self.doc_lengths[doc_ids] / (self.avg_doc_length or 1.0)
+
+    def score(self, query_tokens: List[str]) -> Dict[int, float]:
+        """BM25 score of every document sharing at least one token with the query."""
+        doc_parts, score_parts = [], []
+        for token in set(query_tokens):
+            term = self.vocab.get(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            doc_ids, tf = self.docs[start:end], self.tfs[start:end]
+            doc_parts.append(doc_ids)
+            score_parts.append(self.idf[term] * tf * (self.k1 + 1) / (tf + self.k1 * self._length_norm(doc_ids)))
+        if not doc_parts:
+            return {}
+        doc_ids, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(score_parts))
+        return dict(zip(doc_ids.tolist(), totals.tolist()))
+
+    def top_k(self, query_tokens: List[str], k: int) -> List[Tuple[int, float]]:
+        """Return the k best (doc_id, score) pairs, highest score first."""
+        scores = self.score(query_tokens)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def score_document(self, query_tokens: List[str], doc_id: int, document: List[str]) -> float:
+        """BM25 score of one known document (no postings scan)."""
+        counts = Counter(document)
+        length_norm = float(self._length_norm(doc_id))
+        score = 0.0
+        for token in set(query_tokens):
+            tf = counts.get(token, 0)
+            if tf:
+                score += float(self.idf[self.vocab[token]]) * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        return score
+
+def build_faq_lexical_index(faq_data: Sequence[Dict[str, str]]) -> Tuple[BM25Index, List[float]]:
+    """BM25 over FAQ rows (question tokens weighted twice, plus answer tokens) and, per row,
+    the score of the row queried by its own question ("perfect lexical match" reference)."""
+    question_tokens = [tokenize(item['question']) for item in faq_data]
+    documents = [
+        q_tokens * 2 + tokenize(item['answer'])
+        for q_tokens, item in zip(question_tokens, faq_data)
+    ]
+    index = BM25Index(documents)
+    self_scores = [index.score_document(q_tokens, i, documents[i]) for i, q_tokens in enumerate(question_tokens)]
+    return index, self_scores
@@ -3,22 +3,20 @@ LLM-based information extraction module.
 Handles intent classification and field extraction using OpenAI.
 """
 
+import re
 import json
 from datetime import datetime
-from typing import Dict, Optional
-from openai import OpenAI
+from typing import Any, Dict, List, Optional
 import os
 from dotenv import load_dotenv
+from src.libs.llm_client import create_openai_client
+from src.libs.llm_gateway import LLMGatewayError
 
 load_dotenv()
 
 # OpenAI configuration
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Thiếu OPENAI_API_KEY (đặt env hoặc .env).")
-
-oai_client = OpenAI(api_key=OPENAI_API_KEY)
+oai_client = create_openai_client()
 
 # Structured Output schema
 EXTRACT_SCHEMA = {
@@ -230,40 +228,82 @@ def get_enhanced_system_prompt() -> str:
         "KHÔNG ĐƯỢC BỎ SÓT BẤT KỲ TRƯỜNG NÀO TRONG SCHEMA!\n"
     )
 
-def extract_fields_llm(user_text: str) -> Dict[str, Optional[str]]:
-    """Extract booking_id, date, trip_id, and other fields using LLM structured output."""
+def _empty_fields() -> Dict[str, Optional[str]]:
+    return {"intent": None, "booking_id": None, "date": None, "trip_id": None, "route_from": None, "route_to": None, "complaint_type": None, "description": None}
+
+_PATTERNS = {
+    "booking_id": re.compile(r"^VX\d{6,}$"),
+    "trip_id": re.compile(r"^T\d{2,6}$"),
+}
+_ENUMS = {
+    "intent": EXTRACT_SCHEMA["schema"]["properties"]["intent"]["enum"],
+    "complaint_type": EXTRACT_SCHEMA["schema"]["properties"]["complaint_type"]["enum"],
+}
+
+def schema_errors(data: Dict) -> List[str]:
+    """Fields of an LLM answer that violate EXTRACT_SCHEMA (enum, pattern, ISO date)."""
+    if not isinstance(data, dict) or not data:
+        return ["invalid_json"]
+    errors = []
+    for name, allowed in _ENUMS.items():
+        if data.get(name) is not None and data[name] not in allowed:
+            errors.append(name)
+    for name, pattern in _PATTERNS.items():
+        if data.get(name) is not None and not (isinstance(data[name], str) and pattern.match(data[name])):
+            errors.append(name)
+    if data.get("date"):
+        try:
+            _ = datetime.fromisoformat(data["date"])
+        except Exception:
+            errors.append("date")
+    return errors
+
+def _fields(data: Dict, errors: List[str]) -> Dict[str, Optional[str]]:
+    # Giá trị sai schema bị bỏ (None) thay vì đưa vào State
+    out = _empty_fields()
+    for name in out:
+        if name not in errors:
+            out[name] = data.get(name)
+    return out
+
+def _record_usage(meta: Optional[Dict], resp: Any) -> None:
+    if meta is None:
+        return
+    usage = getattr(resp, "usage", None)
+    meta["input_tokens"] = meta.get("input_tokens", 0) + (getattr(usage, "input_tokens", 0) or 0)
+    meta["output_tokens"] = meta.get("output_tokens", 0) + (getattr(usage, "output_tokens", 0) or 0)
+
+def extract_fields_llm(user_text: str, timeout: Optional[float] = None, model: Optional[str] = None,
+                       meta: Optional[Dict] = None) -> Dict[str, Optional[str]]:
+    """Extract booking_id, date, trip_id, and other fields using LLM structured output.
+    Last tier of the extraction engine (extraction.py); call `extract_fields` instead.
+    `timeout`: per-call budget for the gateway; LLMGatewayError (timeout, breaker open)
+    is raised to the caller. `model`: chosen by model_router (default OPENAI_MODEL).
+    `meta`, if given, receives token usage and `schema_errors` of the answer."""
     
     enhanced_system = get_enhanced_system_prompt()
+    call_options = {"timeout": timeout} if timeout else {}
+    model = model or OPENAI_MODEL
+    meta = meta if meta is not None else {}
 
     # 1) Try structured output với enhanced prompt
     try:
         resp = oai_client.responses.create(
-            model=OPENAI_MODEL,
+            model=model,
             input=[
                 {"role": "system", "content": enhanced_system},
                 {"role": "user", "content": user_text},
             ],
             response_format={"type": "json_schema", "json_schema": EXTRACT_SCHEMA},
+            **call_options,
         )
+        _record_usage(meta, resp)
         data = json.loads(resp.output_text or "{}")
-        
-        # Validate date format
-        if "date" in data and data["date"]:
-            try:
-                _ = datetime.fromisoformat(data["date"])
-            except Exception:
-                data["date"] = None
-                
-        return {
-            "intent": data.get("intent"),
-            "booking_id": data.get("booking_id"),
-            "date": data.get("date"),
-            "trip_id": data.get("trip_id"),
-            "route_from": data.get("route_from"),
-            "route_to": data.get("route_to"),
-            "complaint_type": data.get("complaint_type"),
-            "description": data.get("description"),
-        }
+        meta["schema_errors"] = schema_errors(data)
+        return _fields(data, meta["schema_errors"])
+    except LLMGatewayError:
+        # Timeout / breaker mở: không gọi thêm lần thứ hai, engine giữ kết quả các tầng local
+        raise
     except (TypeError, Exception):
         # Fallback nếu structured output không khả dụng
         pass
@@ -271,12 +311,14 @@ def extract_fields_llm(user_text: str) -> Dict[str, Optional[str]]:
     # 2) Fallback: instruction-only với enhanced prompt
     try:
         resp = oai_client.responses.create(
-            model=OPENAI_MODEL,
+            model=model,
             input=[
                 {"role": "system", "content": enhanced_system + "\n\nQUAN TRỌNG: Hãy suy luận theo 8 bước trên, sau đó chỉ trả về JSON object cuối cùng, không thêm giải thích."},
                 {"role": "user", "content": user_text},
             ],
+            **call_options,
         )
+        _record_usage(meta, resp)
         text = getattr(resp, "output_text", "") or ""
         
         # Parse JSON từ response
@@ -284,7 +326,6 @@ def extract_fields_llm(user_text: str) -> Dict[str, Optional[str]]:
             data = json.loads(text)
         except Exception:
             # Tìm JSON object trong text
-            import re
             m = re.search(r"\{[\s\S]*\}", text)
             if m:
                 try:
@@ -294,22 +335,10 @@ def extract_fields_llm(user_text: str) -> Dict[str, Optional[str]]:
             else:
                 data = {}
         
-        # Validate date format
-        if "date" in data and data["date"]:
-            try:
-                _ = datetime.fromisoformat(data["date"])
-            except Exception:
-                data["date"] = None
-                
-        return {
-            "intent": data.get("intent"),
-            "booking_id": data.get("booking_id"),
-            "date": data.get("date"),
-            "trip_id": data.get("trip_id"),
-            "route_from": data.get("route_from"),
-            "route_to": data.get("route_to"),
-            "complaint_type": data.get("complaint_type"),
-            "description": data.get("description"),
-        }
+        meta["schema_errors"] = schema_errors(data)
+        return _fields(data, meta["schema_errors"])
+    except LLMGatewayError:
+        raise
     except Exception:
-        return {"intent": None, "booking_id": None, "date": None, "trip_id": None, "route_from": None, "route_to": None, "complaint_type": None, "description": None}
+        meta["schema_errors"] = ["invalid_json"]
+        return _empty_fields()
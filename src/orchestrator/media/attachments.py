@@ -0,0 +1,83 @@
+# orchestrator/media/attachments.py
+"""
+Load attachment references into bytes.
+
+Supported references (what callers put in State.attachments):
+- data URL:   data:image/png;base64,....
+- raw base64
+- http(s) URL (downloaded, size-capped)
+- media store handle: media://<sha256> (uploads, see store.py)
+- local file path
+"""
+
+import os
+import base64
+import binascii
+import mimetypes
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", str(20 * 1024 * 1024)))
+MEDIA_FETCH_TIMEOUT = float(os.getenv("MEDIA_FETCH_TIMEOUT", "10"))
+
+
+class AttachmentError(ValueError):
+    """Attachment reference cannot be loaded (bad format, too large, unreachable)."""
+
+
+@dataclass
+class Attachment:
+    data: bytes
+    mime_type: Optional[str]
+    source: str  # store | data_url | base64 | url | file
+
+
+def _check_size(size: int) -> None:
+    if size > MEDIA_MAX_BYTES:
+        raise AttachmentError(f"attachment too large ({size} > {MEDIA_MAX_BYTES} bytes)")
+
+
+def _download(url: str) -> Attachment:
+    try:
+        with requests.get(url, stream=True, timeout=MEDIA_FETCH_TIMEOUT) as resp:
+            resp.raise_for_status()
+            chunks, size = [], 0
+            for chunk in resp.iter_content(64 * 1024):
+                size += len(chunk)
+                _check_size(size)
+                chunks.append(chunk)
+            mime = (resp.headers.get("Content-Type") or "").split(";")[0] or None
+    except requests.RequestException as e:
+        raise AttachmentError(f"cannot download attachment: {str(e)}")
+    return Attachment(b"".join(chunks), mime or mimetypes.guess_type(url)[0], "url")
+
+
+def load_attachment(ref: str, allow_files: bool = True) -> Attachment:
+    """Resolve one attachment reference to its bytes (`allow_files=False` for untrusted input)."""
+    if not isinstance(ref, str) or not ref:
+        raise AttachmentError("empty attachment reference")
+    if ref.startswith("media://"):
+        from .store import get_media_store
+        data, mime = get_media_store().read(ref)
+        return Attachment(data, mime, "store")
+    if ref.startswith("data:"):
+        header, _, payload = ref.partition(",")
+        mime = header[5:].split(";")[0] or None
+        _check_size(len(payload) * 3 // 4)
+        try:
+            return Attachment(base64.b64decode(payload, validate=False), mime, "data_url")
+        except binascii.Error as e:
+            raise AttachmentError(f"invalid data URL: {str(e)}")
+    if ref.startswith(("http://", "https://")):
+        return _download(ref)
+    if allow_files and len(ref) < 4096 and os.path.isfile(ref):
+        _check_size(os.path.getsize(ref))
+        with open(ref, "rb") as file:
+            return Attachment(file.read(), mimetypes.guess_type(ref)[0], "file")
+    _check_size(len(ref) * 3 // 4)
+    try:
+        return Attachment(base64.b64decode(ref, validate=True), None, "base64")
+    except binascii.Error:
+        raise AttachmentError("unsupported attachment reference (expected URL, data URL, base64 or file path)")
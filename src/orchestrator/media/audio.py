@@ -1,18 +1,348 @@
 # orchestrator/media/audio.py
 """
-Skeleton for audio transcription using Whisper/gpt-4o-mini-transcribe.
-Provide functions to:
-- transcribe_audio(attachments)
+Audio transcription for voice notes (Whisper / gpt-4o-mini-transcribe).
 
-Implementation notes:
-- Accept URLs or base64 audio data + mime_type
-- Return plain transcript string
+Pipeline:
+1. load attachments (URL, data URL, base64, file path) → bytes
+2. SHA-256 of the upload → shared-cache lookup (repeat uploads cost nothing)
+3. decode to 16 kHz mono PCM (WAV via the stdlib, other formats via ffmpeg if installed)
+4. detect pauses by frame energy: drop leading/trailing silence, shorten long
+   pauses and pack the speech segments into chunks of at most AUDIO_CHUNK_SECONDS
+5. transcribe the chunks concurrently and stitch the transcripts in order
+
+Audio that cannot be decoded locally is sent to the backend as-is (one request).
+The model call is behind `TranscriptionBackend`; `LLM_BACKEND=stub` uses a local stub.
 """
 
-from typing import List
+import io
+import os
+import time
+import wave
+import shutil
+import hashlib
+import subprocess
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.libs.llm_client import LLM_BACKEND, create_openai_client
+from src.libs.shared_cache import get_shared_cache
+from .attachments import AttachmentError, load_attachment
+
+AUDIO_MODEL = os.getenv("AUDIO_MODEL", "gpt-4o-mini-transcribe")
+AUDIO_LANGUAGE = os.getenv("AUDIO_LANGUAGE", "vi")
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_FRAME_MS = 30
+AUDIO_SILENCE_DBFS = float(os.getenv("AUDIO_SILENCE_DBFS", "-40"))
+AUDIO_MIN_PAUSE = float(os.getenv("AUDIO_MIN_PAUSE", "0.4"))      # seconds of silence that split speech
+AUDIO_KEEP_PAUSE = float(os.getenv("AUDIO_KEEP_PAUSE", "0.3"))    # silence kept around/between segments
+AUDIO_CHUNK_SECONDS = float(os.getenv("AUDIO_CHUNK_SECONDS", "20"))
+AUDIO_MAX_WORKERS = int(os.getenv("AUDIO_MAX_WORKERS", "4"))
+AUDIO_CACHE_TTL = float(os.getenv("AUDIO_CACHE_TTL", str(7 * 24 * 3600)))
+AUDIO_FFMPEG = os.getenv("AUDIO_FFMPEG", "ffmpeg")
+AUDIO_FFMPEG_TIMEOUT_S = float(os.getenv("AUDIO_FFMPEG_TIMEOUT_S", "60"))  # cap when no turn budget is given
+
+
+@dataclass
+class AudioChunk:
+    index: int
+    data: bytes  # 16 kHz mono 16-bit WAV
+    seconds: float
+
+
+# --- Decoding ---
+
+def _resample(samples: np.ndarray, rate: int, target: int = AUDIO_SAMPLE_RATE) -> np.ndarray:
+    if rate == target or len(samples) == 0:
+        return samples
+    count = int(round(len(samples) * target / rate))
+    positions = np.linspace(0, len(samples) - 1, count)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    with wave.open(io.BytesIO(data)) as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        bytes3 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = bytes3[:, 0] | (bytes3[:, 1] << 8) | (bytes3[:, 2] << 16)
+        samples = (np.where(ints >= 1 << 23, ints - (1 << 24), ints)).astype(np.float32) / (1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / (1 << 31)
+    else:
+        raise ValueError(f"unsupported WAV sample width: {width}")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def _decode_ffmpeg(data: bytes, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+    if not shutil.which(AUDIO_FFMPEG):
+        return None
+    timeout = AUDIO_FFMPEG_TIMEOUT_S if timeout is None else min(timeout, AUDIO_FFMPEG_TIMEOUT_S)
+    proc = subprocess.run(
+        [AUDIO_FFMPEG, "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+         "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE), "-f", "s16le", "pipe:1"],
+        input=data, capture_output=True, timeout=timeout,
+    )
+    if proc.returncode != 0:
+        return None
+    return np.frombuffer(proc.stdout, dtype="<i2").astype(np.float32) / 32768
+
+
+def decode_audio(data: bytes, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+    """16 kHz mono float32 samples in [-1, 1], or None if the format cannot be decoded locally
+    (ffmpeg gets at most `timeout` seconds)."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            samples, rate = _decode_wav(data)
+            return _resample(samples, rate)
+        except (wave.Error, ValueError, EOFError) as e:
+            print(f"⚠️ Cannot decode WAV locally: {str(e)}")
+    try:
+        return _decode_ffmpeg(data, timeout)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"⚠️ ffmpeg decode failed: {str(e)}")
+        return None
+
+
+def encode_wav(samples: np.ndarray, rate: int = AUDIO_SAMPLE_RATE) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+# --- Silence detection / chunking ---
+
+def speech_segments(samples: np.ndarray, rate: int = AUDIO_SAMPLE_RATE,
+                    silence_dbfs: float = AUDIO_SILENCE_DBFS, min_pause: float = AUDIO_MIN_PAUSE) -> List[Tuple[int, int]]:
+    """(start, end) sample ranges of speech, split at pauses of at least `min_pause` seconds."""
+    frame = int(rate * AUDIO_FRAME_MS / 1000)
+    count = len(samples) // frame
+    if count == 0:
+        return []
+    frames = samples[:count * frame].reshape(count, frame)
+    dbfs = 20 * np.log10(np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-10)
+    voiced = dbfs > silence_dbfs
+    min_gap = max(1, int(min_pause * 1000 / AUDIO_FRAME_MS))
+
+    segments: List[Tuple[int, int]] = []
+    start, silent_run = None, 0
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced:
+            if start is None:
+                start = i
+            silent_run = 0
+        elif start is not None:
+            silent_run += 1
+            if silent_run >= min_gap:
+                segments.append((start, i - silent_run + 1))
+                start, silent_run = None, 0
+    if start is not None:
+        segments.append((start, count - silent_run))
+    return [(s * frame, e * frame) for s, e in segments]
+
+
+def split_audio(samples: np.ndarray, rate: int = AUDIO_SAMPLE_RATE,
+                max_seconds: float = AUDIO_CHUNK_SECONDS) -> List[np.ndarray]:
+    """Speech only (silence trimmed, pauses shortened), packed into chunks cut at pauses."""
+    pad = int(AUDIO_KEEP_PAUSE * rate / 2)
+    max_len = int(max_seconds * rate)
+    pieces: List[np.ndarray] = []
+    for start, end in speech_segments(samples, rate):
+        piece = samples[max(0, start - pad):min(len(samples), end + pad)]
+        # A single segment longer than a chunk (no pause to cut at) is hard-split
+        pieces.extend(piece[i:i + max_len] for i in range(0, len(piece), max_len))
+
+    chunks: List[np.ndarray] = []
+    current: List[np.ndarray] = []
+    current_len = 0
+    for piece in pieces:
+        if current and current_len + len(piece) > max_len:
+            chunks.append(np.concatenate(current))
+            current, current_len = [], 0
+        current.append(piece)
+        current_len += len(piece)
+    if current:
+        chunks.append(np.concatenate(current))
+    return chunks
+
+
+def prepare_audio(data: bytes, timeout: Optional[float] = None) -> Optional[List[AudioChunk]]:
+    """Chunks to upload, [] if the audio is silent, None if it cannot be decoded locally."""
+    samples = decode_audio(data, timeout)
+    if samples is None:
+        return None
+    chunks = [
+        AudioChunk(i, encode_wav(chunk), len(chunk) / AUDIO_SAMPLE_RATE)
+        for i, chunk in enumerate(split_audio(samples))
+    ]
+    print(f"DEBUG: audio {len(data)}B {len(samples) / AUDIO_SAMPLE_RATE:.1f}s → {len(chunks)} chunk(s), "
+          f"{sum(len(c.data) for c in chunks)}B {sum(c.seconds for c in chunks):.1f}s")
+    return chunks
+
+
+# --- Backends ---
+
+class TranscriptionBackend(ABC):
+    """Turns one audio file into text."""
+
+    name = "base"
+    model = ""
+
+    @abstractmethod
+    def transcribe(self, data: bytes, filename: str = "audio.wav", mime_type: str = "audio/wav",
+                   timeout: Optional[float] = None) -> str:
+        """Transcript of `data`; `timeout` bounds the request (seconds)."""
+
+
+class OpenAITranscriptionBackend(TranscriptionBackend):
+    name = "openai"
+
+    def __init__(self, client=None, model: str = AUDIO_MODEL, language: str = AUDIO_LANGUAGE):
+        self.client = client or create_openai_client()
+        self.model = model
+        self.language = language
+
+    def transcribe(self, data: bytes, filename: str = "audio.wav", mime_type: str = "audio/wav",
+                   timeout: Optional[float] = None) -> str:
+        resp = self.client.audio.transcriptions.create(
+            model=self.model, file=(filename, data, mime_type), language=self.language, timeout=timeout,
+        )
+        return (getattr(resp, "text", "") or "").strip()
+
+
+class StubTranscriptionBackend(TranscriptionBackend):
+    """Local backend: returns a placeholder with the audio length (no network).
+    `transcripts` maps an audio SHA-256 to a fixed transcript (tests)."""
+
+    name = "stub"
+    model = "stub"
+
+    def __init__(self, transcripts: Optional[Dict[str, str]] = None):
+        self.transcripts = transcripts or {}
+        self.calls = 0
+        self.uploaded_bytes = 0
+
+    def transcribe(self, data: bytes, filename: str = "audio.wav", mime_type: str = "audio/wav",
+                   timeout: Optional[float] = None) -> str:
+        self.calls += 1
+        self.uploaded_bytes += len(data)
+        latency_ms = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+        if latency_ms > 0:
+            time.sleep(latency_ms / 1000.0)
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self.transcripts:
+            return self.transcripts[digest]
+        try:
+            with wave.open(io.BytesIO(data)) as wav:
+                return f"[giọng nói {wav.getnframes() / wav.getframerate():.1f}s]"
+        except (wave.Error, EOFError):
+            return f"[giọng nói {len(data)}B]"
+
+
+_backend: Optional[TranscriptionBackend] = None
+
+
+def get_transcription_backend() -> TranscriptionBackend:
+    global _backend
+    if _backend is None:
+        _backend = StubTranscriptionBackend() if LLM_BACKEND == "stub" else OpenAITranscriptionBackend()
+    return _backend
+
+
+def set_transcription_backend(backend: Optional[TranscriptionBackend]) -> None:
+    """Swap the transcription backend (tests, benchmarks); None restores the default."""
+    global _backend
+    _backend = backend
+
+
+# --- Public API ---
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise TimeoutError("transcription budget exhausted")
+    return left
+
 
-def transcribe_audio(attachments: List[str]) -> str:
-    """Return transcript text from audio (placeholder)."""
-    return ""
+def transcribe_bytes(data: bytes, mime_type: Optional[str] = None,
+                     backend: Optional[TranscriptionBackend] = None, timeout: Optional[float] = None) -> str:
+    """Transcript of one audio file: trimmed, chunked at pauses, chunks transcribed concurrently.
+    `timeout`: seconds for decoding and every chunk together; a chunk that starts after
+    earlier rounds only gets what is left (TimeoutError once nothing is)."""
+    backend = backend or get_transcription_backend()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    chunks = prepare_audio(data, _remaining(deadline))
+    if chunks is None:
+        # Unknown format and no ffmpeg: send the original file in one request
+        extension = (mime_type or "audio/mpeg").split("/")[-1]
+        return backend.transcribe(data, filename=f"audio.{extension}", mime_type=mime_type or "audio/mpeg",
+                                  timeout=_remaining(deadline))
+    if not chunks:
+        return ""
+    if len(chunks) == 1:
+        return backend.transcribe(chunks[0].data, timeout=_remaining(deadline))
+    with ThreadPoolExecutor(max_workers=min(AUDIO_MAX_WORKERS, len(chunks))) as pool:
+        texts = list(pool.map(
+            lambda chunk: backend.transcribe(chunk.data, filename=f"chunk{chunk.index}.wav", timeout=_remaining(deadline)),
+            chunks,
+        ))
+    return " ".join(text.strip() for text in texts if text and text.strip())
 
 
+def transcribe_audio(attachments: List[str], backend: Optional[TranscriptionBackend] = None,
+                     timeout: Optional[float] = None) -> str:
+    """Return transcript text from audio attachments (cached by audio hash).
+    `timeout`: seconds for all transcriptions together (the turn budget)."""
+    backend = backend or get_transcription_backend()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    cache = get_shared_cache()
+    transcripts = []
+    for ref in attachments or []:
+        try:
+            attachment = load_attachment(ref)
+        except (AttachmentError, OSError) as e:
+            print(f"⚠️ Skipping audio attachment: {str(e)}")
+            continue
+        key = f"audio:{backend.name}:{backend.model}:{hashlib.sha256(attachment.data).hexdigest()}"
+        try:
+            cached = cache.get(key)
+        except Exception as e:
+            print(f"❌ Error reading transcript cache: {str(e)}")
+            cached = None
+        if cached is not None:
+            print(f"DEBUG: transcript cache hit {key[-12:]}")
+            transcripts.append(cached)
+            continue
+        left = None if deadline is None else deadline - time.monotonic()
+        if left is not None and left <= 0:
+            print("⚠️ Transcription budget exhausted, skipping remaining audio")
+            break
+        started = time.perf_counter()
+        try:
+            text = transcribe_bytes(attachment.data, attachment.mime_type, backend, timeout=left)
+        except Exception as e:
+            print(f"❌ Transcription error: {str(e)}")
+            continue
+        print(f"DEBUG: transcribed in {time.perf_counter() - started:.2f}s")
+        try:
+            cache.set(key, text, ttl=AUDIO_CACHE_TTL)
+        except Exception as e:
+            print(f"❌ Error caching transcript: {str(e)}")
+        transcripts.append(text)
+    return "\n".join(t for t in transcripts if t)
@@ -3,14 +3,21 @@
 Normalization helpers for media-derived text:
 - normalize_text_to_entities(media_text) -> structured_entities
   - Normalize date to YYYY-MM-DD
-  - Map place aliases (TPHCM/HCMC/SG → HCM)
+  - Map place aliases (TPHCM/HCMC/SG → HCM) with the shared alias automaton (places.py)
   - Validate booking_id/trip_id patterns
 """
 
 from typing import Dict
 
-def normalize_text_to_entities(media_text: str) -> Dict[str, str]:
-    """Return structured fields parsed from media text (placeholder)."""
-    return {}
-
+from ..places import extract_route
+from .vision import extract_structured_fields
 
+def normalize_text_to_entities(media_text: str) -> Dict[str, str]:
+    """Return structured fields parsed from media text (no LLM)."""
+    if not media_text:
+        return {}
+    entities = extract_structured_fields(media_text)
+    for field, value in extract_route(media_text).items():
+        if value:
+            entities[field] = value
+    return entities
@@ -0,0 +1,207 @@
+# orchestrator/media/store.py
+"""
+Temporary content-addressed store for uploaded media.
+
+Uploads are streamed to disk in chunks (hashing on the fly, size-capped) and
+stored once per SHA-256; the graph State only carries the small handle
+`media://<sha256>`. Nodes resolve handles lazily through `load_attachment`, so
+checkpoints and `stream_mode="values"` snapshots never contain media bytes.
+Files expire MEDIA_TTL seconds after their last upload.
+"""
+
+import io
+import os
+import json
+import time
+import uuid
+import hashlib
+import mimetypes
+import tempfile
+import threading
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from .attachments import AttachmentError, MEDIA_MAX_BYTES, load_attachment
+
+MEDIA_STORE_PATH = os.getenv("MEDIA_STORE_PATH", os.path.join(tempfile.gettempdir(), "vexere_media"))
+MEDIA_TTL = float(os.getenv("MEDIA_TTL", "3600"))
+MEDIA_PURGE_INTERVAL = float(os.getenv("MEDIA_PURGE_INTERVAL", "60"))
+MEDIA_HANDLE_PREFIX = "media://"
+
+_CHUNK_BYTES = 64 * 1024
+_MAGIC = [
+    (b"\x89PNG", "image/png"), (b"\xff\xd8\xff", "image/jpeg"), (b"GIF8", "image/gif"),
+    (b"OggS", "audio/ogg"), (b"ID3", "audio/mpeg"), (b"\xff\xfb", "audio/mpeg"), (b"fLaC", "audio/flac"),
+]
+
+
+class MediaTooLarge(AttachmentError):
+    """Upload exceeds MEDIA_MAX_BYTES."""
+
+
+class MediaNotFound(AttachmentError):
+    """Handle is unknown or its file has expired."""
+
+
+def sniff_mime(head: bytes) -> Optional[str]:
+    """Guess the MIME type from the first bytes of a file."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        return "audio/mp4" if head[8:11] in (b"M4A", b"M4B") else "video/mp4"
+    for magic, mime in _MAGIC:
+        if head.startswith(magic):
+            return mime
+    return None
+
+
+def media_kind(mime_type: Optional[str]) -> Optional[str]:
+    """image | audio | None, from a MIME type."""
+    if not mime_type:
+        return None
+    major = mime_type.split("/")[0]
+    return major if major in ("image", "audio") else None
+
+
+def is_media_handle(ref) -> bool:
+    return isinstance(ref, str) and ref.startswith(MEDIA_HANDLE_PREFIX)
+
+
+class MediaStore:
+    def __init__(self, path: str = MEDIA_STORE_PATH, ttl: float = MEDIA_TTL, max_bytes: int = MEDIA_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._last_purge = 0.0
+        self._purge_lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _paths(self, digest: str) -> Tuple[str, str]:
+        base = os.path.join(self.path, digest)
+        return base + ".bin", base + ".json"
+
+    def put_stream(self, stream: BinaryIO, mime_type: Optional[str] = None, filename: Optional[str] = None) -> str:
+        """Copy a file-like object into the store in chunks and return its handle."""
+        self._maybe_purge()
+        sha = hashlib.sha256()
+        size, head = 0, b""
+        tmp_path = os.path.join(self.path, f".upload-{uuid.uuid4().hex}")
+        try:
+            with open(tmp_path, "wb") as out:
+                while True:
+                    chunk = stream.read(_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise MediaTooLarge(f"attachment too large (> {self.max_bytes} bytes)")
+                    if len(head) < 16:
+                        head += chunk[:16]
+                    sha.update(chunk)
+                    out.write(chunk)
+            if size == 0:
+                raise AttachmentError("empty attachment")
+            digest = sha.hexdigest()
+            data_path, meta_path = self._paths(digest)
+            if os.path.exists(data_path):
+                os.utime(data_path)  # same content uploaded again: extend its TTL
+            else:
+                os.replace(tmp_path, data_path)
+            meta = {"mime_type": sniff_mime(head) or mime_type, "size": size, "filename": filename}
+            meta_tmp = f"{meta_path}.{uuid.uuid4().hex}"
+            with open(meta_tmp, "w", encoding="utf-8") as file:
+                json.dump(meta, file, ensure_ascii=False)
+            os.replace(meta_tmp, meta_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        print(f"📦 Stored media {digest[:12]} ({size}B, {meta['mime_type']})")
+        return MEDIA_HANDLE_PREFIX + digest
+
+    def put_bytes(self, data: bytes, mime_type: Optional[str] = None) -> str:
+        return self.put_stream(io.BytesIO(data), mime_type)
+
+    def resolve(self, handle: str) -> Tuple[str, Dict]:
+        """(file path, metadata) of a handle; raises MediaNotFound if unknown or expired."""
+        digest = handle[len(MEDIA_HANDLE_PREFIX):] if is_media_handle(handle) else ""
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise MediaNotFound(f"invalid media handle: {handle[:80]}")
+        data_path, meta_path = self._paths(digest)
+        try:
+            age = time.time() - os.path.getmtime(data_path)
+            with open(meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            raise MediaNotFound(f"media not found: {digest[:12]}")
+        if age > self.ttl:
+            raise MediaNotFound(f"media expired: {digest[:12]}")
+        return data_path, meta
+
+    def read(self, handle: str) -> Tuple[bytes, Optional[str]]:
+        path, meta = self.resolve(handle)
+        with open(path, "rb") as file:
+            return file.read(), meta.get("mime_type")
+
+    def purge_expired(self) -> int:
+        """Delete files older than the TTL (and abandoned partial uploads)."""
+        removed, now = 0, time.time()
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            try:
+                if name.endswith(".bin") and now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+                    meta_path = path[:-4] + ".json"
+                    if os.path.exists(meta_path):
+                        os.remove(meta_path)
+                    removed += 1
+                elif name.startswith(".upload-") and now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                continue  # removed concurrently by another worker
+        if removed:
+            print(f"🧹 Purged {removed} expired media file(s)")
+        return removed
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        if now - self._last_purge < MEDIA_PURGE_INTERVAL or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_purge = now
+            self.purge_expired()
+        finally:
+            self._purge_lock.release()
+
+
+_store: Optional[MediaStore] = None
+
+
+def get_media_store() -> MediaStore:
+    """Process-wide media store (the directory itself is shared by all workers)."""
+    global _store
+    if _store is None:
+        _store = MediaStore()
+    return _store
+
+
+def store_inline_attachments(refs: List[str], allow_files: bool = False) -> List[str]:
+    """Replace inline data (data URL / base64) by store handles so State only holds small
+    references. Handles and http(s) URLs are kept; local paths only if `allow_files`."""
+    out = []
+    for ref in refs or []:
+        if is_media_handle(ref) or (isinstance(ref, str) and ref.startswith(("http://", "https://"))):
+            out.append(ref)
+        elif allow_files and isinstance(ref, str) and len(ref) < 4096 and os.path.isfile(ref):
+            out.append(ref)
+        else:
+            attachment = load_attachment(ref, allow_files=False)
+            out.append(get_media_store().put_bytes(attachment.data, attachment.mime_type))
+    return out
+
+
+def attachment_kind(ref: str) -> Optional[str]:
+    """image | audio | None for a handle, URL or path, without reading the media itself."""
+    if is_media_handle(ref):
+        return media_kind(get_media_store().resolve(ref)[1].get("mime_type"))
+    return media_kind(mimetypes.guess_type(ref.split("?")[0])[0])
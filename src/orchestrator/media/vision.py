@@ -1,24 +1,321 @@
 # orchestrator/media/vision.py
 """
-Skeleton for image understanding using GPT-4o Vision.
-Provide functions to:
-- extract_text_from_images(attachments)
-- extract_structured_fields(text)
-
-Implementation details (to be filled by dev team):
-- Accept URLs or base64 images
-- Call GPT-4o with multi-part content (image + instruction)
-- Return plain text plus structured entities (booking_id, date, route_from, route_to, trip_id)
+Image understanding for ticket screenshots / photos.
+
+Pipeline:
+1. load attachments (URL, data URL, base64, file path) → bytes
+2. hash → shared-cache lookup (repeat uploads of the same image cost nothing)
+3. cache misses: decode, fix EXIF rotation, crop uniform borders, downscale to
+   VISION_MAX_SIDE and recompress to JPEG under VISION_MAX_BYTES
+4. send the misses to the vision backend in batches (several images per request)
+5. parse structured entities (booking_id, trip_id, date) and cache text + entities
+
+The model call is behind `VisionBackend`; `LLM_BACKEND=stub` uses a local stub.
 """
 
-from typing import List, Dict, Tuple
+import io
+import os
+import re
+import json
+import time
+import base64
+import hashlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Dict, Tuple, Optional
+
+from PIL import Image, ImageChops, ImageOps
+
+from src.libs.llm_client import LLM_BACKEND, create_openai_client
+from src.libs.shared_cache import get_shared_cache
+from .attachments import AttachmentError, load_attachment
+
+VISION_MODEL = os.getenv("VISION_MODEL", "gpt-4o-mini")
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "1600"))
+VISION_MIN_SIDE = int(os.getenv("VISION_MIN_SIDE", "512"))
+VISION_MAX_BYTES = int(os.getenv("VISION_MAX_BYTES", str(300 * 1024)))
+VISION_JPEG_QUALITIES = [int(q) for q in os.getenv("VISION_JPEG_QUALITIES", "85,75,65,50").split(",")]
+VISION_BATCH_SIZE = int(os.getenv("VISION_BATCH_SIZE", "4"))
+VISION_CACHE_TTL = float(os.getenv("VISION_CACHE_TTL", str(7 * 24 * 3600)))
+# content: SHA-256 of the uploaded bytes (exact repeats only)
+# dhash:   perceptual hash, also matches re-encoded/resized copies of the same screenshot
+#          (two near-identical tickets may collide, so it is opt-in)
+VISION_CACHE_KEY = os.getenv("VISION_CACHE_KEY", "content")
+
+VISION_PROMPT = (
+    "Bạn nhận được một hoặc nhiều ảnh chụp vé xe / màn hình đặt vé. "
+    "Với MỖI ảnh theo đúng thứ tự, hãy chép lại các thông tin quan trọng dưới dạng văn bản "
+    "(mã vé, mã chuyến, ngày giờ, điểm đi, điểm đến, tên hành khách, giá tiền). "
+    'Chỉ trả về JSON: {"images": ["<văn bản ảnh 1>", "<văn bản ảnh 2>", ...]}'
+)
+
+
+@dataclass
+class PreparedImage:
+    key: str
+    data: bytes  # JPEG sent to the model
+    width: int
+    height: int
+    original_bytes: int
+    embedded_text: Optional[str] = None  # PNG/JPEG text metadata (used by the stub backend)
+
+
+# --- Preprocessing ---
+
+def _autocrop(img: Image.Image, tolerance: int = 12) -> Image.Image:
+    """Crop borders that have the same color as the top-left pixel (status bars excluded)."""
+    background = Image.new(img.mode, img.size, img.getpixel((0, 0)))
+    diff = ImageChops.difference(img, background).convert("L")
+    bbox = diff.point(lambda v: 255 if v > tolerance else 0).getbbox()
+    if not bbox:
+        return img
+    width, height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    if width < img.width * 0.2 or height < img.height * 0.2 or (width, height) == img.size:
+        return img
+    return img.crop(bbox)
+
+
+def _encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _embedded_text(img: Image.Image) -> Optional[str]:
+    for key in ("Description", "Comment", "comment", "text"):
+        value = img.info.get(key)
+        if value:
+            return value.decode("utf-8", "ignore") if isinstance(value, bytes) else str(value)
+    return None
+
+
+def preprocess_image(data: bytes, key: str = "",
+                     max_side: int = VISION_MAX_SIDE, max_bytes: int = VISION_MAX_BYTES) -> PreparedImage:
+    """Decode, rotate, crop, downscale and recompress one image to the pixel/byte budget."""
+    img = Image.open(io.BytesIO(data))
+    embedded = _embedded_text(img)
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img = _autocrop(img)
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    while True:
+        for quality in VISION_JPEG_QUALITIES:
+            encoded = _encode_jpeg(img, quality)
+            if len(encoded) <= max_bytes:
+                break
+        if len(encoded) <= max_bytes or max(img.size) <= VISION_MIN_SIDE:
+            break
+        # Still over budget at the lowest quality: shrink and try again
+        img = img.resize((max(1, int(img.width * 0.75)), max(1, int(img.height * 0.75))), Image.LANCZOS)
+
+    return PreparedImage(key, encoded, img.width, img.height, len(data), embedded)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def dhash(data: bytes, size: int = 8) -> str:
+    """Difference hash (64 bits): stable across re-encoding and resizing."""
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = list(img.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left, right = pixels[row * (size + 1) + col], pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{size * size // 4}x}"
+
+
+def image_cache_key(data: bytes, mode: str = VISION_CACHE_KEY) -> str:
+    return f"dhash-{dhash(data)}" if mode == "dhash" else f"sha256-{content_hash(data)}"
+
+
+# --- Backends ---
+
+class VisionUnparsed(Exception):
+    """The model answered, but not in the expected JSON shape; `text` is the raw answer."""
+
+    def __init__(self, text: str):
+        super().__init__("vision answer is not JSON")
+        self.text = text
 
-def extract_text_from_images(attachments: List[str]) -> str:
-    """Return concatenated textual summary extracted from images (placeholder)."""
-    return ""
+
+class VisionBackend(ABC):
+    """Turns prepared images into text, one string per image (same order)."""
+
+    name = "base"
+    model = ""
+
+    @abstractmethod
+    def extract(self, images: List[PreparedImage], timeout: Optional[float] = None) -> List[str]:
+        """Empty string for an image the model returned nothing for; raise VisionUnparsed
+        when the answer cannot be mapped to the images. `timeout`: seconds for the whole call."""
+
+
+class OpenAIVisionBackend(VisionBackend):
+    name = "openai"
+
+    def __init__(self, client=None, model: str = VISION_MODEL):
+        # Own gateway op: slower than text extraction, never hedged (see llm_gateway.py)
+        self.client = client or create_openai_client(responses_op="responses_vision")
+        self.model = model
+
+    def extract(self, images: List[PreparedImage], timeout: Optional[float] = None) -> List[str]:
+        content = [{"type": "input_text", "text": VISION_PROMPT}]
+        for image in images:
+            content.append({
+                "type": "input_image",
+                "image_url": "data:image/jpeg;base64," + base64.b64encode(image.data).decode("ascii"),
+            })
+        resp = self.client.responses.create(
+            model=self.model, input=[{"role": "user", "content": content}], timeout=timeout,
+        )
+        text = getattr(resp, "output_text", "") or ""
+        try:
+            texts = [str(t or "") for t in json.loads(text).get("images", [])]
+        except Exception:
+            raise VisionUnparsed(text)
+        return (texts + [""] * len(images))[:len(images)]
+
+
+class StubVisionBackend(VisionBackend):
+    """Local backend: returns the image's embedded text metadata (no network)."""
+
+    name = "stub"
+    model = "stub"
+
+    def __init__(self):
+        self.calls = 0
+
+    def extract(self, images: List[PreparedImage], timeout: Optional[float] = None) -> List[str]:
+        self.calls += 1
+        return [image.embedded_text or f"[ảnh {image.width}x{image.height}]" for image in images]
+
+
+_backend: Optional[VisionBackend] = None
+
+
+def get_vision_backend() -> VisionBackend:
+    global _backend
+    if _backend is None:
+        _backend = StubVisionBackend() if LLM_BACKEND == "stub" else OpenAIVisionBackend()
+    return _backend
+
+
+def set_vision_backend(backend: Optional[VisionBackend]) -> None:
+    """Swap the vision backend (tests, benchmarks); None restores the default."""
+    global _backend
+    _backend = backend
+
+
+# --- Public API ---
 
 def extract_structured_fields(text: str) -> Dict[str, str]:
-    """Parse important fields from extracted text (placeholder)."""
-    return {}
+    """Parse important fields (booking_id, trip_id, date) from extracted text."""
+    fields: Dict[str, str] = {}
+    if not text:
+        return fields
+    m = re.search(r"\b(VX\d{5,12})\b", text, flags=re.IGNORECASE)
+    if m:
+        fields["booking_id"] = m.group(1).upper()
+    m = re.search(r"\b(T\d{2,6})\b", text)
+    if m:
+        fields["trip_id"] = m.group(1)
+    m = re.search(r"\b(\d{4})-(\d{2})-(\d{2})\b", text) or re.search(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b", text)
+    if m:
+        parts = m.groups()
+        year, month, day = (parts[0], parts[1], parts[2]) if len(parts[0]) == 4 else (parts[2], parts[1], parts[0])
+        fields["date"] = f"{int(year):04d}-{int(month):02d}-{int(day):02d}"
+    return fields
+
+
+def _cache_key(backend: VisionBackend, image_key: str) -> str:
+    return f"vision:{backend.name}:{backend.model}:{image_key}"
 
 
+def analyze_images(attachments: List[str], backend: Optional[VisionBackend] = None,
+                   timeout: Optional[float] = None) -> Tuple[str, Dict[str, str]]:
+    """Text and merged entities for a list of image attachments (cached by image hash).
+    `timeout`: seconds for all model calls together (the turn budget); batches that do
+    not fit are skipped."""
+    backend = backend or get_vision_backend()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    payloads: List[Tuple[str, bytes]] = []
+    for ref in attachments or []:
+        try:
+            data = load_attachment(ref).data
+            payloads.append((image_cache_key(data), data))
+        except (AttachmentError, OSError) as e:
+            print(f"⚠️ Skipping image attachment: {str(e)}")
+    if not payloads:
+        return "", {}
+
+    cache = get_shared_cache()
+    keys = [_cache_key(backend, key) for key, _ in payloads]
+    try:
+        results = cache.get_many(list(set(keys)))
+    except Exception as e:
+        print(f"❌ Error reading vision cache: {str(e)}")
+        results = {}
+    print(f"DEBUG: vision cache hits {sum(k in results for k in keys)}/{len(keys)}")
+
+    prepared: List[PreparedImage] = []
+    for (image_key, data), key in zip(payloads, keys):
+        if key in results or any(p.key == key for p in prepared):
+            continue
+        try:
+            image = preprocess_image(data, key=key)
+        except OSError as e:
+            print(f"⚠️ Cannot decode image attachment: {str(e)}")
+            continue
+        print(f"DEBUG: image {image_key[:19]} {image.original_bytes}B → {len(image.data)}B "
+              f"({image.width}x{image.height})")
+        prepared.append(image)
+
+    for start in range(0, len(prepared), VISION_BATCH_SIZE):
+        batch = prepared[start:start + VISION_BATCH_SIZE]
+        left = None if deadline is None else deadline - time.monotonic()
+        if left is not None and left <= 0:
+            print(f"⚠️ Vision budget exhausted, {len(prepared) - start} image(s) not analyzed")
+            break
+        cacheable = True
+        try:
+            texts = backend.extract(batch, timeout=left)
+        except VisionUnparsed as e:
+            # Keep the raw answer for this turn (first image), but never cache it
+            print("⚠️ Vision answer is not JSON, using it uncached")
+            texts, cacheable = [e.text], False
+        except Exception as e:
+            print(f"❌ Vision backend error: {str(e)}")
+            continue
+        fresh = {
+            image.key: {"text": text, "entities": extract_structured_fields(text)}
+            for image, text in zip(batch, texts) if text and text.strip()
+        }
+        results.update(fresh)
+        if not (cacheable and fresh):
+            continue
+        try:
+            cache.set_many(fresh, ttl=VISION_CACHE_TTL)
+        except Exception as e:
+            print(f"❌ Error caching vision results: {str(e)}")
+
+    texts, entities = [], {}
+    for key in dict.fromkeys(keys):
+        result = results.get(key)
+        if not result:
+            continue
+        if result.get("text"):
+            texts.append(result["text"])
+        for field, value in (result.get("entities") or {}).items():
+            entities.setdefault(field, value)
+    return "\n\n".join(texts), entities
+
+
+def extract_text_from_images(attachments: List[str]) -> str:
+    """Return concatenated textual summary extracted from images."""
+    return analyze_images(attachments)[0]
@@ -0,0 +1,185 @@
+"""
+Cost/latency-aware model routing for the LLM extraction tier.
+
+Intent classification and field extraction are one structured-output call
+(`extract_fields_llm`); this module decides which model answers it instead of
+sending every turn to the single OPENAI_MODEL:
+
+- every turn goes to EXTRACT_MODEL_FAST first;
+- the answer is escalated to EXTRACT_MODEL_STRONG only when it fails schema
+  validation or its confidence is below ROUTER_MIN_CONFIDENCE, and only while the
+  turn still has ROUTER_ESCALATE_MIN_S of budget. If the escalation fails the fast
+  answer is kept.
+
+EXTRACT_MODEL_FAST defaults to gpt-4.1-nano (about 2/3 of gpt-4o-mini's price per
+token) and EXTRACT_MODEL_STRONG to OPENAI_MODEL, so only the turns the fast model is
+unsure about are answered by the baseline model. Setting both to the same model
+turns routing off.
+
+Every decision and the latency, tokens and cost per model are kept in
+`get_model_router().metrics()` (API: `GET /metrics/llm`, key "routing").
+"""
+
+import os
+import json
+import time
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Sequence
+
+from src.libs.llm_gateway import LLMGatewayError
+from .llm_extractor import OPENAI_MODEL, extract_fields_llm
+
+if TYPE_CHECKING:
+    from .extraction import ExtractionResult
+
+EXTRACT_MODEL_FAST = os.getenv("EXTRACT_MODEL_FAST", "gpt-4.1-nano")
+EXTRACT_MODEL_STRONG = os.getenv("EXTRACT_MODEL_STRONG", OPENAI_MODEL)
+# Below this the fast answer is escalated to the strong model
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.6"))
+# Budget the escalation call needs (seconds, only checked when the turn has a deadline)
+ROUTER_ESCALATE_MIN_S = float(os.getenv("ROUTER_ESCALATE_MIN_S", "1.0"))
+ROUTER_METRICS_WINDOW = int(os.getenv("ROUTER_METRICS_WINDOW", "500"))
+# USD per 1M tokens: {"model": [input, output]}
+MODEL_PRICES: Dict[str, List[float]] = {
+    "gpt-4o-mini": [0.15, 0.60],
+    "gpt-4.1-nano": [0.10, 0.40],
+    "gpt-4.1-mini": [0.40, 1.60],
+    "gpt-4.1": [2.00, 8.00],
+    "gpt-4o": [2.50, 10.00],
+    **json.loads(os.getenv("MODEL_PRICES", "{}")),
+}
+
+# Local tier confidence above which a disagreeing LLM value counts against the answer
+_LOCAL_TRUSTED = 0.9
+_CHECKED_FIELDS = ("intent", "booking_id", "trip_id", "date")
+
+
+def model_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return input_tokens / 1e6 * price_in + output_tokens / 1e6 * price_out
+
+
+def answer_confidence(data: Dict[str, Optional[str]], errors: Sequence[str], local: "ExtractionResult",
+                      required_fields: Mapping[str, Sequence[str]]) -> float:
+    """Heuristic confidence of one LLM answer (the API returns no calibrated score)."""
+    if "invalid_json" in errors:
+        return 0.0
+    score = 1.0 - 0.25 * len(errors)
+    intent = data.get("intent")
+    if not intent or intent == "unknown":
+        score -= 0.35
+    for name in _CHECKED_FIELDS:
+        if data.get(name) and local.confidence(name) >= _LOCAL_TRUSTED and data[name] != local.get(name):
+            score -= 0.3
+    for name in required_fields.get(intent or "", ()):
+        if not data.get(name) and not local.get(name):
+            score -= 0.15
+    return max(0.0, min(1.0, score))
+
+
+@dataclass
+class RoutedAnswer:
+    data: Dict[str, Optional[str]]
+    model: str                                        # model whose answer is used
+    decision: str                                     # fast | escalated:<reason> | fast:escalation_*:<reason>
+    confidence: float
+    models: List[str] = field(default_factory=list)   # models called, in order
+
+
+class _ModelStats:
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.latency: deque = deque(maxlen=ROUTER_METRICS_WINDOW)
+        self.cost = 0.0
+
+
+class ModelRouter:
+    def __init__(self, fast: str = EXTRACT_MODEL_FAST, strong: str = EXTRACT_MODEL_STRONG):
+        self.fast = fast
+        self.strong = strong
+        self._stats: Dict[str, _ModelStats] = {}
+        self._decisions: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, model: str, text: str, timeout: Optional[float]):
+        meta: Dict[str, Any] = {}
+        started = time.monotonic()
+        try:
+            data = extract_fields_llm(text, timeout=timeout, model=model, meta=meta)
+        except LLMGatewayError:
+            self._record(model, time.monotonic() - started, meta, failed=True)
+            raise
+        self._record(model, time.monotonic() - started, meta)
+        return data, meta.get("schema_errors") or []
+
+    def _record(self, model: str, elapsed: float, meta: Dict[str, Any], failed: bool = False) -> None:
+        input_tokens, output_tokens = meta.get("input_tokens", 0), meta.get("output_tokens", 0)
+        with self._lock:
+            stats = self._stats.setdefault(model, _ModelStats())
+            stats.counts["calls"] += 1
+            if failed:
+                stats.counts["errors"] += 1
+            else:
+                stats.latency.append(elapsed)
+            if meta.get("schema_errors"):
+                stats.counts["schema_errors"] += 1
+            stats.counts["input_tokens"] += input_tokens
+            stats.counts["output_tokens"] += output_tokens
+            stats.cost += model_cost(model, input_tokens, output_tokens)
+
+    def extract(self, text: str, local: "ExtractionResult", required_fields: Mapping[str, Sequence[str]],
+                timeout: Optional[float] = None) -> RoutedAnswer:
+        """Answer of the cheapest model that is good enough. Raises LLMGatewayError
+        when the first model cannot be reached (the engine keeps the local tiers)."""
+        started = time.monotonic()
+        data, errors = self._call(self.fast, text, timeout)
+        confidence = answer_confidence(data, errors, local, required_fields)
+        answer = RoutedAnswer(data, self.fast, "fast", confidence, [self.fast])
+
+        if self.fast != self.strong:
+            reason = "schema" if errors else "low_confidence" if confidence < ROUTER_MIN_CONFIDENCE else None
+            if reason:
+                left = None if timeout is None else timeout - (time.monotonic() - started)
+                if left is not None and left < ROUTER_ESCALATE_MIN_S:
+                    answer.decision = f"fast:escalation_skipped_budget:{reason}"
+                else:
+                    answer.models.append(self.strong)
+                    try:
+                        strong_data, strong_errors = self._call(self.strong, text, left)
+                        answer = RoutedAnswer(
+                            strong_data, self.strong, f"escalated:{reason}",
+                            answer_confidence(strong_data, strong_errors, local, required_fields), answer.models,
+                        )
+                    except LLMGatewayError as e:
+                        print(f"⚠️ Escalation to {self.strong} failed, keeping {self.fast} answer: {str(e)}")
+                        answer.decision = f"fast:escalation_failed:{reason}"
+
+        with self._lock:
+            self._decisions[answer.decision] += 1
+        print(f"DEBUG: Model route={answer.decision} models={answer.models} confidence={answer.confidence:.2f}")
+        return answer
+
+    def metrics(self) -> Dict[str, Any]:
+        models = {}
+        with self._lock:
+            for model, stats in self._stats.items():
+                latency = sorted(stats.latency)
+                ms = lambda q: round(latency[min(len(latency) - 1, int(len(latency) * q))] * 1000, 1) if latency else None
+                models[model] = {**stats.counts, "p50_ms": ms(0.5), "p95_ms": ms(0.95), "cost_usd": round(stats.cost, 6)}
+            decisions = dict(self._decisions)
+        return {"fast": self.fast, "strong": self.strong, "decisions": decisions, "models": models}
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
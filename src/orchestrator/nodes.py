@@ -2,49 +2,95 @@
 LangGraph nodes for handling different user intents.
 """
 
-from typing import Dict, Any
+import os
+from typing import Dict, Any, Optional
+import requests
 from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+from src.libs.shared_cache import get_shared_cache
+from src.libs.single_flight import SingleFlightTimeout, get_single_flight
 from src.services.booking_sqlite import BookingServiceSQL
 from .types import State
+from .budget import (
+    BOOKING_API_TIMEOUT_S, FAQ_VECTOR_MIN_BUDGET_S, HTTP_MIN_BUDGET_S, LLM_MIN_BUDGET_S, MEDIA_MIN_BUDGET_S,
+    call_timeout, has_budget,
+)
 from .utils import fmt_dt_vn, fmt_date_vn_just_day, fmt_fee_vnd, md_candidates_table
-from .llm_extractor import extract_fields_llm
+from .extraction import extract_fields, parse_awaited_reply
+from .places import canonicalize_place, extract_route
 from .rag_faq import get_contextual_faq_response
+from .media.vision import analyze_images
+from .media.audio import transcribe_audio
+from .media.normalize import normalize_text_to_entities
+from .media.attachments import AttachmentError
+from .media.store import attachment_kind, store_inline_attachments
 
 # --- Media processing placeholders (image/audio) ---
 def media_ingest_node(state: State) -> State:
     """Detect and ingest media (image/audio). Route text to downstream nodes.
-    - If media present, set media_type and keep attachments for later nodes.
+    - If media present, set media_type and keep only small references (media store
+      handles / URLs) in State; inline base64 is moved to the store. The bytes are
+      loaded lazily by the vision/audio nodes.
     - If no media, no-op.
     """
     attachments = state.get("attachments") or []
     if not attachments:
         return {}
-    # Heuristic: assume caller sets media_type already; default to image if unknown
-    media_type = state.get("media_type") or "image"
-    return {"media_type": media_type, "attachments": attachments}
+    handles, kinds = [], []
+    for ref in attachments:
+        try:
+            handle = store_inline_attachments([ref], allow_files=True)[0]
+            kinds.append(attachment_kind(handle))
+            handles.append(handle)
+        except AttachmentError as e:
+            print(f"⚠️ Dropping attachment: {str(e)}")
+    if not handles:
+        return {"attachments": [], "error": "attachment_unavailable"}
+    # Caller-provided media_type wins; otherwise use the stored MIME type, default image
+    media_type = state.get("media_type") or next((k for k in kinds if k), None) or "image"
+    return {"media_type": media_type, "attachments": handles}
 
-def image_vision_node(state: State) -> State:
-    """Use GPT-4o Vision to extract text and key fields from images (skeleton)."""
+def image_vision_node(state: State, config: Optional[RunnableConfig] = None) -> State:
+    """Use the vision backend to extract text and key fields from images
+    (preprocessed, batched and cached by image hash in media/vision.py)."""
     if state.get("media_type") != "image":
         return {}
-    # Placeholder: downstream implementation will call GPT-4o on images
-    # and populate media_text + structured_entities.
-    return {}
+    if not has_budget(config, MEDIA_MIN_BUDGET_S):
+        print("⚠️ Turn budget too low, skipping image analysis")
+        return {"degradations": ["media_skipped"]}
+    text, entities = analyze_images(state.get("attachments") or [], timeout=call_timeout(config))
+    if not text and not entities:
+        return {}
+    return {"media_text": text, "structured_entities": entities}
 
-def audio_transcribe_node(state: State) -> State:
-    """Use Whisper/gpt-4o-mini-transcribe to get transcript from audio (skeleton)."""
+def audio_transcribe_node(state: State, config: Optional[RunnableConfig] = None) -> State:
+    """Use Whisper/gpt-4o-mini-transcribe to get transcript from audio
+    (silence-trimmed, chunked at pauses and cached by audio hash in media/audio.py)."""
     if state.get("media_type") != "audio":
         return {}
-    # Placeholder: downstream implementation will transcribe and set media_text.
-    return {}
+    if not has_budget(config, MEDIA_MIN_BUDGET_S):
+        print("⚠️ Turn budget too low, skipping audio transcription")
+        return {"degradations": ["media_skipped"]}
+    transcript = transcribe_audio(state.get("attachments") or [], timeout=call_timeout(config))
+    if not transcript:
+        return {}
+    return {"media_text": transcript}
 
 def ticket_parse_node(state: State) -> State:
-    """Normalize/validate text from media to structured entities (skeleton)."""
+    """Normalize/validate text from media to structured entities
+    (booking_id/trip_id patterns, date, canonical route names)."""
     media_text = state.get("media_text")
     if not media_text:
         return {}
-    # Placeholder: downstream will normalize date, map routes, detect booking_id.
-    return {}
+    entities = {**normalize_text_to_entities(media_text), **(state.get("structured_entities") or {})}
+    for field in ("route_from", "route_to"):
+        if entities.get(field):
+            entities[field] = canonicalize_place(entities[field]) or entities[field]
+    updates: Dict[str, Any] = {"structured_entities": entities}
+    for field in ("booking_id", "trip_id", "date", "route_from", "route_to"):
+        if entities.get(field):
+            updates[field] = entities[field]
+    return updates
 
 def merge_media_text_node(state: State) -> State:
     """Merge media_text with last user text so classifier sees unified content."""
@@ -57,21 +103,38 @@ def merge_media_text_node(state: State) -> State:
 
 # Service instance
 svc = BookingServiceSQL("src/data/mock.db")
+# Last good /trips/available answer per route+date, served when the API is slow or the budget is spent
+AVAILABILITY_CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", "600"))
 
-def classify_node(state: State) -> State:
+def resume_node(state: State) -> State:
+    """Fill the field asked for last turn from a short reply (validated locally by
+    route_from_start), so classify and the LLM are skipped."""
+    awaiting = state.get("awaiting")
+    text = state["messages"][-1].content if state.get("messages") else ""
+    value = parse_awaited_reply(text, awaiting, state.get("awaiting_options"))
+    print(f"DEBUG: Resuming with {awaiting}={value} (classify skipped)")
+    return {awaiting: value, "intent": "change_time", "awaiting": None, "awaiting_options": None}
+
+def classify_node(state: State, config: Optional[RunnableConfig] = None) -> State:
     """
-    Classify intent and extract fields using LLM.
+    Classify intent and extract fields (local tiers first, LLM only if still unresolved
+    and the turn still has budget for it).
     """
     text = state["messages"][-1].content if state.get("messages") else ""
-    updates: Dict[str, Any] = {}
+    # Full classification: whatever the previous turn was waiting for no longer applies
+    updates: Dict[str, Any] = {"awaiting": None, "awaiting_options": None}
 
     print(f"DEBUG: Analyzing text: '{text}'")
     
-    # Use LLM to extract information and classify intent
-    fx = extract_fields_llm(text)
-    print(f"DEBUG: LLM extracted: {fx}")
+    # Tiered extraction: regex ids → date parser → place aliases → keywords → LLM
+    use_llm = has_budget(config, LLM_MIN_BUDGET_S)
+    extraction = extract_fields(text, use_llm=use_llm, timeout=call_timeout(config))
+    if extraction.degraded:
+        updates["degradations"] = ["extract_heuristic"]
+    fx = extraction.values()
+    print(f"DEBUG: Extracted: {fx} (sources: {extraction.sources()})")
     
-    # Extract fields from LLM (including intent)
+    # Extract fields (including intent)
     intent = fx.get("intent")
     bid  = fx.get("booking_id")
     date = fx.get("date")
@@ -81,20 +144,20 @@ def classify_node(state: State) -> State:
     complaint_type = fx.get("complaint_type")
     description = fx.get("description")
 
-    # Use intent from LLM (already intelligently classified)
+    # Use classified intent (keyword tier or LLM)
     if intent:
         updates["intent"] = intent
-        print(f"DEBUG: Using LLM classified intent: {intent}")
+        print(f"DEBUG: Using classified intent: {intent} ({extraction.sources().get('intent')})")
     else:
         # Heuristic default: if we have any change_time signals, default to change_time
         prior_bid = state.get("booking_id")
         prior_date = state.get("date")
         if prior_bid or prior_date or trip:
             updates["intent"] = "change_time"
-            print("DEBUG: No intent from LLM; inferring 'change_time' from available fields")
+            print("DEBUG: No intent extracted; inferring 'change_time' from available fields")
         else:
             updates["intent"] = "unknown"
-            print("DEBUG: No intent from LLM, defaulting to unknown")
+            print("DEBUG: No intent extracted, defaulting to unknown")
 
     # Update fields to state
     if bid:  updates["booking_id"] = bid
@@ -143,22 +206,27 @@ def candidates_node(state: State) -> State:
         if current_trip_id:
             header += f"\nHiện tại vé của bạn đang ở chuyến: `{current_trip_id}`"
         msg = f"{header}\n\n{table}\n\n👉 Vui lòng trả lời **mã chuyến** bạn muốn (ví dụ: `T001`)."
-        return {"messages": [AIMessage(content=msg)]}
+        # Next turn is usually just the trip id: let route_from_start resume straight to apply
+        options = [c["trip_id"] for c in cands if c.get("trip_id")]
+        return {"messages": [AIMessage(content=msg)], "trip_id": None,
+                "awaiting": "trip_id", "awaiting_options": options}
     except KeyError:
         return {"messages": [AIMessage(content="Không tìm thấy vé. Vui lòng kiểm tra lại **mã vé**.")]}    
 
-def apply_node(state: State) -> State:
+def apply_node(state: State, config: Optional[RunnableConfig] = None) -> State:
     """Apply trip change for change_time intent."""
     text = state["messages"][-1].content if state.get("messages") else ""
-    # Use LLM to extract trip_id from this turn if not already available
+    # Extract trip_id from this turn if not already available (LLM only if regex misses it)
     trip_id = state.get("trip_id")
     if not trip_id:
-        fx = extract_fields_llm(text)
-        trip_id = fx.get("trip_id")
+        trip_id = extract_fields(
+            text, required=["trip_id"], use_llm=has_budget(config, LLM_MIN_BUDGET_S), timeout=call_timeout(config),
+        ).get("trip_id")
 
     bid = state.get("booking_id")
     if not trip_id:
-        return {"messages": [AIMessage(content="👉 Vui lòng cung cấp **mã chuyến** muốn đổi (ví dụ: `T001`).")]}
+        return {"messages": [AIMessage(content="👉 Vui lòng cung cấp **mã chuyến** muốn đổi (ví dụ: `T001`).")],
+                "awaiting": "trip_id"}
     try:
         res = svc.apply_change(bid, trip_id)
         if res.get("status") == "ok":
@@ -182,8 +250,10 @@ def apply_node(state: State) -> State:
                     + f"- Phí đổi giờ: **{fee_str}**\n\n"
                     + "Vui lòng kiểm tra **SMS/email** để xác nhận."
                 )
-            return {"trip_id": trip_id, "result": res, "messages": [AIMessage(content=msg)]}
-        return {"messages": [AIMessage(content=" Không thể đổi vì **hết chỗ** hoặc lỗi khác. Hãy thử **một chuyến khác**.")]}
+            return {"trip_id": trip_id, "result": res, "messages": [AIMessage(content=msg)],
+                    "awaiting": None, "awaiting_options": None}
+        return {"messages": [AIMessage(content=" Không thể đổi vì **hết chỗ** hoặc lỗi khác. Hãy thử **một chuyến khác**.")],
+                "trip_id": None, "awaiting": "trip_id"}
     except KeyError as e:
         return {"messages": [AIMessage(content=f" {str(e)}")]}
 
@@ -225,10 +295,53 @@ def check_booking_node(state: State) -> State:
     except Exception as e:
         return {"messages": [AIMessage(content=f" Lỗi khi kiểm tra vé: {str(e)}")]}
 
-def view_trips_node(state: State) -> State:
+def _fetch_available_trips(route_from: str, route_to: str, date: str, timeout: Optional[float]):
+    """(status, data) from GET /trips/available; data is None unless status is 200."""
+    response = requests.get("http://localhost:8080/trips/available", params={
+        "route_from": route_from,
+        "route_to": route_to,
+        "date": date
+    }, timeout=timeout)
+    return response.status_code, (response.json() if response.status_code == 200 else None)
+
+def _available_trips(route_from: str, route_to: str, date: str, config: Optional[RunnableConfig]):
+    """(data, status, degradations) from the booking API within the turn budget, falling
+    back to the last cached answer for the same route/date when the API is slow or down.
+    Concurrent lookups of the same route/date share one API call (single-flight)."""
+    cache_key = f"avail:{route_from}:{route_to}:{date}"
+    status = "timeout"  # also when no budget is left to call the API at all
+    if has_budget(config, HTTP_MIN_BUDGET_S):
+        timeout = call_timeout(config, BOOKING_API_TIMEOUT_S)
+        try:
+            status, data = get_single_flight("availability").do(
+                (route_from, route_to, date),
+                lambda: _fetch_available_trips(route_from, route_to, date, timeout),
+                wait=timeout,
+            )
+            if status == 200:
+                try:
+                    get_shared_cache().set(cache_key, data, ttl=AVAILABILITY_CACHE_TTL)
+                except Exception as e:
+                    print(f"❌ Error caching availability: {str(e)}")
+                return data, status, []
+        except (requests.Timeout, SingleFlightTimeout) as e:
+            print(f"⚠️ Availability API timed out: {str(e)}")
+        except requests.RequestException as e:
+            print(f"⚠️ Availability API failed: {str(e)}")
+            status = "unavailable"
+    cached = get_shared_cache().get(cache_key)
+    if cached is not None:
+        print(f"🔄 Serving cached availability for {cache_key}")
+        return cached, status, ["availability_cached"]
+    return None, status, (["booking_api_timeout"] if status == "timeout" else [])
+
+def view_trips_node(state: State, config: Optional[RunnableConfig] = None) -> State:
     """Handle view_trips intent."""
-    route_from = state.get("route_from")
-    route_to = state.get("route_to")
+    text = state["messages"][-1].content if state.get("messages") else ""
+    route = extract_route(text) if not (state.get("route_from") and state.get("route_to")) else {}
+    # Tên địa điểm phải khớp chính xác cột route_from/route_to trong bảng trips
+    route_from = canonicalize_place(state.get("route_from")) or state.get("route_from") or route.get("route_from")
+    route_to = canonicalize_place(state.get("route_to")) or state.get("route_to") or route.get("route_to")
     date = state.get("date")
     
     # If missing information, ask user
@@ -245,21 +358,14 @@ def view_trips_node(state: State) -> State:
         return {"messages": [AIMessage(content=msg)]}
     
     try:
-        # Call API to get trip list
-        import requests
-        response = requests.get("http://localhost:8080/trips/available", params={
-            "route_from": route_from,
-            "route_to": route_to,
-            "date": date
-        })
-        
-        if response.status_code == 200:
-            data = response.json()
+        data, status, degradations = _available_trips(route_from, route_to, date, config)
+        if data is not None:
             trips = data.get("trips", [])
             
+            stale_note = "\n\n_ℹ Dữ liệu chỗ trống có thể chưa cập nhật._" if degradations else ""
             if not trips:
-                msg = f" **Không có chuyến khả dụng** cho tuyến **{route_from} → {route_to}** ngày **{date}**."
-                return {"messages": [AIMessage(content=msg)]}
+                msg = f" **Không có chuyến khả dụng** cho tuyến **{route_from} → {route_to}** ngày **{date}**.{stale_note}"
+                return {"messages": [AIMessage(content=msg)], "degradations": degradations}
             
             # Format trip table
             table_rows = ["| Mã chuyến | Giờ xuất phát | Chỗ còn | Giá |", "|---|---:|---:|---:|"]
@@ -267,16 +373,19 @@ def view_trips_node(state: State) -> State:
                 table_rows.append(f"| `{trip['trip_id']}` | {fmt_dt_vn(trip['depart_time'])} | {trip['seats_available']} | {fmt_fee_vnd(trip['base_price'])} |")
             
             table = "\n".join(table_rows)
-            msg = f"🚌 **Các lựa chọn khả dụng cho {fmt_date_vn_just_day(date)}**\n\n**Tuyến:** {route_from} → {route_to}\n\n{table}\n\n💡 Bạn có muốn **đặt vé** cho chuyến nào không?"
+            msg = f"🚌 **Các lựa chọn khả dụng cho {fmt_date_vn_just_day(date)}**\n\n**Tuyến:** {route_from} → {route_to}\n\n{table}\n\n💡 Bạn có muốn **đặt vé** cho chuyến nào không?{stale_note}"
             
-            return {"result": data, "messages": [AIMessage(content=msg)]}
+            return {"result": data, "messages": [AIMessage(content=msg)], "degradations": degradations}
+        elif status == "timeout":
+            msg = "⏳ Hệ thống đang phản hồi chậm, chưa lấy được danh sách chuyến. Vui lòng thử lại sau ít phút."
+            return {"messages": [AIMessage(content=msg)], "degradations": degradations}
         else:
-            return {"messages": [AIMessage(content=f"Lỗi khi lấy danh sách chuyến: {response.status_code}")]}
+            return {"messages": [AIMessage(content=f"Lỗi khi lấy danh sách chuyến: {status}")], "degradations": degradations}
             
     except Exception as e:
         return {"messages": [AIMessage(content=f"Lỗi khi xem chuyến: {str(e)}")]}
 
-def cancel_booking_node(state: State) -> State:
+def cancel_booking_node(state: State, config: Optional[RunnableConfig] = None) -> State:
     """Handle cancel_booking intent."""
     booking_id = state.get("booking_id")
     
@@ -285,8 +394,8 @@ def cancel_booking_node(state: State) -> State:
     
     try:
         # Call API to cancel booking
-        import requests
-        response = requests.post(f"http://localhost:8080/bookings/{booking_id}/cancel")
+        response = requests.post(f"http://localhost:8080/bookings/{booking_id}/cancel",
+                                 timeout=call_timeout(config, BOOKING_API_TIMEOUT_S))
         
         if response.status_code == 200:
             data = response.json()
@@ -303,10 +412,13 @@ def cancel_booking_node(state: State) -> State:
         else:
             return {"messages": [AIMessage(content=f" Lỗi khi hủy vé: {response.status_code}")]}
             
+    except requests.Timeout:
+        msg = "⏳ Hệ thống đang phản hồi chậm, **chưa xác nhận được** việc hủy vé. Vui lòng kiểm tra lại vé sau ít phút."
+        return {"messages": [AIMessage(content=msg)], "degradations": ["booking_api_timeout"]}
     except Exception as e:
         return {"messages": [AIMessage(content=f" Lỗi khi hủy vé: {str(e)}")]}
 
-def get_invoice_node(state: State) -> State:
+def get_invoice_node(state: State, config: Optional[RunnableConfig] = None) -> State:
     """Handle get_invoice intent."""
     booking_id = state.get("booking_id")
     
@@ -315,8 +427,8 @@ def get_invoice_node(state: State) -> State:
     
     try:
         # Call API to get invoice
-        import requests
-        response = requests.get(f"http://localhost:8080/bookings/{booking_id}/invoice")
+        response = requests.get(f"http://localhost:8080/bookings/{booking_id}/invoice",
+                                timeout=call_timeout(config, BOOKING_API_TIMEOUT_S))
         
         if response.status_code == 200:
             data = response.json()
@@ -334,10 +446,13 @@ def get_invoice_node(state: State) -> State:
         else:
             return {"messages": [AIMessage(content=f" Lỗi khi lấy hóa đơn: {response.status_code}")]}
             
+    except requests.Timeout:
+        msg = "⏳ Hệ thống đang phản hồi chậm, chưa lấy được hóa đơn. Vui lòng thử lại sau ít phút."
+        return {"messages": [AIMessage(content=msg)], "degradations": ["booking_api_timeout"]}
     except Exception as e:
         return {"messages": [AIMessage(content=f" Lỗi khi lấy hóa đơn: {str(e)}")]}
 
-def create_complaint_node(state: State) -> State:
+def create_complaint_node(state: State, config: Optional[RunnableConfig] = None) -> State:
     """Handle create_complaint intent."""
     booking_id = state.get("booking_id")
     complaint_type = state.get("complaint_type")
@@ -354,14 +469,14 @@ def create_complaint_node(state: State) -> State:
     
     try:
         # Call API to create complaint
-        import requests
         response = requests.post(
             f"http://localhost:8080/complaints",
             params={
                 "booking_id": booking_id,
                 "complaint_type": complaint_type,
                 "description": description
-            }
+            },
+            timeout=call_timeout(config, BOOKING_API_TIMEOUT_S),
         )
         
         if response.status_code == 200:
@@ -378,11 +493,14 @@ def create_complaint_node(state: State) -> State:
         else:
             return {"messages": [AIMessage(content=f" Lỗi khi tạo khiếu nại: {response.status_code}")]}
             
+    except requests.Timeout:
+        msg = "⏳ Hệ thống đang phản hồi chậm, **chưa xác nhận được** khiếu nại. Vui lòng thử lại sau ít phút."
+        return {"messages": [AIMessage(content=msg)], "degradations": ["booking_api_timeout"]}
     except Exception as e:
         return {"messages": [AIMessage(content=f" Lỗi khi tạo khiếu nại: {str(e)}")]}
 
-def faq_node(state: State) -> State:
-    """Handle FAQ intent using RAG system."""
+def faq_node(state: State, config: Optional[RunnableConfig] = None) -> State:
+    """Handle FAQ intent using RAG system (BM25 only when the turn budget is nearly spent)."""
     text = state["messages"][-1].content if state.get("messages") else ""
     
     if not text:
@@ -390,12 +508,15 @@ def faq_node(state: State) -> State:
     
     try:
         # Get contextual FAQ response using RAG
-        response = get_contextual_faq_response(text)
+        use_vector = has_budget(config, FAQ_VECTOR_MIN_BUDGET_S)
+        meta = {}
+        response = get_contextual_faq_response(text, use_vector=use_vector, timeout=call_timeout(config), meta=meta)
         
         # Format the response
         msg = f" **Câu hỏi thường gặp**\n\n{response}"
         
-        return {"messages": [AIMessage(content=msg)]}
+        # faq_lexical: no budget for the vector search, or gave up waiting for an identical in-flight query
+        return {"messages": [AIMessage(content=msg)], "degradations": [meta["degraded"]] if meta.get("degraded") else []}
         
     except Exception as e:
         return {"messages": [AIMessage(content=f" Lỗi khi tìm kiếm thông tin: {str(e)}")]}
@@ -0,0 +1,186 @@
+"""
+Place/route normalization without the LLM.
+
+Aliases from `src/data/place_aliases.json` ("TPHCM", "Sài Gòn", "SG", "dalat", ...)
+are compiled once into an Aho–Corasick automaton over diacritic-folded syllables,
+so one left-to-right pass over the message finds every place mention (longest
+alias wins, only on syllable boundaries) and maps it to the canonical name used
+in the trips table ("HCM", "Da Lat", ...). Origin/destination come from the
+markers around each mention ("từ", "đến", "đi", "về", "-", ...).
+"""
+
+import os
+import re
+import json
+import threading
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .text_norm import fold_diacritics, normalize_text
+
+PLACE_ALIASES_PATH = os.getenv(
+    "PLACE_ALIASES_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "place_aliases.json"),
+)
+
+# Words right before a place that mark its role ("từ HCM", "đi từ HCM", "đến Đà Lạt", ...).
+# Written with diacritics: folded "ve" is both "về" (to) and "vé" (ticket), so the folded
+# form is only used when the user typed without diacritics.
+FROM_MARKERS = {"từ", "xuất phát", "khởi hành", "đi từ"}
+TO_MARKERS = {"đến", "tới", "về", "ra", "vào", "đi", "sang", "lên", "xuống"}
+
+
+@dataclass
+class PlaceMatch:
+    place: str   # canonical name
+    start: int   # syllable index (inclusive)
+    end: int     # syllable index (exclusive)
+
+
+class PlaceMatcher:
+    """Aho–Corasick automaton whose alphabet is folded syllables."""
+
+    def __init__(self, aliases: Dict[str, List[str]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # Longest alias ending at each state: (canonical, syllable count)
+        self.output: List[Optional[Tuple[str, int]]] = [None]
+        self.canonical: Dict[str, str] = {}
+        for place, names in aliases.items():
+            for name in [place] + list(names):
+                key = normalize_text(name)
+                if key:
+                    self._add(key.split(), place)
+                    self.canonical[key] = place
+                    self.canonical[key.replace(" ", "")] = place
+        self._link()
+
+    def _add(self, sylls: List[str], place: str) -> None:
+        state = 0
+        for syll in sylls:
+            nxt = self.goto[state].get(syll)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][syll] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+            state = nxt
+        self.output[state] = (place, len(sylls))
+
+    def _link(self) -> None:
+        # BFS: failure link = longest proper suffix that is also a trie path
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for syll, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and syll not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(syll, 0) if state else 0
+                if self.output[nxt] is None:
+                    self.output[nxt] = self.output[self.fail[nxt]]
+
+    def find(self, sylls: List[str]) -> List[PlaceMatch]:
+        """Non-overlapping place mentions, leftmost-longest."""
+        candidates: List[PlaceMatch] = []
+        state = 0
+        for i, syll in enumerate(sylls):
+            while state and syll not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(syll, 0)
+            if self.output[state]:
+                place, length = self.output[state]
+                candidates.append(PlaceMatch(place, i + 1 - length, i + 1))
+        matches: List[PlaceMatch] = []
+        for match in sorted(candidates, key=lambda m: (m.start, -(m.end - m.start))):
+            if not matches or match.start >= matches[-1].end:
+                matches.append(match)
+        return matches
+
+
+_matcher: Optional[PlaceMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def load_place_aliases(path: str = PLACE_ALIASES_PATH) -> Dict[str, List[str]]:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def get_place_matcher() -> PlaceMatcher:
+    """Process-wide automaton, compiled on first use."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = PlaceMatcher(load_place_aliases())
+                print(f"✅ Compiled {len(_matcher.canonical)} place aliases ({len(_matcher.goto)} states)")
+    return _matcher
+
+
+def find_places(text: str) -> List[PlaceMatch]:
+    return get_place_matcher().find(normalize_text(text).split())
+
+
+def canonicalize_place(name: Optional[str]) -> Optional[str]:
+    """Canonical place for a single name ("Sài Gòn" → "HCM"), None if unknown."""
+    if not name:
+        return None
+    key = normalize_text(name)
+    matcher = get_place_matcher()
+    return matcher.canonical.get(key) or matcher.canonical.get(key.replace(" ", ""))
+
+
+_FOLDED_MARKERS = {
+    role: {fold_diacritics(m) for m in markers}
+    for role, markers in (("from", FROM_MARKERS), ("to", TO_MARKERS))
+}
+
+
+def _words(text: str) -> List[str]:
+    """Lowercased words with diacritics, aligned 1:1 with `normalize_text(text).split()`."""
+    return re.sub(r"[^\w]+", " ", unicodedata.normalize("NFC", text or "").lower()).split()
+
+
+def _role(words: List[str], start: int) -> Optional[str]:
+    for size in (2, 1):
+        if start < size:
+            continue
+        phrase = " ".join(words[start - size:start])
+        folded = fold_diacritics(phrase)
+        for role, markers in (("from", FROM_MARKERS), ("to", TO_MARKERS)):
+            if phrase in markers or (folded == phrase and folded in _FOLDED_MARKERS[role]):
+                return role
+    return None
+
+
+def extract_route(text: str) -> Dict[str, Optional[str]]:
+    """{"route_from", "route_to"} from free text in one pass (None when not found).
+
+    "từ Sài Gòn đi Đà Lạt", "SG - dalat", "đi Nha Trang" (destination only),
+    "về SG từ Đà Lạt" (markers win over order).
+    """
+    sylls = normalize_text(text).split()
+    words = _words(text)
+    if len(words) != len(sylls):
+        words = sylls
+    route: Dict[str, Optional[str]] = {"route_from": None, "route_to": None}
+    unassigned: List[str] = []
+    for match in get_place_matcher().find(sylls):
+        role = _role(words, match.start)
+        key = {"from": "route_from", "to": "route_to"}.get(role)
+        if key and not route[key]:
+            route[key] = match.place
+        elif match.place not in route.values() and match.place not in unassigned:
+            unassigned.append(match.place)
+    # Mentions without a marker fill the remaining slots in reading order ("HCM - Da Lat")
+    for place in unassigned:
+        if not route["route_from"] and place != route["route_to"]:
+            route["route_from"] = place
+        elif not route["route_to"] and place != route["route_from"]:
+            route["route_to"] = place
+    return route
@@ -6,41 +6,117 @@ Uses OpenAI embeddings and ChromaDB for semantic search and retrieval.
 import os
 import csv
 import json
+import time
+import hashlib
+import threading
 import numpy as np
-from typing import List, Dict, Tuple, Optional
-from pathlib import Path
-from openai import OpenAI
+from typing import Any, List, Dict, Tuple, Optional
 import chromadb
 from chromadb.config import Settings
 from dotenv import load_dotenv
+from src.libs.llm_client import create_openai_client, LLM_BACKEND
+from src.libs.shared_cache import LockTimeout, get_shared_cache
+from src.libs.single_flight import SingleFlightTimeout, get_single_flight
+from .text_norm import normalize_exact, tokenize
+from .lexical_index import BM25Index, build_faq_lexical_index
+from .faq_answer_table import FAQAnswerTable
+from .faq_config import (
+    EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, EMBEDDING_QUANTIZATION, CHROMA_DB_PATH, DEFAULT_FAQ_PATH,
+    FAQ_DISTANCE_METRIC, FAQ_WATCH_INTERVAL, FAQ_INDEX_BACKEND, FAQ_INDEX_PATH, FAQ_INDEX_VERIFY, FAQ_INDEX_ON_MISMATCH,
+    collection_name_for, distance_to_similarity,
+)
+from .vector_store import VectorStore
+from .faq_index_file import (
+    FAQIndexMismatch, MappedFAQIndex, expected_index_meta, header_mismatches, lexical_index_arrays, read_header, write_faq_index,
+)
+from .faq_ingest import (
+    file_sha256, open_collection, prune_collections, ingest_faq_csv, embed_texts, load_ingest_checkpoint, checkpoint_path_for,
+)
 
 load_dotenv()
 
 # OpenAI configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Thiếu OPENAI_API_KEY (đặt env hoặc .env).")
-
-oai_client = OpenAI(api_key=OPENAI_API_KEY)
-EMBEDDING_MODEL = "text-embedding-3-small"
-
-# ChromaDB configuration
-CHROMA_DB_PATH = "src/data/chroma_db"
-COLLECTION_NAME = "faq_embeddings"
-# Default faq path after src/ move
-DEFAULT_FAQ_PATH = (Path(__file__).resolve().parents[1] / "data" / "faq_data.csv").as_posix()
+oai_client = create_openai_client()
+# Query embeddings are cached in the shared store so every worker benefits
+QUERY_EMBEDDING_TTL = float(os.getenv("QUERY_EMBEDDING_TTL", str(7 * 24 * 3600)))
+# Max texts per embeddings request when searching in bulk
+QUERY_EMBED_BATCH = int(os.getenv("QUERY_EMBED_BATCH", "512"))
+# Hybrid retrieval: BM25 answers alone when decisive, otherwise boosts vector scores
+LEXICAL_DECISIVE_SCORE = float(os.getenv("LEXICAL_DECISIVE_SCORE", "0.85"))
+LEXICAL_DECISIVE_MARGIN = float(os.getenv("LEXICAL_DECISIVE_MARGIN", "0.2"))
+LEXICAL_BOOST = float(os.getenv("LEXICAL_BOOST", "0.5"))
+FUSION_CANDIDATES = int(os.getenv("FUSION_CANDIDATES", "10"))
+# Cross-worker build lock: lease renewed while building, waiters give up after FAQ_BUILD_WAIT_S
+BUILD_LOCK_NAME = f"faq_build:{CHROMA_DB_PATH}"
+FAQ_BUILD_LEASE_TTL_S = float(os.getenv("FAQ_BUILD_LEASE_TTL_S", "60"))
+FAQ_BUILD_WAIT_S = float(os.getenv("FAQ_BUILD_WAIT_S", "120"))
+NOT_FOUND_RESPONSE = "Xin lỗi, tôi không tìm thấy thông tin liên quan đến câu hỏi của bạn trong cơ sở dữ liệu FAQ."
 
 class FAQRAG:
     """RAG system for FAQ retrieval and generation using ChromaDB."""
     
-    def __init__(self, faq_csv_path: str = None):
+    def __init__(self, faq_csv_path: str = None, fallback_lexical: bool = True):
         self.faq_csv_path = faq_csv_path or DEFAULT_FAQ_PATH
+        self.csv_path = self.faq_csv_path
         self.faq_data: List[Dict[str, str]] = []
+        self.lexical_index: Optional[BM25Index] = None
+        self.lexical_self_scores: List[float] = []
+        self.corpus_hash = ""
+        self.answer_table = FAQAnswerTable(self.corpus_hash)
         self.client = None
         self.collection = None
-        self.initialize_chromadb()
-        self.load_faq_data()
-        self.setup_embeddings()
+        self.vector_store: Optional[VectorStore] = None
+        self.index: Optional[MappedFAQIndex] = None
+        # Only one worker process creates/builds the index; the others wait and reuse it.
+        # The builder renews its lease for as long as the build runs. A worker that waits
+        # longer than FAQ_BUILD_WAIT_S serves BM25 only and loads the vectors once the
+        # build is done (`fallback_lexical=False` raises LockTimeout instead).
+        try:
+            with get_shared_cache().lock(BUILD_LOCK_NAME, ttl=FAQ_BUILD_LEASE_TTL_S, timeout=FAQ_BUILD_WAIT_S, renew=True):
+                self.load_faq_data()
+                self.load_vector_index()
+        except LockTimeout:
+            if not fallback_lexical:
+                raise
+            print("⚠️ FAQ index is still being built by another worker; serving lexical search until it is ready")
+            self.load_faq_data(mapped=False)
+            threading.Thread(target=self._load_vectors_after_build, name="faq-vectors", daemon=True).start()
+            return
+        if not self.index and EMBEDDING_QUANTIZATION != "none":
+            self.load_vector_store()
+
+    @property
+    def vector_ready(self) -> bool:
+        return bool(self.collection or self.vector_store)
+
+    def load_vector_index(self):
+        """Open (or build) the vector side of the index. Caller holds the build lock."""
+        if not self.index:
+            self.initialize_chromadb()
+            self.setup_embeddings()
+            if FAQ_INDEX_BACKEND == "mmap":
+                self.export_mapped_index()
+
+    def _load_vectors_after_build(self):
+        """Lexical-only start: wait for the other worker's build, then attach its vectors."""
+        while True:
+            try:
+                with get_shared_cache().lock(BUILD_LOCK_NAME, ttl=FAQ_BUILD_LEASE_TTL_S, timeout=FAQ_BUILD_WAIT_S, renew=True):
+                    if FAQ_INDEX_BACKEND == "mmap" and self.load_mapped_index():
+                        self.faq_data = self.index.rows
+                        self.answer_table.rows = self.faq_data
+                        self.build_lexical_index()
+                    else:
+                        self.load_vector_index()
+                break
+            except LockTimeout:
+                continue
+            except Exception as e:
+                print(f"❌ Error loading FAQ vectors, staying on lexical search: {str(e)}")
+                return
+        if not self.index and EMBEDDING_QUANTIZATION != "none":
+            self.load_vector_store()
+        print("✅ FAQ vector index attached")
     
     def initialize_chromadb(self):
         """Initialize ChromaDB client and collection."""
@@ -48,24 +124,15 @@ class FAQRAG:
             # Create ChromaDB client with persistent storage
             self.client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
             
-            # Get or create collection
-            try:
-                self.collection = self.client.get_collection(name=COLLECTION_NAME)
-                print(f"✅ Connected to existing ChromaDB collection: {COLLECTION_NAME}")
-            except Exception:
-                # Collection doesn't exist, create it
-                self.collection = self.client.create_collection(
-                    name=COLLECTION_NAME,
-                    metadata={"description": "FAQ embeddings for Vexere chatbot"}
-                )
-                print(f"✅ Created new ChromaDB collection: {COLLECTION_NAME}")
-                
+            # Get or create this CSV version's collection (rebuilt if index settings changed)
+            self.collection = open_collection(self.client, collection_name_for(self.corpus_hash))
+            
         except Exception as e:
             print(f"❌ Error initializing ChromaDB: {str(e)}")
             raise
     
-    def load_faq_data(self):
-        """Load FAQ data from CSV file."""
+    def load_faq_data(self, mapped: bool = True):
+        """Load FAQ data from CSV file (`mapped=False`: ignore FAQ_INDEX_PATH)."""
         try:
             candidates = [
                 self.faq_csv_path,
@@ -79,17 +146,66 @@ class FAQRAG:
                     break
             if not csv_path:
                 raise FileNotFoundError(f"FAQ file not found. Tried: {candidates}")
-            with open(csv_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                self.faq_data = list(reader)
+            self.csv_path = csv_path
+            self.corpus_hash = file_sha256(csv_path)
+            if mapped and FAQ_INDEX_BACKEND == "mmap" and self.load_mapped_index():
+                # Rows are decoded from the shared mapping on access, not copied per worker
+                self.faq_data = self.index.rows
+            else:
+                with open(csv_path, 'r', encoding='utf-8') as file:
+                    reader = csv.DictReader(file)
+                    self.faq_data = list(reader)
             print(f"✅ Loaded {len(self.faq_data)} FAQ entries from {csv_path}")
+            self.build_lexical_index()
+            self.answer_table = FAQAnswerTable(self.corpus_hash[:16])
+            self.answer_table.seed(self.faq_data)
         except FileNotFoundError:
             print(f"❌ FAQ file not found: {self.faq_csv_path}")
             self.faq_data = []
+        except FAQIndexMismatch:
+            raise
         except Exception as e:
             print(f"❌ Error loading FAQ data: {str(e)}")
             self.faq_data = []
     
+    def build_lexical_index(self):
+        """Build the BM25 index (or reuse the one stored in the mapped index file)."""
+        mapped = self.index.lexical_index() if self.index else None
+        if mapped:
+            # Postings come straight from the shared mapping; only the vocab dict is per worker
+            self.lexical_index, self.lexical_self_scores = mapped
+        else:
+            self.lexical_index, self.lexical_self_scores = build_faq_lexical_index(self.faq_data)
+
+    def lexical_search(self, query: str, top_k: int = 3) -> List[Tuple[int, float]]:
+        """Return (faq row, normalized BM25 score in [0, 1]) pairs, best first."""
+        if not self.lexical_index:
+            return []
+        hits = []
+        for row, score in self.lexical_index.top_k(tokenize(query), top_k):
+            reference = self.lexical_self_scores[row] or 1.0
+            hits.append((row, min(1.0, score / reference)))
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits
+
+    def is_lexical_decisive(self, hits: List[Tuple[int, float]]) -> bool:
+        """Lexical ranking alone is trusted when the top hit is strong and clearly ahead."""
+        if not hits or hits[0][1] < LEXICAL_DECISIVE_SCORE:
+            return False
+        return len(hits) == 1 or hits[0][1] - hits[1][1] >= LEXICAL_DECISIVE_MARGIN
+
+    def _format_match(self, rank: int, row: int, similarity: float, source: str) -> Dict[str, any]:
+        item = self.faq_data[row]
+        return {
+            'index': rank,
+            'faq_index': row,
+            'similarity': similarity,
+            'source': source,
+            'question': item['question'],
+            'answer': item['answer'],
+            'combined_text': f"{item['question']}\n\n{item['answer']}",
+        }
+
     def setup_embeddings(self):
         """Setup embeddings in ChromaDB (generate if not exists)."""
         if not self.faq_data:
@@ -98,10 +214,14 @@ class FAQRAG:
         try:
             # Check if collection has data
             count = self.collection.count()
+            checkpoint = load_ingest_checkpoint(checkpoint_path_for(self.collection.name))
             
             if count == 0:
                 print("🔄 No embeddings found in ChromaDB. Generating new embeddings...")
                 self.generate_and_store_embeddings()
+            elif checkpoint and not checkpoint.get("complete"):
+                print("🔄 Found an interrupted embedding build. Resuming...")
+                self.generate_and_store_embeddings()
             else:
                 print(f"✅ Found {count} existing embeddings in ChromaDB")
                 
@@ -111,72 +231,122 @@ class FAQRAG:
             self.generate_and_store_embeddings()
     
     def generate_and_store_embeddings(self):
-        """Generate embeddings and store them in ChromaDB."""
+        """Generate embeddings and store them in ChromaDB (streaming, resumable)."""
         if not self.faq_data:
             return
         
         print("🔄 Generating and storing embeddings in ChromaDB...")
-        
-        # Prepare data for ChromaDB - combine question and answer for better retrieval
-        questions = [item['question'] for item in self.faq_data]
-        answers = [item['answer'] for item in self.faq_data]
-        
-        # Create combined text for embedding (question + answer)
-        combined_texts = []
-        for i, (question, answer) in enumerate(zip(questions, answers)):
-            # Combine question and answer for better semantic understanding
-            combined_text = f"{question}\n\n{answer}"
-            combined_texts.append(combined_text)
-        
-        ids = [f"faq_{i}" for i in range(len(self.faq_data))]
-        
         try:
-            # Generate embeddings in batches
-            batch_size = 100
-            all_embeddings = []
-            
-            for i in range(0, len(combined_texts), batch_size):
-                batch_texts = combined_texts[i:i + batch_size]
-                
-                response = oai_client.embeddings.create(
-                    model=EMBEDDING_MODEL,
-                    input=batch_texts
-                )
-                
-                batch_embeddings = [item.embedding for item in response.data]
-                all_embeddings.extend(batch_embeddings)
-            
-            # Store in ChromaDB
-            self.collection.add(
-                embeddings=all_embeddings,
-                documents=combined_texts,  # Store combined text for better retrieval
-                metadatas=[{
-                    "question": question, 
-                    "answer": answer, 
-                    "index": i,
-                    "type": "faq"
-                } for i, (question, answer) in enumerate(zip(questions, answers))],
-                ids=ids
+            # Each embedding covers question + answer for better semantic understanding
+            ingest_faq_csv(
+                self.csv_path,
+                self.collection,
+                embed_fn=lambda texts: embed_texts(oai_client, texts),
             )
-            
-            print(f"✅ Generated and stored {len(all_embeddings)} embeddings in ChromaDB")
-            print(f"   - Each embedding covers: question + answer")
-            
         except Exception as e:
             print(f"❌ Error generating and storing embeddings: {str(e)}")
             raise
     
-    def get_question_embedding(self, question: str) -> List[float]:
-        """Get embedding for a single question."""
+    def load_mapped_index(self) -> bool:
+        """Map FAQ_INDEX_PATH if it was built for this CSV and these settings (checksum verified)."""
+        problems = header_mismatches(
+            read_header(FAQ_INDEX_PATH), expected_index_meta(self.corpus_hash, EMBEDDING_QUANTIZATION)
+        )
+        index = None
+        if not problems:
+            try:
+                index = MappedFAQIndex(FAQ_INDEX_PATH)
+                if FAQ_INDEX_VERIFY and not index.verify():
+                    problems = ["checksum mismatch"]
+            except Exception as e:
+                problems = [str(e)]
+        if problems:
+            message = f"FAQ index {FAQ_INDEX_PATH} unusable for {self.csv_path}: {'; '.join(problems)}"
+            if FAQ_INDEX_ON_MISMATCH == "fail":
+                raise FAQIndexMismatch(message + " (FAQ_INDEX_ON_MISMATCH=fail; run src/scripts/build_faq_index.py)")
+            print(f"⚠️ {message}; falling back to building it from ChromaDB")
+            return False
+        self.index = index
+        self.vector_store = index.vector_store
+        print(f"✅ Mapped FAQ index {FAQ_INDEX_PATH} (version {index.version}, "
+              f"{index.header['rows']} rows, {index.header['dims']} dims, {EMBEDDING_QUANTIZATION})")
+        return True
+
+    def export_mapped_index(self, chunk_rows: int = 2048):
+        """Write the Chroma collection + FAQ text to FAQ_INDEX_PATH and serve from the mapping."""
+        def chunks():
+            for start in range(0, len(self.faq_data), chunk_rows):
+                ids = [f"faq_{i}" for i in range(start, min(start + chunk_rows, len(self.faq_data)))]
+                data = self.collection.get(ids=ids, include=['embeddings'])
+                by_id = dict(zip(data['ids'], data['embeddings']))
+                yield np.asarray([by_id[i] for i in ids], dtype=np.float32)
         try:
-            response = oai_client.embeddings.create(
-                model=EMBEDDING_MODEL,
-                input=[question]
+            write_faq_index(
+                FAQ_INDEX_PATH, self.faq_data, chunks(), EMBEDDING_QUANTIZATION,
+                meta=expected_index_meta(self.corpus_hash, EMBEDDING_QUANTIZATION),
+                arrays=lexical_index_arrays(self.lexical_index, self.lexical_self_scores),
             )
-            return response.data[0].embedding
         except Exception as e:
-            print(f"❌ Error getting question embedding: {str(e)}")
-            return []
+            print(f"❌ Error writing FAQ index, serving from ChromaDB: {str(e)}")
+            return
+        if self.load_mapped_index():
+            self.faq_data = self.index.rows
+            self.answer_table.rows = self.faq_data
+            self.build_lexical_index()
+
+    def load_vector_store(self):
+        """Load all vectors from Chroma into a quantized in-memory store used for scoring."""
+        try:
+            data = self.collection.get(include=['embeddings', 'metadatas'])
+            rows = [int(m['index']) for m in data['metadatas']]
+            if not rows:
+                return
+            embeddings = [None] * (max(rows) + 1)
+            for row, embedding in zip(rows, data['embeddings']):
+                embeddings[row] = embedding
+            if any(e is None for e in embeddings):
+                raise ValueError("collection has gaps; rebuild the index")
+            self.vector_store = VectorStore.from_embeddings(embeddings, EMBEDDING_QUANTIZATION)
+            print(f"✅ Loaded {self.vector_store.count} vectors ({EMBEDDING_QUANTIZATION}, "
+                  f"{self.vector_store.dimensions} dims, {self.vector_store.nbytes / 1024:.0f} KiB)")
+        except Exception as e:
+            print(f"❌ Error loading quantized vector store, falling back to ChromaDB: {str(e)}")
+            self.vector_store = None
+
+    def _embedding_cache_key(self, question: str) -> str:
+        return (
+            f"emb:{LLM_BACKEND}:{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS or 0}:"
+            + hashlib.sha1(question.encode("utf-8")).hexdigest()
+        )
+
+    def get_question_embeddings(self, questions: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """Embeddings for many questions: shared-cache hits, then one API call per
+        QUERY_EMBED_BATCH misses. A question whose embedding failed gets []."""
+        cache = get_shared_cache()
+        keys = [self._embedding_cache_key(q) for q in questions]
+        try:
+            cached = cache.get_many(list(set(keys)))
+        except Exception as e:
+            print(f"❌ Error reading cached embeddings: {str(e)}")
+            cached = {}
+        missing = list(dict.fromkeys(q for q, key in zip(questions, keys) if key not in cached))
+        for start in range(0, len(missing), QUERY_EMBED_BATCH):
+            chunk = missing[start:start + QUERY_EMBED_BATCH]
+            try:
+                fresh = dict(zip((self._embedding_cache_key(q) for q in chunk), embed_texts(oai_client, chunk, timeout=timeout)))
+            except Exception as e:
+                print(f"❌ Error getting question embeddings: {str(e)}")
+                continue
+            cached.update(fresh)
+            try:
+                cache.set_many(fresh, ttl=QUERY_EMBEDDING_TTL)
+            except Exception as e:
+                print(f"❌ Error caching question embeddings: {str(e)}")
+        return [cached.get(key, []) for key in keys]
+
+    def get_question_embedding(self, question: str) -> List[float]:
+        """Get embedding for a single question (cached across worker processes)."""
+        return self.get_question_embeddings([question])[0]
     
     def cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors."""
@@ -197,46 +367,89 @@ class FAQRAG:
             return 0
     
     def search_similar_questions(self, query: str, top_k: int = 3) -> List[Dict[str, any]]:
-        """Search for similar questions using ChromaDB semantic search."""
-        if not self.collection:
-            return []
+        """Hybrid search: BM25 fast path (no embedding call) or BM25-boosted vector search."""
+        return self.search_many([query], top_k=top_k)[0]
+
+    def search_many(self, queries: List[str], top_k: int = 3, use_vector: bool = True,
+                    timeout: Optional[float] = None, meta: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, any]]]:
+        """Batched `search_similar_questions`: queries that BM25 does not settle are
+        embedded in one call and scored in one vectorized / multi-query Chroma pass.
+        `use_vector=False` (no latency budget left) answers from BM25 alone.
+        `meta`, if given, receives `degraded="faq_lexical"` when a query that needed the
+        vector search got BM25 only (embedding/vector search failed, vectors not loaded)."""
+        candidates = max(top_k, FUSION_CANDIDATES)
+        lexical = [self.lexical_search(query, top_k=candidates) for query in queries]
+        undecided = [i for i, hits in enumerate(lexical) if not self.is_lexical_decisive(hits)]
+        # No vectors yet (index still being built by another worker): BM25 only, no embedding call
+        pending = undecided if use_vector and self.vector_ready else []
+        vector: Dict[int, Dict[int, float]] = {}
+        if pending:
+            embeddings = self.get_question_embeddings([queries[i] for i in pending], timeout=timeout)
+            vector = dict(zip(pending, self.vector_search_many(embeddings, top_k=candidates)))
+        if meta is not None and use_vector and any(not vector.get(i) for i in undecided):
+            meta["degraded"] = "faq_lexical"
+        return [self._rank(hits, vector.get(i), top_k) for i, hits in enumerate(lexical)]
+
+    def _rank(
+        self, lexical_hits: List[Tuple[int, float]], vector_scores: Optional[Dict[int, float]], top_k: int,
+    ) -> List[Dict[str, any]]:
+        # vector_scores is None for the lexical fast path, {} when embedding/Chroma failed
+        if not vector_scores:
+            return [
+                self._format_match(rank, row, score, "lexical")
+                for rank, (row, score) in enumerate(lexical_hits[:top_k])
+            ]
+        lexical_scores = dict(lexical_hits)
+        fused = []
+        for row in set(vector_scores) | set(lexical_scores):
+            vec = vector_scores.get(row, 0.0)
+            lex = lexical_scores.get(row, 0.0)
+            # Lexical evidence closes part of the remaining gap to 1; it never lowers a vector score
+            fused.append((row, vec + LEXICAL_BOOST * lex * (1 - max(vec, 0.0))))
+        fused.sort(key=lambda item: item[1], reverse=True)
+        return [
+            self._format_match(rank, row, score, "hybrid")
+            for rank, (row, score) in enumerate(fused[:top_k])
+        ]
+
+    def vector_search(self, query: str, top_k: int = 3) -> Dict[int, float]:
+        """Semantic search (quantized store or ChromaDB). Returns {faq row: similarity}."""
+        return self.vector_search_many([self.get_question_embedding(query)], top_k=top_k)[0]
+
+    def vector_search_many(self, embeddings: List[List[float]], top_k: int = 3) -> List[Dict[int, float]]:
+        """One {faq row: similarity} dict per query embedding ({} for an empty embedding)."""
+        results: List[Dict[int, float]] = [{} for _ in embeddings]
+        valid = [i for i, embedding in enumerate(embeddings) if embedding]
+        if not valid or (not self.collection and not self.vector_store):
+            return results
         
         try:
-            # Get query embedding
-            query_embedding = self.get_question_embedding(query)
-            if not query_embedding:
-                return []
+            if self.vector_store:
+                hits = self.vector_store.search(np.asarray([embeddings[i] for i in valid]), top_k)
+                for i, query_hits in zip(valid, hits):
+                    results[i] = {row: score for row, score in query_hits if row < len(self.faq_data)}
+                return results
             
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                include=['documents', 'metadatas', 'distances']
+            # One multi-query call to ChromaDB
+            response = self.collection.query(
+                query_embeddings=[embeddings[i] for i in valid],
+                n_results=min(top_k, max(1, len(self.faq_data))),
+                include=['metadatas', 'distances']
             )
             
-            # Format results
-            similarities = []
-            if results['documents'] and results['documents'][0]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results['documents'][0],
-                    results['metadatas'][0],
-                    results['distances'][0]
-                )):
-                    # Convert distance to similarity (ChromaDB uses cosine distance)
-                    similarity = 1 - distance
-                    similarities.append({
-                        'index': i,
-                        'similarity': similarity,
-                        'question': metadata['question'],  # Get original question from metadata
-                        'answer': metadata['answer'],      # Get original answer from metadata
-                        'combined_text': doc               # Full combined text that was embedded
-                    })
+            for i, metadatas, distances in zip(valid, response['metadatas'] or [], response['distances'] or []):
+                for metadata, distance in zip(metadatas, distances):
+                    row = int(metadata['index'])
+                    if row >= len(self.faq_data):
+                        continue
+                    # Thresholds in get_contextual_response are cosine similarities
+                    results[i][row] = distance_to_similarity(distance, FAQ_DISTANCE_METRIC)
             
-            return similarities
+            return results
             
         except Exception as e:
             print(f"❌ Error searching similar questions: {str(e)}")
-            return []
+            return [{} for _ in embeddings]
     
     def get_faq_response(self, query: str, similarity_threshold: float = 0.7) -> Optional[Dict[str, str]]:
         """Get FAQ response for a query."""
@@ -257,12 +470,13 @@ class FAQRAG:
         
         return None
     
-    def get_contextual_response(self, query: str, top_k: int = 3) -> str:
-        """Get contextual response using multiple similar questions."""
-        similar_questions = self.search_similar_questions(query, top_k=top_k)
+    def get_contextual_response(self, query: str, top_k: int = 3, use_vector: bool = True,
+                                timeout: Optional[float] = None, meta: Optional[Dict[str, Any]] = None) -> str:
+        """Get contextual response using multiple similar questions (`meta`: see search_many)."""
+        similar_questions = self.search_many([query], top_k=top_k, use_vector=use_vector, timeout=timeout, meta=meta)[0]
         
         if not similar_questions:
-            return "Xin lỗi, tôi không tìm thấy thông tin liên quan đến câu hỏi của bạn trong cơ sở dữ liệu FAQ."
+            return NOT_FOUND_RESPONSE
         
         # If we have a very good match, return it directly
         if similar_questions[0]['similarity'] >= 0.7:
@@ -293,24 +507,184 @@ class FAQRAG:
         
         return context
 
-# Global FAQ RAG instance
+# Global FAQ RAG instance. Hot reload swaps this reference; readers take it once per
+# request via get_faq_rag() so a query never mixes two index versions.
 faq_rag = FAQRAG()
+FAQ_RELOAD_GENERATION_KEY = "faq_reload:generation"
+_reload_lock = threading.Lock()
+_last_reload: Dict[str, any] = {}
+_watcher: Optional[threading.Thread] = None
+
+def get_faq_rag() -> FAQRAG:
+    """Return the FAQ index currently being served."""
+    return faq_rag
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def reload_faq(csv_path: str = None, force: bool = False) -> Dict[str, any]:
+    """Build a new FAQRAG from `csv_path` and swap it in. The current index keeps serving
+    until the new one is complete; a failed build leaves it in place."""
+    global faq_rag, _last_reload
+    if not _reload_lock.acquire(blocking=False):
+        return {"status": "in_progress"}
+    try:
+        current = faq_rag
+        csv_path = csv_path or current.faq_csv_path
+        if not force and os.path.exists(csv_path) and file_sha256(csv_path) == current.corpus_hash:
+            return {"status": "unchanged", "version": current.corpus_hash[:12]}
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        try:
+            new_rag = FAQRAG(csv_path, fallback_lexical=False)
+        except Exception as e:
+            _last_reload = {"status": "failed", "error": str(e), "at": time.time()}
+            print(f"❌ FAQ reload failed, keeping version {current.corpus_hash[:12]}: {str(e)}")
+            return _last_reload
+        if not new_rag.faq_data:
+            _last_reload = {"status": "failed", "error": f"no FAQ rows loaded from {csv_path}", "at": time.time()}
+            return _last_reload
+        faq_rag = new_rag  # atomic reference swap
+        current.answer_table.flush()
+        seconds = time.perf_counter() - started
+        # Keep the replaced version for workers that have not switched yet
+        if new_rag.collection:
+            prune_collections(new_rag.client, keep=[new_rag.collection.name, current.collection.name if current.collection else ""])
+        try:
+            get_shared_cache().set(FAQ_RELOAD_GENERATION_KEY, {"csv_path": csv_path, "corpus_hash": new_rag.corpus_hash})
+        except Exception as e:
+            print(f"❌ Error publishing FAQ reload: {str(e)}")
+        _last_reload = {
+            "status": "reloaded",
+            "previous_version": current.corpus_hash[:12],
+            "version": new_rag.corpus_hash[:12],
+            "rows": len(new_rag.faq_data),
+            "seconds": round(seconds, 3),
+            "rss_before_mb": round(rss_before, 1),
+            "rss_after_mb": round(_rss_mb(), 1),
+            "at": time.time(),
+        }
+        print(f"✅ FAQ reloaded: {_last_reload}")
+        return _last_reload
+    finally:
+        _reload_lock.release()
+
+def start_faq_reload(csv_path: str = None, force: bool = False) -> Dict[str, any]:
+    """Run reload_faq in a background thread; returns immediately."""
+    if _reload_lock.locked():
+        return {"status": "in_progress"}
+    threading.Thread(target=reload_faq, args=(csv_path, force), name="faq-reload", daemon=True).start()
+    return {"status": "started"}
+
+def faq_status() -> Dict[str, any]:
+    rag = faq_rag
+    return {
+        "version": rag.corpus_hash[:12],
+        "rows": len(rag.faq_data),
+        "csv_path": rag.csv_path,
+        "collection": rag.collection.name if rag.collection else None,
+        "index_backend": FAQ_INDEX_BACKEND,
+        "index_version": rag.index.version if rag.index else None,
+        "reloading": _reload_lock.locked(),
+        "last_reload": _last_reload,
+        "rss_mb": round(_rss_mb(), 1),
+    }
+
+def _csv_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+def _watch_loop(interval: float) -> None:
+    seen = _csv_signature(faq_rag.csv_path)
+    handled = (get_shared_cache().get(FAQ_RELOAD_GENERATION_KEY) or {}).get("corpus_hash")
+    while True:
+        time.sleep(interval)
+        try:
+            # Another worker (e.g. the one that served the admin endpoint) published a new version
+            published = get_shared_cache().get(FAQ_RELOAD_GENERATION_KEY) or {}
+            if published.get("corpus_hash") not in (None, handled, faq_rag.corpus_hash):
+                handled = published["corpus_hash"]
+                reload_faq(published.get("csv_path"))
+                seen = _csv_signature(faq_rag.csv_path)
+                continue
+            signature = _csv_signature(faq_rag.csv_path)
+            if signature and signature != seen:
+                seen = signature
+                reload_faq(faq_rag.csv_path)
+            elif faq_rag.index and faq_rag.index.is_stale():
+                # A newer index file was published (another worker or an offline build): remap
+                reload_faq(faq_rag.csv_path, force=True)
+        except Exception as e:
+            print(f"❌ FAQ watcher error: {str(e)}")
+
+def start_faq_watcher(interval: float = FAQ_WATCH_INTERVAL) -> bool:
+    """Poll the CSV and the shared reload generation in a daemon thread (once per process)."""
+    global _watcher
+    if interval <= 0 or (_watcher and _watcher.is_alive()):
+        return False
+    _watcher = threading.Thread(target=_watch_loop, args=(interval,), name="faq-watcher", daemon=True)
+    _watcher.start()
+    return True
 
 def get_faq_response(query: str) -> Optional[str]:
     """Get FAQ response for a query."""
-    response = faq_rag.get_faq_response(query)
+    response = get_faq_rag().get_faq_response(query)
     if response:
         return response['answer']
     return None
 
-def get_contextual_faq_response(query: str) -> str:
-    """Get contextual FAQ response for a query."""
-    return faq_rag.get_contextual_response(query)
+def get_contextual_faq_response(query: str, use_vector: bool = True, timeout: Optional[float] = None,
+                                meta: Optional[Dict[str, Any]] = None) -> str:
+    """Get contextual FAQ response for a query (exact-match answer table first).
+    `use_vector=False` / `timeout` come from the turn's latency budget (budget.py).
+    `meta`, if given, receives `degraded="faq_lexical"` when the answer came from BM25 only."""
+    meta = meta if meta is not None else {}
+    if not use_vector:
+        meta["degraded"] = "faq_lexical"
+    rag = get_faq_rag()
+    answer = rag.answer_table.lookup(query)
+    if answer is not None:
+        meta.pop("degraded", None)
+        return answer
+    # Identical concurrent questions (same exact text, same index) share one embedding
+    # call + vector query; a caller whose budget ends first answers lexically
+    key = (id(rag), normalize_exact(query), use_vector)
+
+    def search() -> Tuple[str, Optional[str]]:
+        # The degradation travels with the shared result so every caller reports it
+        flight_meta: Dict[str, Any] = {}
+        response = rag.get_contextual_response(query, use_vector=use_vector, timeout=timeout, meta=flight_meta)
+        return response, flight_meta.get("degraded")
+
+    try:
+        response, degraded = get_single_flight("faq").do(key, search, wait=timeout)
+    except SingleFlightTimeout as e:
+        print(f"⚠️ {str(e)}, answering from the lexical index")
+        meta["degraded"] = "faq_lexical"
+        return rag.get_contextual_response(query, use_vector=False)
+    if degraded:
+        meta["degraded"] = degraded
+    # A lexical-only (degraded) answer is not remembered as the answer for this query
+    if response != NOT_FOUND_RESPONSE and not meta.get("degraded"):
+        rag.answer_table.observe(query, response)
+    return response
 
 def reset_chromadb():
     """Reset ChromaDB collection (useful for testing)."""
     try:
-        faq_rag.client.delete_collection(COLLECTION_NAME)
+        rag = get_faq_rag()
+        rag.client.delete_collection(rag.collection.name)
         print("✅ ChromaDB collection reset successfully")
     except Exception as e:
         print(f"❌ Error resetting ChromaDB: {str(e)}")
@@ -318,9 +692,10 @@ def reset_chromadb():
 def get_collection_info():
     """Get information about the ChromaDB collection."""
     try:
-        count = faq_rag.collection.count()
+        rag = get_faq_rag()
+        count = rag.collection.count()
         print(f"📊 ChromaDB Collection Info:")
-        print(f"   - Collection: {COLLECTION_NAME}")
+        print(f"   - Collection: {rag.collection.name}")
         print(f"   - Total documents: {count}")
         print(f"   - Database path: {CHROMA_DB_PATH}")
     except Exception as e:
@@ -3,6 +3,24 @@ Routing logic for LangGraph workflow.
 """
 
 from .types import State
+from .extraction import parse_awaited_reply
+
+def route_from_start(state: State) -> str:
+    """
+    Follow-up fast path: if the previous turn asked for a field (e.g. the trip after
+    listing candidates) and this turn is just a valid answer, resume directly;
+    anything else goes through media ingest and full classification.
+    """
+    awaiting = state.get("awaiting")
+    if awaiting and not state.get("attachments"):
+        text = state["messages"][-1].content if state.get("messages") else ""
+        if parse_awaited_reply(text, awaiting, state.get("awaiting_options")):
+            return "resume"
+    return "media_ingest"
+
+def route_from_resume(state: State) -> str:
+    """Node that consumes the field the graph was waiting for."""
+    return "apply"
 
 def route_from_classify(state: State) -> str:
     """
@@ -0,0 +1,40 @@
+"""
+Vietnamese text normalization helpers shared by lexical retrieval and local extractors.
+"""
+
+import re
+import unicodedata
+from typing import List
+
+_NON_WORD_RE = re.compile(r"[^\w]+", flags=re.UNICODE)
+
+def fold_diacritics(text: str) -> str:
+    """Remove Vietnamese diacritics: 'Hoàn tiền Đà Lạt' -> 'Hoan tien Da Lat'."""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+
+def normalize_text(text: str) -> str:
+    """Lowercase, fold diacritics, replace punctuation by spaces and collapse whitespace."""
+    folded = fold_diacritics(unicodedata.normalize("NFC", text or "").lower())
+    return " ".join(_NON_WORD_RE.sub(" ", folded).split())
+
+def normalize_exact(text: str) -> str:
+    """Like `normalize_text` but keeps diacritics: tone marks tell Vietnamese words apart
+    ('bán vé' sell ≠ 'bạn về' …)."""
+    lowered = unicodedata.normalize("NFC", text or "").lower()
+    return " ".join(_NON_WORD_RE.sub(" ", lowered).split())
+
+def has_diacritics(text: str) -> bool:
+    return fold_diacritics(text) != text
+
+def syllables(text: str) -> List[str]:
+    """Split normalized text into syllables (Vietnamese words are space-separated syllables)."""
+    return normalize_text(text).split()
+
+def tokenize(text: str, bigrams: bool = True) -> List[str]:
+    """Syllables plus adjacent-syllable bigrams ('hoan tien' -> ['hoan', 'tien', 'hoan_tien'])."""
+    sylls = syllables(text)
+    if not bigrams:
+        return sylls
+    return sylls + [f"{a}_{b}" for a, b in zip(sylls, sylls[1:])]
@@ -7,6 +7,12 @@ from langchain_core.messages import AnyMessage
 from langgraph.graph.message import add_messages
 from typing_extensions import TypedDict
 
+def merge_degradations(left: Optional[List[str]], right: Optional[List[str]]) -> List[str]:
+    """Reducer for State.degradations: None resets (start of a turn), otherwise append new entries."""
+    if right is None:
+        return []
+    return (left or []) + [d for d in right if d not in (left or [])]
+
 class State(TypedDict, total=False):
     """State definition for LangGraph workflow."""
     messages: Annotated[List[AnyMessage], add_messages]
@@ -20,8 +26,13 @@ class State(TypedDict, total=False):
     description: Optional[str]     # Mô tả khiếu nại
     # Media ingestion (image/audio) support
     media_type: Optional[str]          # image | audio | none
-    attachments: Optional[list]        # danh sách URL/base64 của media
+    attachments: Optional[list]        # handle media://<sha256> hoặc URL (không chứa bytes/base64)
     media_text: Optional[str]          # text trích xuất từ ảnh/âm thanh
     structured_entities: Optional[dict]  # dữ liệu cấu trúc từ media (booking_id, date, route, ...)
+    # Trường mà lượt trước đang hỏi (vd "trip_id" sau khi liệt kê chuyến) và các giá trị hợp lệ
+    awaiting: Optional[str]
+    awaiting_options: Optional[list]
+    # Bước đã bị giảm cấp vì hết budget của lượt chat (vd "extract_heuristic", "faq_lexical")
+    degradations: Annotated[List[str], merge_degradations]
     result: Optional[dict]
     error: Optional[str]
@@ -0,0 +1,91 @@
+"""
+Compact in-memory vector store for the FAQ index.
+
+Vectors are L2-normalized, so cosine similarity is a dot product. Storage can be
+quantized to shrink the index (memory, and bytes scanned per query):
+- "none":    float32
+- "float16": float16 (half the bytes, ~lossless for ranking)
+- "int8":    int8 codes + one float32 scale per vector (symmetric, per-row)
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+QUANTIZATIONS = ("none", "float16", "int8")
+SCORE_BLOCK_ROWS = 8192
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def truncate_dimensions(vectors: np.ndarray, dimensions: Optional[int]) -> np.ndarray:
+    """Shorten text-embedding-3 vectors the same way the API's `dimensions` parameter does."""
+    if not dimensions or dimensions >= vectors.shape[-1]:
+        return normalize_rows(vectors)
+    return normalize_rows(np.asarray(vectors)[..., :dimensions])
+
+class VectorStore:
+    """Row-aligned matrix of FAQ embeddings with optional quantization."""
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray], quantization: str):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.codes = codes
+        self.scales = scales
+        self.quantization = quantization
+
+    @classmethod
+    def from_embeddings(cls, embeddings: List[List[float]], quantization: str = "none") -> "VectorStore":
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        if quantization == "float16":
+            return cls(vectors.astype(np.float16), None, quantization)
+        if quantization == "int8":
+            max_abs = np.abs(vectors).max(axis=1, keepdims=True)
+            max_abs[max_abs == 0] = 1.0
+            scales = (max_abs / 127.0).astype(np.float32)
+            codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+            return cls(codes, scales.ravel(), quantization)
+        return cls(vectors, None, quantization)
+
+    @property
+    def count(self) -> int:
+        return int(self.codes.shape[0])
+
+    @property
+    def dimensions(self) -> int:
+        return int(self.codes.shape[1]) if self.codes.ndim == 2 else 0
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of each query (m, d) against every stored row → (m, n)."""
+        queries = normalize_rows(np.atleast_2d(queries))
+        if self.quantization == "none":
+            return queries @ self.codes.T
+        # numpy has no BLAS path for int8/float16: dequantize block by block so the
+        # float32 working set stays small whatever the corpus size
+        out = np.empty((queries.shape[0], self.count), dtype=np.float32)
+        for start in range(0, self.count, SCORE_BLOCK_ROWS):
+            block = self.codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            out[:, start:start + block.shape[0]] = queries @ block.T
+        if self.quantization == "int8":
+            out *= self.scales[None, :]
+        return out
+
+    def search(self, queries: np.ndarray, top_k: int) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, similarity) per query, best first."""
+        scores = self.scores(queries)
+        k = min(top_k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in range(scores.shape[0])]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for qi, rows in enumerate(top):
+            ordered = rows[np.argsort(-scores[qi, rows])]
+            results.append([(int(r), float(scores[qi, r])) for r in ordered])
+        return results
@@ -0,0 +1,112 @@
+"""
+Recall@k and query latency of the Chroma HNSW index per distance metric / HNSW setting.
+
+The corpus is synthetic but shaped like the FAQ index: real FAQ embeddings are used
+as cluster centres, and every synthetic row is a noisy, re-normalized copy of one of
+them (so neighbours are close, like paraphrased KB entries). Queries are noisy copies
+of random corpus rows. Ground truth is the exact cosine top-k (numpy brute force).
+
+Each setting builds its own collection in a temporary directory.
+
+Usage:
+  python src/scripts/bench_ann.py --rows 20000
+  python src/scripts/bench_ann.py --spaces cosine,l2 --m 16,32 --construction-ef 100,200 --search-ef 10,50,100
+"""
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+import itertools
+from pathlib import Path
+
+import numpy as np
+import chromadb
+
+# Ensure project root is on sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.libs.llm_client import create_openai_client
+from src.orchestrator.faq_config import DEFAULT_FAQ_PATH, hnsw_metadata, distance_to_similarity
+from src.orchestrator.faq_ingest import embed_texts, iter_faq_rows, build_record
+from src.orchestrator.vector_store import normalize_rows
+
+ADD_BATCH = 5000
+
+
+def ints(value: str) -> list:
+    return [int(v) for v in value.split(",")]
+
+
+def make_dataset(rows: int, queries: int, noise: float, seed: int) -> tuple:
+    client = create_openai_client()
+    texts = [build_record(i, item)["text"] for i, item in iter_faq_rows(DEFAULT_FAQ_PATH)]
+    centres = np.asarray(embed_texts(client, texts), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    owner = rng.integers(0, len(centres), size=rows)
+    scale = noise / np.sqrt(centres.shape[1])
+    corpus = normalize_rows(centres[owner] + rng.normal(0, scale, (rows, centres.shape[1])).astype(np.float32))
+    picks = rng.integers(0, rows, size=queries)
+    query = normalize_rows(corpus[picks] + rng.normal(0, scale, (queries, centres.shape[1])).astype(np.float32))
+    return corpus, query
+
+
+def run_setting(client, corpus, query, truth, k, space, m, construction_ef, search_ef) -> dict:
+    name = f"bench_{uuid.uuid4().hex[:8]}"
+    collection = client.create_collection(name=name, metadata=hnsw_metadata(space, m, construction_ef, search_ef))
+    t0 = time.perf_counter()
+    for start in range(0, len(corpus), ADD_BATCH):
+        block = corpus[start:start + ADD_BATCH]
+        collection.add(ids=[str(i) for i in range(start, start + len(block))], embeddings=block.tolist())
+    build_s = time.perf_counter() - t0
+
+    latencies, hits = [], 0
+    for q, expected in zip(query, truth):
+        t0 = time.perf_counter()
+        result = collection.query(query_embeddings=[q.tolist()], n_results=k, include=["distances"])
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits += len({int(i) for i in result["ids"][0]} & expected)
+    top_similarity = distance_to_similarity(result["distances"][0][0], space)
+    client.delete_collection(name)
+    return {
+        "recall": hits / (k * len(query)),
+        "p50": float(np.percentile(latencies, 50)),
+        "p99": float(np.percentile(latencies, 99)),
+        "build_s": build_s,
+        "top_similarity": top_similarity,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.6, help="Noise norm relative to the unit-length centres")
+    parser.add_argument("--spaces", default="cosine,l2")
+    parser.add_argument("--m", default="16,32")
+    parser.add_argument("--construction-ef", default="100")
+    parser.add_argument("--search-ef", default="10,50,100")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus, query = make_dataset(args.rows, args.queries, args.noise, args.seed)
+    exact = query @ corpus.T
+    truth = [set(np.argpartition(-row, args.k - 1)[:args.k].tolist()) for row in exact]
+
+    print(f"rows={len(corpus)} dims={corpus.shape[1]} queries={len(query)} k={args.k}\n")
+    print(f"{'space':>6} {'M':>4} {'c_ef':>5} {'s_ef':>5} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'build s':>8} {'top sim':>8}")
+    with tempfile.TemporaryDirectory() as path:
+        client = chromadb.PersistentClient(path=path)
+        grid = itertools.product(args.spaces.split(","), ints(args.m), ints(args.construction_ef), ints(args.search_ef))
+        for space, m, construction_ef, search_ef in grid:
+            r = run_setting(client, corpus, query, truth, args.k, space, m, construction_ef, search_ef)
+            print(f"{space:>6} {m:>4} {construction_ef:>5} {search_ef:>5} {r['recall']:>9.1%} "
+                  f"{r['p50']:>8.2f} {r['p99']:>8.2f} {r['build_s']:>8.1f} {r['top_similarity']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Recall vs latency vs memory for reduced-dimension / quantized FAQ embeddings.
+
+Embeds the FAQ corpus and the labelled query set once at full size, then derives
+every configuration locally (text-embedding-3 `dimensions` = truncate + renormalize)
+and compares it with the full-precision 1536-dim float32 index:
+- recall@1 / recall@3 against the labels in src/data/faq_queries.jsonl
+- agree@3: overlap of the top-3 with the full-precision top-3
+- latency: mean time to score one query against a corpus tiled to --scale-rows rows
+- memory: bytes of the stored vectors for the real corpus and for --scale-rows rows
+
+Usage:
+  python src/scripts/bench_embeddings.py
+  python src/scripts/bench_embeddings.py --dims 1536,1024,512,256 --scale-rows 100000
+"""
+import sys
+import csv
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root is on sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.libs.llm_client import create_openai_client
+from src.orchestrator.faq_config import DEFAULT_FAQ_PATH
+from src.orchestrator.faq_ingest import embed_texts
+from src.orchestrator.vector_store import VectorStore, QUANTIZATIONS, truncate_dimensions
+
+DEFAULT_QUERIES_PATH = (PROJECT_ROOT / "src" / "data" / "faq_queries.jsonl").as_posix()
+
+
+def load_labelled_queries(path: str, questions: list) -> tuple:
+    """Return (queries, expected row indices); labels reference the CSV question text."""
+    row_of = {q: i for i, q in enumerate(questions)}
+    queries, labels = [], []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item["question"] not in row_of:
+                print(f"⚠️ Skipping query with unknown label: {item['question']}")
+                continue
+            queries.append(item["query"])
+            labels.append(row_of[item["question"]])
+    return queries, labels
+
+
+def embed_all(client, texts: list, batch_size: int = 100) -> np.ndarray:
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(embed_texts(client, texts[i:i + batch_size], dimensions=None))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=DEFAULT_FAQ_PATH)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH)
+    parser.add_argument("--dims", default="1536,1024,512,256")
+    parser.add_argument("--scale-rows", type=int, default=50_000, help="Corpus size used for latency/memory")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.csv, "r", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    questions = [r["question"] for r in rows]
+    queries, labels = load_labelled_queries(args.queries, questions)
+    labels = np.asarray(labels)
+
+    client = create_openai_client()
+    corpus_full = embed_all(client, [f"{r['question']}\n\n{r['answer']}" for r in rows])
+    query_full = embed_all(client, queries)
+
+    reference = VectorStore.from_embeddings(corpus_full, "none")
+    reference_top3 = [set(r for r, _ in hits) for hits in reference.search(query_full, 3)]
+
+    print(f"corpus={len(rows)} rows, queries={len(queries)}, latency corpus={args.scale_rows} rows\n")
+    print(f"{'dims':>5} {'quant':>8} {'recall@1':>8} {'recall@3':>8} {'agree@3':>8} "
+          f"{'µs/query':>9} {'KiB (faq)':>10} {'MiB (scaled)':>12}")
+    for dims in (int(d) for d in args.dims.split(",")):
+        corpus = truncate_dimensions(corpus_full, dims)
+        query = truncate_dimensions(query_full, dims)
+        tiled = np.resize(corpus, (args.scale_rows, corpus.shape[1]))
+        for quantization in QUANTIZATIONS:
+            store = VectorStore.from_embeddings(corpus, quantization)
+            hits = store.search(query, 3)
+            top1 = np.asarray([h[0][0] for h in hits])
+            recall1 = float(np.mean(top1 == labels))
+            recall3 = float(np.mean([label in {r for r, _ in h} for h, label in zip(hits, labels)]))
+            agree3 = float(np.mean([len({r for r, _ in h} & ref) / 3 for h, ref in zip(hits, reference_top3)]))
+
+            scaled = VectorStore.from_embeddings(tiled, quantization)
+            single = query[:1]
+            scaled.search(single, 3)  # warm up
+            t0 = time.perf_counter()
+            for _ in range(args.repeats):
+                scaled.search(single, 3)
+            latency_us = (time.perf_counter() - t0) / args.repeats * 1e6
+
+            print(f"{dims:>5} {quantization:>8} {recall1:>8.1%} {recall3:>8.1%} {agree3:>8.1%} "
+                  f"{latency_us:>9.0f} {store.nbytes / 1024:>10.1f} {scaled.nbytes / 2**20:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Per-worker memory of the FAQ index: chroma backend vs shared mmap backend.
+
+Generates a synthetic FAQ CSV of --rows rows (FAQ rows with numbered variants),
+builds the index once, then starts --workers processes that each load the FAQ RAG
+the way a uvicorn worker does and report RSS and PSS (PSS splits shared pages
+between the processes mapping them, so it is the fair per-worker cost).
+
+Runs on the stub LLM backend (no API key needed) in a temporary directory.
+
+Usage:
+  python src/scripts/bench_faq_memory.py --rows 50000 --workers 4
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.orchestrator.faq_config import DEFAULT_FAQ_PATH
+
+WORKER_CODE = """
+import json, sys, time
+from src.orchestrator.rag_faq import get_faq_rag
+rag = get_faq_rag()
+rag.search_many(["hủy vé như thế nào", "xe có wifi không"], top_k=3)
+def memory():
+    out = {}
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss"):
+                out[key.lower()] = int(value.split()[0]) / 1024
+    return out
+print("READY", flush=True)
+sys.stdin.readline()  # measure once every worker has loaded
+print(json.dumps(memory()), flush=True)
+"""
+
+
+def make_csv(path: str, rows: int) -> None:
+    with open(DEFAULT_FAQ_PATH, "r", encoding="utf-8") as file:
+        base = list(csv.DictReader(file))
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=["question", "answer"])
+        writer.writeheader()
+        for i in range(rows):
+            item = base[i % len(base)]
+            writer.writerow({"question": f"{item['question']} (#{i})", "answer": f"{item['answer']} [mã {i}]"})
+
+
+def run_workers(env: dict, workers: int) -> list:
+    procs = [
+        subprocess.Popen([sys.executable, "-c", WORKER_CODE], cwd=PROJECT_ROOT, env=env, text=True,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        while proc.stdout.readline().strip() != "READY":
+            if proc.poll() is not None:
+                raise RuntimeError("worker exited before loading the FAQ index")
+    results = []
+    for proc in procs:
+        proc.stdin.write("\n")
+        proc.stdin.flush()
+        for line in proc.stdout:
+            if line.startswith("{"):
+                results.append(json.loads(line))
+                break
+        proc.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--quantization", default="none")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "faq.csv")
+        make_csv(csv_path, args.rows)
+        for backend in ("chroma", "mmap"):
+            env = {
+                **os.environ,
+                "LLM_BACKEND": "stub",
+                "LLM_STUB_LATENCY_MS": "0",
+                "FAQ_CSV_PATH": csv_path,
+                "FAQ_INDEX_BACKEND": backend,
+                "FAQ_INDEX_PATH": os.path.join(tmp, "faq_index.bin"),
+                "EMBEDDING_QUANTIZATION": args.quantization,
+                "CHROMA_DB_PATH": os.path.join(tmp, "chroma_db"),
+                "SHARED_CACHE_PATH": os.path.join(tmp, "shared_cache.db"),
+                "FAQ_WATCH_INTERVAL": "0",
+            }
+            started = time.perf_counter()
+            run_workers(env, 1)  # build (and export) once
+            build_s = time.perf_counter() - started
+            results = run_workers(env, args.workers)
+            rss = sum(r["rss"] for r in results) / len(results)
+            pss = sum(r["pss"] for r in results) / len(results)
+            print(f"{backend:>6}: rows={args.rows} workers={args.workers} build={build_s:.1f}s "
+                  f"RSS/worker={rss:.0f} MiB  PSS/worker={pss:.0f} MiB  total PSS={pss * len(results):.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
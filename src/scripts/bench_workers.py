@@ -0,0 +1,141 @@
+"""
+Benchmark chat_api throughput khi scale từ 1 lên N worker process.
+
+Mỗi cấu hình khởi động `uvicorn src.app.chat_api:app --workers N` với:
+- LLM_BACKEND=stub (không gọi OpenAI, có thể giả lập độ trễ bằng --latency-ms)
+- CHECKPOINT_BACKEND=sqlite + shared cache trong thư mục tạm
+
+Mỗi phiên là một hội thoại 2 lượt ("Đổi giờ vé VX123456" → "sang ngày 6/9").
+Lượt 2 chỉ trả về danh sách chuyến nếu worker xử lý nó thấy được state của lượt 1,
+nên cột `multi-turn ok` kiểm chứng việc chia sẻ state giữa các worker.
+
+Usage:
+  python src/data/seed.py
+  python src/scripts/bench_workers.py --workers 1,2,4 --sessions 200 --concurrency 32
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Ensure project root is on sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+TURNS = ["Đổi giờ vé VX123456", "sang ngày 6/9"]
+EXPECTED_MARKER = "Các lựa chọn khả dụng"
+
+
+def start_server(workers: int, port: int, workdir: str, latency_ms: float) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": str(PROJECT_ROOT),
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_LATENCY_MS": str(latency_ms),
+        "CHECKPOINT_BACKEND": "sqlite",
+        "CHECKPOINT_DB_PATH": os.path.join(workdir, "checkpoints.db"),
+        "SHARED_CACHE_PATH": os.path.join(workdir, "shared_cache.db"),
+        "CHROMA_DB_PATH": os.path.join(workdir, "chroma_db"),
+        # "sang ngày 6/9" phải rơi vào ngày có chuyến trong mock.db (dữ liệu mẫu năm 2025)
+        "DATE_PARSER_TODAY": os.environ.get("DATE_PARSER_TODAY", "2025-09-05"),
+        # Mọi phiên đến từ cùng một IP: chỉ đo throughput, không rate limit theo IP
+        "CHAT_IP_RATE": os.environ.get("CHAT_IP_RATE", "0"),
+    })
+    cmd = [
+        sys.executable, "-m", "uvicorn", "src.app.chat_api:app",
+        "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env)
+
+
+def wait_healthy(base_url: str, workers: int, timeout: float = 180.0) -> None:
+    deadline = time.monotonic() + timeout
+    pids = set()
+    while time.monotonic() < deadline:
+        try:
+            r = requests.get(f"{base_url}/ready", timeout=2)
+            if r.ok:
+                pids.add(r.json().get("pid"))
+                if len(pids) >= workers:
+                    return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    if not pids:
+        raise RuntimeError("chat_api did not become ready in time")
+
+
+def run_session(base_url: str, thread_id: str) -> dict:
+    latencies, pids, reply = [], set(), ""
+    with requests.Session() as http:
+        for text in TURNS:
+            t0 = time.perf_counter()
+            r = http.post(f"{base_url}/chat", json={"message": text, "thread_id": thread_id}, timeout=60)
+            latencies.append(time.perf_counter() - t0)
+            r.raise_for_status()
+            reply = r.json().get("reply", "")
+    return {"latencies": latencies, "ok": EXPECTED_MARKER in reply}
+
+
+def bench(workers: int, sessions: int, concurrency: int, port: int, latency_ms: float) -> dict:
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="bench_workers_") as workdir:
+        proc = start_server(workers, port, workdir, latency_ms)
+        try:
+            wait_healthy(base_url, workers)
+            # Warm every worker once so import/index cost is not measured
+            for i in range(workers * 2):
+                run_session(base_url, f"warm-{workers}-{i}")
+
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(
+                    lambda i: run_session(base_url, f"bench-{workers}-{i}"), range(sessions)
+                ))
+            elapsed = time.perf_counter() - t0
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    turn_lat = sorted(l for r in results for l in r["latencies"])
+    return {
+        "workers": workers,
+        "sessions_per_s": sessions / elapsed,
+        "turns_per_s": len(turn_lat) / elapsed,
+        "p50_ms": statistics.median(turn_lat) * 1000,
+        "p99_ms": turn_lat[min(len(turn_lat) - 1, int(len(turn_lat) * 0.99))] * 1000,
+        "multi_turn_ok": sum(r["ok"] for r in results) / len(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated LLM latency per call")
+    args = parser.parse_args()
+
+    if not (PROJECT_ROOT / "src" / "data" / "mock.db").exists():
+        sys.exit("Missing src/data/mock.db – run `python src/data/seed.py` first.")
+
+    rows = [bench(int(n), args.sessions, args.concurrency, args.port, args.latency_ms)
+            for n in args.workers.split(",")]
+    base = rows[0]["turns_per_s"]
+    print(f"\n{'workers':>7} {'sessions/s':>10} {'turns/s':>8} {'speedup':>7} {'p50 ms':>8} {'p99 ms':>8} {'multi-turn ok':>13}")
+    for r in rows:
+        print(f"{r['workers']:>7} {r['sessions_per_s']:>10.1f} {r['turns_per_s']:>8.1f} "
+              f"{r['turns_per_s'] / base:>6.2f}x {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['multi_turn_ok']:>12.0%}")
+
+
+if __name__ == "__main__":
+    main()
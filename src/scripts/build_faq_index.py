@@ -0,0 +1,87 @@
+"""
+Build the FAQ index file offline (e.g. during `docker build`).
+
+Embeds the CSV (concurrent batches with retries), builds the BM25 index and writes
+one versioned, checksummed file: embeddings + FAQ text + lexical index, tagged with
+the embedding model/dimensions, quantization and the CSV's SHA-256. At startup
+rag_faq maps it in milliseconds (FAQ_INDEX_BACKEND=mmap) instead of calling the
+embeddings API; with FAQ_INDEX_ON_MISMATCH=fail a file that does not match the CSV
+stops the service instead of triggering a rebuild.
+
+Usage:
+  python src/scripts/build_faq_index.py --csv src/data/faq_data.csv --out /opt/vexere/faq_index.bin
+  python src/scripts/build_faq_index.py --check   # verify FAQ_INDEX_PATH against the CSV only
+"""
+import sys
+import csv
+import time
+import argparse
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.libs.llm_client import create_openai_client
+from src.orchestrator.faq_config import (
+    DEFAULT_FAQ_PATH, FAQ_INDEX_PATH, EMBEDDING_QUANTIZATION,
+    INGEST_BATCH_SIZE, INGEST_MAX_WORKERS,
+)
+from src.orchestrator.faq_ingest import file_sha256, embed_texts, embed_csv_in_order
+from src.orchestrator.faq_index_file import (
+    MappedFAQIndex, expected_index_meta, header_mismatches, lexical_index_arrays, read_header, write_faq_index,
+)
+from src.orchestrator.lexical_index import build_faq_lexical_index
+from src.orchestrator.vector_store import QUANTIZATIONS
+
+
+def check(csv_path: str, out: str, quantization: str) -> int:
+    problems = header_mismatches(read_header(out), expected_index_meta(file_sha256(csv_path), quantization))
+    if not problems and not MappedFAQIndex(out).verify():
+        problems = ["checksum mismatch"]
+    if problems:
+        print(f"❌ {out} does not match {csv_path}: {'; '.join(problems)}")
+        return 1
+    print(f"✅ {out} matches {csv_path} (version {read_header(out)['version']})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=DEFAULT_FAQ_PATH)
+    parser.add_argument("--out", default=FAQ_INDEX_PATH)
+    parser.add_argument("--quantization", default=EMBEDDING_QUANTIZATION, choices=QUANTIZATIONS)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_MAX_WORKERS, help="Concurrent embedding batches")
+    parser.add_argument("--check", action="store_true", help="Only check an existing index against the CSV")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(check(args.csv, args.out, args.quantization))
+
+    started = time.perf_counter()
+    csv_hash = file_sha256(args.csv)
+    with open(args.csv, "r", encoding="utf-8", newline="") as file:
+        faq_data = list(csv.DictReader(file))
+    lexical_index, self_scores = build_faq_lexical_index(faq_data)
+
+    client = create_openai_client()
+    chunks = embed_csv_in_order(
+        args.csv,
+        embed_fn=lambda texts: embed_texts(client, texts),
+        batch_size=args.batch_size,
+        max_workers=args.workers,
+    )
+    header = write_faq_index(
+        args.out, faq_data, chunks, args.quantization,
+        meta={**expected_index_meta(csv_hash, args.quantization), "csv_rows": len(faq_data), "built_at": time.time()},
+        arrays=lexical_index_arrays(lexical_index, self_scores),
+    )
+    print(f"📦 version={header['version']} csv_hash={csv_hash[:12]} model={header['embedding_model']} "
+          f"{header['checksum']} in {time.perf_counter() - started:.1f}s")
+    sys.exit(check(args.csv, args.out, args.quantization))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Offline evaluation of intent classification / field extraction: accuracy vs. latency
+and cost per extraction path.
+
+Dataset: JSONL, one labelled utterance per line
+  {"text": "đổi vé VX123456 sang 6/9", "expected": {"intent": "change_time", "booking_id": "VX123456", "date": "2025-09-06"}}
+Fields missing from "expected" are expected to be null; omit "intent" for turns that only
+supply fields ("T002", "ngày mai nhé") so they are not scored on intent.
+Relative dates are resolved against --today.
+
+Systems (--systems):
+  local       local tiers only (regex → date → places → keywords), never the LLM
+  engine      tiered engine extraction.extract_fields (LLM only when unresolved)
+  llm         extract_fields_llm alone (every turn goes to the model)
+  llm_openai  libs.llm_openai.extract_fields (booking_id/date/trip_id only)
+
+Reports per-field precision/recall, intent accuracy, p50/p99 latency, share of turns
+that called the LLM, tokens and cost per 1k turns (MODEL_PRICES of the model each call
+was routed to), and the model routing decisions (model_router.py). Runs offline with LLM_BACKEND=stub
+or LLM_BACKEND=replay (responses recorded earlier with LLM_BACKEND=record); turns are
+evaluated concurrently.
+
+Usage:
+  LLM_BACKEND=stub python src/scripts/eval_extraction.py
+  LLM_BACKEND=replay LLM_REPLAY_PATH=runs/gpt4o-mini.jsonl python src/scripts/eval_extraction.py --repeat 200 --workers 32
+  LLM_BACKEND=stub LLM_STUB_LATENCY_MS=400 python src/scripts/eval_extraction.py --systems engine llm --show-errors
+"""
+import io
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.libs import vn_date
+from src.libs import llm_openai
+from src.libs.llm_replay import LLM_REPLAY_FALLBACK
+from src.orchestrator import extraction, llm_extractor, model_router
+from src.orchestrator.model_router import model_cost
+
+DEFAULT_DATASET_PATH = (PROJECT_ROOT / "src" / "data" / "extraction_eval.jsonl").as_posix()
+SCORED_FIELDS = ("intent", "booking_id", "date", "trip_id", "route_from", "route_to", "complaint_type")
+
+_usage = threading.local()
+
+
+class _MeteredResponses:
+    """Counts calls/tokens of the wrapped client per worker thread (= per turn)."""
+
+    def __init__(self, responses):
+        self._responses = responses
+
+    def create(self, *args, **kwargs):
+        resp = self._responses.create(*args, **kwargs)
+        usage = getattr(resp, "usage", None)
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        _usage.calls += 1
+        _usage.input_tokens += input_tokens
+        _usage.output_tokens += output_tokens
+        _usage.cost += model_cost(kwargs.get("model", ""), input_tokens, output_tokens)
+        return resp
+
+
+class _MeteredClient:
+    def __init__(self, client):
+        self.responses = _MeteredResponses(client.responses)
+        self.embeddings = client.embeddings
+
+
+def _local(text):
+    return extraction.extract_fields(text, use_llm=False).values()
+
+
+def _engine(text):
+    return extraction.extract_fields(text).values()
+
+
+SYSTEMS = {
+    "local": _local,
+    "engine": _engine,
+    "llm": llm_extractor.extract_fields_llm,
+    "llm_openai": llm_openai.extract_fields,
+}
+
+
+def load_dataset(path: str) -> list:
+    items = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                items.append(json.loads(line))
+    return items
+
+
+def run_turn(system, text: str) -> dict:
+    _usage.calls = _usage.input_tokens = _usage.output_tokens = 0
+    _usage.cost = 0.0
+    started = time.perf_counter()
+    try:
+        predicted, error = system(text), None
+    except Exception as e:
+        predicted, error = {}, str(e)
+    return {
+        "predicted": predicted,
+        "latency": time.perf_counter() - started,
+        "calls": _usage.calls,
+        "input_tokens": _usage.input_tokens,
+        "output_tokens": _usage.output_tokens,
+        "cost": _usage.cost,
+        "error": error,
+    }
+
+
+def _norm(value):
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+
+def score(items: list, runs: list) -> dict:
+    counts = defaultdict(Counter)  # field -> tp/fp/fn
+    intent_total = intent_correct = 0
+    errors = []
+    for item, run in zip(items, runs):
+        expected, predicted = item.get("expected") or {}, run["predicted"] or {}
+        for name in SCORED_FIELDS:
+            if name not in predicted:
+                continue  # the system does not extract this field
+            if name == "intent":
+                if "intent" not in expected:
+                    continue
+                intent_total += 1
+                got = _norm(predicted.get("intent")) or "unknown"
+                if got == _norm(expected["intent"]):
+                    intent_correct += 1
+                else:
+                    errors.append((item["text"], name, expected["intent"], predicted.get("intent")))
+                continue
+            want, got = _norm(expected.get(name)), _norm(predicted.get(name))
+            counts[name]["turns"] += 1
+            if got and got == want:
+                counts[name]["tp"] += 1
+            elif got or want:
+                if got:
+                    counts[name]["fp"] += 1
+                if want:
+                    counts[name]["fn"] += 1
+                errors.append((item["text"], name, expected.get(name), predicted.get(name)))
+    return {"fields": counts, "intent_total": intent_total, "intent_correct": intent_correct, "errors": errors}
+
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def evaluate(name: str, items: list, workers: int, args) -> dict:
+    system = SYSTEMS[name]
+    model_router._router = model_router.ModelRouter()  # routing decisions per system
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        runs = list(pool.map(lambda item: run_turn(system, item["text"]), items))
+    elapsed = time.perf_counter() - started
+
+    scores = score(items, runs)
+    n = max(1, len(runs))
+    latencies = [r["latency"] for r in runs]
+    input_tokens = sum(r["input_tokens"] for r in runs)
+    output_tokens = sum(r["output_tokens"] for r in runs)
+    if args.input_price is None and args.output_price is None:
+        cost = sum(r["cost"] for r in runs)  # MODEL_PRICES of the model each call went to
+    else:
+        cost = input_tokens / 1e6 * (args.input_price or 0.0) + output_tokens / 1e6 * (args.output_price or 0.0)
+    return {
+        "system": name,
+        "turns": len(runs),
+        "scores": scores,
+        "intent_acc": scores["intent_correct"] / scores["intent_total"] if scores["intent_total"] else None,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "llm_turns": sum(1 for r in runs if r["calls"]) / n,
+        "tokens_per_1k": (input_tokens + output_tokens) / n * 1000,
+        "cost_per_1k": cost / n * 1000,
+        "errors": sum(1 for r in runs if r["error"]),
+        "elapsed": elapsed,
+        "routing": model_router.get_model_router().metrics(),
+    }
+
+
+def _prf(c: Counter) -> str:
+    precision = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else 0.0
+    recall = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else 0.0
+    return f"{precision:>5.0%}/{recall:<5.0%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_PATH)
+    parser.add_argument("--systems", nargs="+", choices=list(SYSTEMS), default=list(SYSTEMS))
+    parser.add_argument("--today", default="2025-09-05", help="Reference date for relative dates")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat the dataset N times (load testing)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--input-price", type=float, default=None,
+                        help="USD per 1M input tokens for every model (default: MODEL_PRICES per model)")
+    parser.add_argument("--output-price", type=float, default=None, help="USD per 1M output tokens for every model")
+    parser.add_argument("--show-errors", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="Keep the per-turn DEBUG output")
+    args = parser.parse_args()
+
+    today = date.fromisoformat(args.today)
+    vn_date.set_clock(lambda: today)
+    client = llm_extractor.oai_client
+    llm_extractor.oai_client = _MeteredClient(client)
+
+    items = load_dataset(args.dataset) * max(1, args.repeat)
+    results = []
+    for name in args.systems:
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            results.append(evaluate(name, items, args.workers, args))
+
+    print(f"\nturns={len(items)}  workers={args.workers}  today={args.today}  (precision/recall per field)")
+    print(f"{'system':<11} {'intent':>7} " + " ".join(f"{f[:11]:>11}" for f in SCORED_FIELDS[1:])
+          + f" {'p50 ms':>8} {'p99 ms':>8} {'LLM %':>6} {'tok/1k':>9} {'$/1k':>8} {'elapsed':>8}")
+    for r in results:
+        fields = r["scores"]["fields"]
+        cells = [_prf(fields[f]) if f in fields else f"{'-':>11}" for f in SCORED_FIELDS[1:]]
+        intent = f"{r['intent_acc']:>7.0%}" if r["intent_acc"] is not None else f"{'-':>7}"
+        print(f"{r['system']:<11} {intent} " + " ".join(cells)
+              + f" {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['llm_turns']:>6.0%} {r['tokens_per_1k']:>9.0f}"
+              f" {r['cost_per_1k']:>8.4f} {r['elapsed']:>7.1f}s"
+              + (f"  ⚠️ {r['errors']} errors" if r["errors"] else ""))
+
+    for r in results:
+        routing = r["routing"]
+        if routing["decisions"]:
+            models = ", ".join(f"{m}: {s.get('calls', 0)} calls p50={s['p50_ms']}ms ${s['cost_usd']:.4f}"
+                               for m, s in routing["models"].items())
+            print(f"\n🔀 {r['system']} routing {dict(Counter(routing['decisions']).most_common())}\n   {models}")
+
+    if hasattr(client, "hits"):
+        print(f"\nreplay: {client.hits} recorded responses, {client.misses} misses (fallback: {LLM_REPLAY_FALLBACK})")
+
+    if args.show_errors:
+        for r in results:
+            seen = set()
+            print(f"\n❌ {r['system']}")
+            for text, name, want, got in r["scores"]["errors"]:
+                if (text, name) in seen:
+                    continue
+                seen.add((text, name))
+                print(f"  {text!r}  {name}: expected={want!r} got={got!r}")
+
+
+if __name__ == "__main__":
+    main()
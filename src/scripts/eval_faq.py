@@ -0,0 +1,95 @@
+"""
+Offline retrieval evaluation for the FAQ RAG, built on FAQRAG.search_many.
+
+Query set = every CSV question (labelled with its own row) + the labelled
+paraphrases in src/data/faq_queries.jsonl ({"query", "question"} per line).
+Reports recall@1, recall@k, MRR, how many queries BM25 settled alone, and
+throughput. `--serial` runs the same queries one by one for comparison.
+
+Usage:
+  python src/scripts/eval_faq.py
+  python src/scripts/eval_faq.py --queries my_paraphrases.jsonl --top-k 5 --show-misses
+"""
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.orchestrator.rag_faq import get_faq_rag
+
+DEFAULT_QUERIES_PATH = (PROJECT_ROOT / "src" / "data" / "faq_queries.jsonl").as_posix()
+
+
+def load_eval_set(faq_rag, path: str, include_questions: bool) -> tuple:
+    row_of = {item["question"]: i for i, item in enumerate(faq_rag.faq_data)}
+    queries, labels = [], []
+    if include_questions:
+        queries += [item["question"] for item in faq_rag.faq_data]
+        labels += list(range(len(faq_rag.faq_data)))
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item["question"] not in row_of:
+                print(f"⚠️ Skipping query with unknown label: {item['question']}")
+                continue
+            queries.append(item["query"])
+            labels.append(row_of[item["question"]])
+    return queries, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Queries per search_many call")
+    parser.add_argument("--no-csv-questions", action="store_true", help="Only evaluate the paraphrase file")
+    parser.add_argument("--serial", action="store_true", help="One search_similar_questions call per query")
+    parser.add_argument("--show-misses", action="store_true")
+    args = parser.parse_args()
+
+    faq_rag = get_faq_rag()
+    queries, labels = load_eval_set(faq_rag, args.queries, include_questions=not args.no_csv_questions)
+    started = time.perf_counter()
+    if args.serial:
+        results = [faq_rag.search_similar_questions(q, top_k=args.top_k) for q in queries]
+    else:
+        results = []
+        for start in range(0, len(queries), args.batch_size):
+            results += faq_rag.search_many(queries[start:start + args.batch_size], top_k=args.top_k)
+    elapsed = time.perf_counter() - started
+
+    top1 = topk = 0
+    reciprocal_rank = 0.0
+    sources = Counter()
+    misses = []
+    for query, label, matches in zip(queries, labels, results):
+        rows = [m["faq_index"] for m in matches]
+        sources[matches[0]["source"] if matches else "none"] += 1
+        if rows[:1] == [label]:
+            top1 += 1
+        if label in rows:
+            topk += 1
+            reciprocal_rank += 1.0 / (rows.index(label) + 1)
+        elif args.show_misses:
+            misses.append((query, faq_rag.faq_data[label]["question"], matches[0]["question"] if matches else "-"))
+
+    n = max(1, len(queries))
+    print(f"\nqueries={len(queries)}  mode={'serial' if args.serial else 'batched'}  top_k={args.top_k}")
+    print(f"recall@1={top1 / n:.1%}  recall@{args.top_k}={topk / n:.1%}  MRR={reciprocal_rank / n:.3f}")
+    print(f"sources: {dict(sources)}")
+    print(f"elapsed={elapsed:.2f}s  ({len(queries) / max(elapsed, 1e-9):.0f} queries/s)")
+    for query, expected, got in misses:
+        print(f"  ✗ {query!r}\n      expected: {expected}\n      got:      {got}")
+
+
+if __name__ == "__main__":
+    main()
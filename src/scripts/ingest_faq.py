@@ -0,0 +1,64 @@
+"""
+Build (or resume building) the FAQ embeddings collection from a CSV.
+
+Streams the CSV, embeds batches concurrently with retries and checkpoints after
+every stored batch; re-running after an interruption continues where it stopped.
+
+Usage:
+  python src/scripts/ingest_faq.py --csv src/data/faq_data.csv --workers 8 --batch-size 100
+  python src/scripts/ingest_faq.py --restart   # ignore checkpoint, re-embed everything
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import chromadb
+
+from src.libs.llm_client import create_openai_client
+from src.libs.shared_cache import get_shared_cache
+from src.orchestrator.faq_config import (
+    CHROMA_DB_PATH, DEFAULT_FAQ_PATH, collection_name_for,
+    INGEST_BATCH_SIZE, INGEST_MAX_WORKERS,
+)
+from src.orchestrator.faq_ingest import file_sha256, open_collection, ingest_faq_csv, embed_texts, checkpoint_path_for
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=DEFAULT_FAQ_PATH)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_MAX_WORKERS, help="Concurrent embedding batches")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and start over")
+    args = parser.parse_args()
+
+    # Same versioned collection the service opens for this CSV
+    collection_name = collection_name_for(file_sha256(args.csv))
+    checkpoint_path = checkpoint_path_for(collection_name)
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    client = create_openai_client()
+    chroma = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    # Same lock as the chat_api workers: never build the index twice at once
+    with get_shared_cache().lock(f"faq_build:{CHROMA_DB_PATH}"):
+        collection = open_collection(chroma, collection_name)
+        stats = ingest_faq_csv(
+            args.csv,
+            collection,
+            embed_fn=lambda texts: embed_texts(client, texts),
+            batch_size=args.batch_size,
+            max_workers=args.workers,
+            checkpoint_path=checkpoint_path,
+        )
+    print(f"📊 rows={stats['rows']} stored={stats['stored']} time={stats['seconds']:.1f}s "
+          f"({stats['stored'] / max(stats['seconds'], 1e-9):.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
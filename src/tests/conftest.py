@@ -0,0 +1,21 @@
+"""
+Shared pytest setup: run everything offline (stub LLM) against throwaway SQLite files.
+
+Run from the project root:  python -m pytest -q src/tests
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+_TMP = tempfile.mkdtemp(prefix="vexere_tests_")
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("SHARED_CACHE_PATH", os.path.join(_TMP, "shared_cache.db"))
+os.environ.setdefault("MEDIA_STORE_PATH", os.path.join(_TMP, "media"))
+os.environ.setdefault("DATE_PARSER_TODAY", "2025-09-05")
+os.environ.setdefault("CHROMA_DB_PATH", os.path.join(_TMP, "chroma_db"))
+os.environ.setdefault("FAQ_INDEX_PATH", os.path.join(_TMP, "faq_index.bin"))
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from src.app.admission import AdmissionController, AdmissionRejected, TokenBuckets
+
+
+def test_token_bucket_burst_then_retry_after():
+    buckets = TokenBuckets(rate=10, burst=2)
+    assert buckets.take("a") is None and buckets.take("a") is None
+    retry_after = buckets.take("a")
+    assert 0 < retry_after <= 0.1
+    assert buckets.take("b") is None  # other keys have their own bucket
+    time.sleep(0.11)
+    assert buckets.take("a") is None
+    assert TokenBuckets(rate=0, burst=1).take("a") is None  # rate 0 disables the limit
+
+
+def test_rate_limit_rejects_with_429(monkeypatch):
+    controller = AdmissionController()
+    controller.thread_buckets = TokenBuckets(rate=1, burst=1)
+    controller.check_rate("t1", "1.2.3.4")
+    with pytest.raises(AdmissionRejected) as e:
+        controller.check_rate("t1", "1.2.3.4")
+    assert (e.value.status_code, e.value.reason) == (429, "rate_thread")
+    assert e.value.retry_after > 0
+
+
+def _hold_slot(controller, entered, release):
+    with controller.slot():
+        entered.set()
+        release.wait()
+
+
+def test_slots_queue_fifo_and_reject_when_full():
+    controller = AdmissionController(max_concurrency=1, queue_max=1, queue_timeout=2)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold_slot, args=(controller, entered, release))
+    holder.start()
+    entered.wait()
+
+    queued_entered = threading.Event()
+    queued = threading.Thread(target=_hold_slot, args=(controller, queued_entered, threading.Event()))
+    queued.daemon = True
+    queued.start()
+    time.sleep(0.05)
+    with pytest.raises(AdmissionRejected) as e:
+        with controller.slot():
+            pass
+    assert (e.value.status_code, e.value.reason) == (503, "queue_full")
+    assert e.value.retry_after >= 1
+
+    release.set()
+    assert queued_entered.wait(1)  # the slot is handed to the waiter, not lost
+    metrics = controller.metrics()
+    assert metrics["in_flight"] == 1 and metrics["queue_depth"] == 0
+
+
+def test_queue_timeout():
+    controller = AdmissionController(max_concurrency=1, queue_max=4, queue_timeout=0.1)
+    entered, release = threading.Event(), threading.Event()
+    threading.Thread(target=_hold_slot, args=(controller, entered, release)).start()
+    entered.wait()
+    with pytest.raises(AdmissionRejected) as e:
+        with controller.slot():
+            pass
+    release.set()
+    assert e.value.reason == "queue_timeout"
+    assert controller.metrics()["queue_depth"] == 0
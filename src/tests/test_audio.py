@@ -0,0 +1,58 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.orchestrator.media import audio
+from src.orchestrator.media.audio import AudioChunk, TranscriptionBackend, transcribe_bytes
+
+
+class SlowBackend(TranscriptionBackend):
+    name = model = "slow"
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.timeouts = []
+        self.lock = threading.Lock()
+
+    def transcribe(self, data, filename="audio.wav", mime_type="audio/wav", timeout=None):
+        with self.lock:
+            self.timeouts.append(timeout)
+        time.sleep(min(self.seconds, timeout or self.seconds))
+        return filename
+
+
+def test_backend_must_implement_transcribe():
+    with pytest.raises(TypeError):
+        TranscriptionBackend()
+
+
+def test_chunk_rounds_share_one_deadline(monkeypatch):
+    chunks = [AudioChunk(i, b"", 1.0) for i in range(4)]
+    monkeypatch.setattr(audio, "prepare_audio", lambda data, timeout=None: chunks)
+    monkeypatch.setattr(audio, "AUDIO_MAX_WORKERS", 2)
+    backend = SlowBackend(0.25)
+    assert transcribe_bytes(b"x", backend=backend, timeout=1.0) == "chunk0.wav chunk1.wav chunk2.wav chunk3.wav"
+    first, second = sorted(backend.timeouts, reverse=True)[:2], sorted(backend.timeouts)[:2]
+    assert max(second) < min(first) - 0.1  # the second round only gets what is left
+
+
+def test_budget_exhausted_between_rounds(monkeypatch):
+    chunks = [AudioChunk(i, b"", 1.0) for i in range(3)]
+    monkeypatch.setattr(audio, "prepare_audio", lambda data, timeout=None: chunks)
+    monkeypatch.setattr(audio, "AUDIO_MAX_WORKERS", 1)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        transcribe_bytes(b"x", backend=SlowBackend(1.0), timeout=0.3)
+    assert time.monotonic() - started < 0.5
+
+
+def test_ffmpeg_timeout_follows_the_turn_budget(monkeypatch):
+    seen = []
+    monkeypatch.setattr(audio.shutil, "which", lambda name: "/usr/bin/ffmpeg")
+    monkeypatch.setattr(audio.subprocess, "run",
+                        lambda *args, timeout=None, **kwargs: seen.append(timeout) or SimpleNamespace(returncode=1))
+    audio.decode_audio(b"not a wav", timeout=2.5)
+    audio.decode_audio(b"not a wav")
+    assert seen == [2.5, audio.AUDIO_FFMPEG_TIMEOUT_S]
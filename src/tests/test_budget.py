@@ -0,0 +1,22 @@
+import time
+
+from src.orchestrator.budget import BUDGET_RESERVE_S, call_timeout, has_budget, remaining, turn_config
+
+
+def test_deadline_counts_from_request_arrival():
+    arrived = time.time() - 3.0  # e.g. queued for admission / waiting for the thread lock
+    config = turn_config("t1", budget_s=5.0, started_at=arrived)
+    assert 1.5 < remaining(config) <= 2.0
+    assert has_budget(config, 1.5) and not has_budget(config, 2.5)
+
+
+def test_call_timeout_keeps_the_reserve_and_cap():
+    config = turn_config("t1", budget_s=4.0)
+    assert call_timeout(config) <= 4.0 - BUDGET_RESERVE_S
+    assert call_timeout(config, cap=1.0) == 1.0
+    assert call_timeout(turn_config("t1", budget_s=4.0, started_at=time.time() - 10)) == 0.1
+
+
+def test_no_deadline_without_turn_config():
+    assert remaining({}) is None and has_budget(None, 100)
+    assert call_timeout(None, cap=5.0) == 5.0
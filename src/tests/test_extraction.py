@@ -0,0 +1,58 @@
+import pytest
+
+from src.orchestrator import extraction
+from src.orchestrator.extraction import extract_fields, is_fields_only, parse_awaited_reply
+
+
+@pytest.fixture
+def no_llm(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("LLM tier must not run")
+    monkeypatch.setattr(extraction, "llm_tier", fail)
+
+
+@pytest.mark.parametrize("text", ["T02", "T002", "chuyến T002 nhé", "chọn chuyến t002", "lấy mã T001 nha", "VX123456"])
+def test_id_replies_stop_before_the_llm(no_llm, text):
+    result = extract_fields(text)
+    assert not result.llm_called
+    assert result.get("trip_id") or result.get("booking_id")
+    assert is_fields_only(text)
+
+
+def test_reply_words_alone_are_not_fields_only():
+    assert not is_fields_only("chọn chuyến nào")
+
+
+def test_several_trip_ids_have_low_confidence():
+    result = extract_fields("T001 hay T002", use_llm=False)
+    assert result.get("trip_id") == "T001"
+    assert not result.resolved("trip_id")
+    assert result.degraded == "llm_skipped"
+    assert extract_fields("T001 rồi T001 nhé", use_llm=False).resolved("trip_id")
+
+
+def test_route_and_intent_resolve_locally(no_llm):
+    result = extract_fields("Xem chuyến HCM đi Đà Lạt")
+    assert result.values()["intent"] == "view_trips"
+    assert result.sources()["route_from"] == "places"
+
+
+def test_accented_mot_follow_up_resolves_locally(no_llm):
+    assert extract_fields("mốt").resolved("date")
+
+
+def test_unresolved_turn_goes_to_the_llm_tier():
+    result = extract_fields("tôi muốn hỏi một chuyện")
+    assert result.llm_called
+
+
+@pytest.mark.parametrize("text, options, expected", [
+    ("chuyến T002 nhé", None, "T002"),
+    ("T02", ["T02", "T03"], "T02"),
+    ("T009", ["T001", "T002"], None),
+    ("T001 hay T002", None, None),
+    ("T001 ngày mai", None, None),
+    ("chuyến T001 Đà Lạt", None, None),
+])
+def test_parse_awaited_reply(text, options, expected):
+    assert parse_awaited_reply(text, "trip_id", options) == expected
@@ -0,0 +1,46 @@
+import uuid
+
+import pytest
+
+from src.orchestrator import faq_answer_table
+from src.orchestrator.faq_answer_table import FAQAnswerTable
+
+ROWS = [
+    {"question": "Bán vé ở đâu?", "answer": "sell"},
+    {"question": "Bạn về đâu?", "answer": "going home"},
+    {"question": "Hành lý được mang bao nhiêu kg?", "answer": "20kg"},
+]
+
+
+@pytest.fixture
+def table(monkeypatch):
+    monkeypatch.setattr(faq_answer_table, "FAQ_HOT_THRESHOLD", 2)
+    t = FAQAnswerTable(uuid.uuid4().hex[:16])
+    t.seed(ROWS)
+    return t
+
+
+def test_exact_lookup_keeps_tone_marks(table):
+    assert table.lookup("bán vé ở đâu") == "sell"
+    assert table.lookup("BẠN VỀ ĐÂU ?") == "going home"
+
+
+def test_unaccented_query_falls_back_only_when_unambiguous(table):
+    assert table.lookup("hanh ly duoc mang bao nhieu kg") == "20kg"
+    # Two seeded questions that fold to the same text: no fallback answer
+    table.seed(ROWS + [{"question": "Bạn vé ở đâu?", "answer": "other"}])
+    assert table.lookup("ban ve o dau") is None
+
+
+def test_accented_query_never_uses_folded_fallback(table):
+    assert table.lookup("hành lí được mang bao nhiêu kg") is None
+
+
+def test_popularity_is_counted_per_exact_phrasing(table):
+    for _ in range(2):
+        table.lookup("vé xe tết mở bán khi nào")
+    table.lookup("vé xe tết mỡ bán khi nào")
+    assert table.observe("vé xe tết mỡ bán khi nào", "answer") is False
+    assert table.observe("vé xe tết mở bán khi nào", "answer") is True
+    assert table.lookup("vé xe tết mở bán khi nào") == "answer"
+    assert table.lookup("ve xe tet mo ban khi nao") is None
@@ -0,0 +1,152 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.libs import llm_gateway
+from src.libs.llm_gateway import CircuitBreaker, CircuitOpen, GatewayOpenAI, LLMGateway, LLMGatewayError, LLMTimeout
+
+
+class Upstream(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_RETRY_BASE_S", 0.0)
+    return LLMGateway(max_concurrency=4)
+
+
+def test_transient_errors_are_retried(gateway):
+    calls = []
+
+    def fn(attempt_timeout):
+        calls.append(attempt_timeout)
+        if len(calls) < 3:
+            raise Upstream(503)
+        return "ok"
+
+    assert gateway.call("responses", fn) == "ok"
+    assert len(calls) == 3
+    assert gateway.metrics()["ops"]["responses"]["retries"] == 2
+
+
+def test_request_errors_are_not_retried_and_keep_the_breaker_closed(gateway):
+    calls = []
+
+    def fn(attempt_timeout):
+        calls.append(1)
+        raise Upstream(400)
+
+    for _ in range(10):
+        with pytest.raises(Upstream):
+            gateway.call("responses", fn)
+    assert len(calls) == 10
+    assert gateway.metrics()["ops"]["responses"]["breaker"] == "closed"
+
+
+def test_breaker_opens_then_recovers_through_a_single_trial(monkeypatch):
+    breaker = CircuitBreaker(failures=2, cooldown=0.1)
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.15)
+    assert breaker.allow() and not breaker.allow()  # one trial only
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_open_breaker_fails_fast_per_op(gateway, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_MAX_RETRIES", 0)
+    gateway._op("embeddings")[1].failures = 1
+
+    def down(attempt_timeout):
+        raise Upstream(500)
+
+    with pytest.raises(LLMGatewayError):
+        gateway.call("embeddings", down)
+    with pytest.raises(CircuitOpen):
+        gateway.call("embeddings", lambda t: "never called")
+    assert gateway.call("responses", lambda t: "ok") == "ok"
+
+
+def test_deadline_bounds_slow_calls(gateway, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_MAX_RETRIES", 0)
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        gateway.call("responses", lambda t: time.sleep(1.0), timeout=0.2)
+    assert time.monotonic() - started < 0.6
+
+
+def test_hedge_wins_when_first_attempt_is_slow(gateway, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(llm_gateway, "LLM_HEDGE_MIN_MS", 10)
+    for _ in range(5):
+        gateway.call("responses", lambda t: time.sleep(0.01))
+    first = threading.Event()
+
+    def fn(attempt_timeout):
+        if not first.is_set():
+            first.set()
+            time.sleep(0.5)
+            return "slow"
+        return "hedged"
+
+    assert gateway.call("responses", fn) == "hedged"
+    counts = gateway.metrics()["ops"]["responses"]
+    assert counts["hedges"] == 1 and counts["hedge_wins"] == 1
+
+
+def test_vision_op_has_its_own_timeout_and_no_hedge(monkeypatch):
+    seen = {}
+
+    class Gateway:
+        def call(self, op, fn, timeout=None, hedge=True, attempt_timeout=None):
+            seen.update(op=op, hedge=hedge, attempt_timeout=attempt_timeout)
+            return fn(attempt_timeout)
+
+    endpoint = SimpleNamespace(create=lambda **kwargs: kwargs["timeout"])
+    client = SimpleNamespace(responses=endpoint, embeddings=endpoint)
+    vision = GatewayOpenAI(client, Gateway(), responses_op="responses_vision")
+    assert vision.responses.create(model="m", input=[]) == llm_gateway.LLM_VISION_TIMEOUT_S
+    assert seen == {"op": "responses_vision", "hedge": False, "attempt_timeout": llm_gateway.LLM_VISION_TIMEOUT_S}
+    GatewayOpenAI(client, Gateway()).responses.create(model="m", input=[])
+    assert seen == {"op": "responses", "hedge": True, "attempt_timeout": llm_gateway.LLM_TIMEOUT_S}
+
+
+def test_wraps_a_real_openai_client():
+    openai = pytest.importorskip("openai")
+    raw = openai.OpenAI(api_key="test", max_retries=0)
+    client = GatewayOpenAI(raw, LLMGateway(max_concurrency=1))
+    assert isinstance(client.responses, llm_gateway._GatewayEndpoint)
+    assert client.responses._endpoint is raw.responses
+    assert client.embeddings._endpoint is raw.embeddings
+    assert client.audio.transcriptions._endpoint is raw.audio.transcriptions
+    assert client.audio.speech is raw.audio.speech  # not wrapped
+    assert client.with_options(timeout=5).responses._endpoint is not raw.responses
+
+
+def test_missing_resource_fails_only_when_used():
+    client = GatewayOpenAI(SimpleNamespace(embeddings=SimpleNamespace(create=lambda **kwargs: "ok")), LLMGateway(1))
+    assert client.embeddings.create(input="x") == "ok"
+    with pytest.raises(AttributeError):
+        client.responses
+
+
+def test_transcriptions_and_model_listing_go_through_the_gateway():
+    gateway = LLMGateway(max_concurrency=2)
+    create = lambda **kwargs: SimpleNamespace(text="xin chào", timeout=kwargs["timeout"])
+    client = GatewayOpenAI(SimpleNamespace(
+        audio=SimpleNamespace(transcriptions=SimpleNamespace(create=create)),
+        models=SimpleNamespace(list=lambda timeout: ["m"]),
+    ), gateway)
+    resp = client.audio.transcriptions.create(model="m", file=("a.wav", b"", "audio/wav"), timeout=None)
+    assert resp.text == "xin chào" and resp.timeout <= llm_gateway.LLM_AUDIO_TIMEOUT_S
+    assert client.models.list(timeout=5) == ["m"]
+    ops = gateway.metrics()["ops"]
+    assert ops["audio_transcriptions"]["ok"] == 1 and ops["models"]["ok"] == 1
+    assert llm_gateway.LLM_OP_POLICIES["audio_transcriptions"]["hedge"] is False
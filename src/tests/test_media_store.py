@@ -0,0 +1,49 @@
+import io
+import os
+import time
+
+import pytest
+
+from src.orchestrator.media.attachments import AttachmentError
+from src.orchestrator.media.store import MediaNotFound, MediaStore, MediaTooLarge, store_inline_attachments
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MediaStore(path=str(tmp_path / "media"), ttl=60, max_bytes=1024)
+
+
+def test_same_content_is_stored_once(store):
+    first = store.put_bytes(PNG)
+    assert store.put_stream(io.BytesIO(PNG), mime_type="application/octet-stream") == first
+    data, mime = store.read(first)
+    assert data == PNG and mime == "image/png"  # sniffed type wins over the declared one
+    assert len([n for n in os.listdir(store.path) if n.endswith(".bin")]) == 1
+
+
+def test_oversized_and_empty_uploads_leave_nothing_behind(store):
+    with pytest.raises(MediaTooLarge):
+        store.put_bytes(b"x" * 2048)
+    with pytest.raises(AttachmentError):
+        store.put_bytes(b"")
+    assert os.listdir(store.path) == []
+
+
+def test_invalid_and_expired_handles(store):
+    with pytest.raises(MediaNotFound):
+        store.resolve("media://../../etc/passwd")
+    handle = store.put_bytes(PNG)
+    path, _ = store.resolve(handle)
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    with pytest.raises(MediaNotFound):
+        store.read(handle)
+    assert store.purge_expired() == 1
+    assert os.listdir(store.path) == []
+
+
+def test_inline_attachments_become_handles():
+    refs = store_inline_attachments(["data:image/png;base64,iVBORw0KGgoAAAAA", "https://example.com/a.png"])
+    assert refs[0].startswith("media://") and refs[1] == "https://example.com/a.png"
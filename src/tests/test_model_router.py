@@ -0,0 +1,93 @@
+import importlib
+
+import pytest
+
+from src.libs.llm_gateway import LLMTimeout
+from src.orchestrator import model_router
+from src.orchestrator.extraction import REQUIRED_FIELDS, ExtractionResult
+from src.orchestrator.model_router import ModelRouter
+
+GOOD = {"intent": "check_booking", "booking_id": "VX123456"}
+# No intent and a booking id that contradicts the regex tier
+UNSURE = {"intent": "unknown", "booking_id": "VX999999"}
+
+
+def local_fields() -> ExtractionResult:
+    local = ExtractionResult()
+    local.put("booking_id", "VX123456", 0.99, "regex")
+    return local
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """model -> answer (dict, or an exception to raise); records the models called."""
+    table, called = {}, []
+
+    def fake_llm(text, timeout=None, model=None, meta=None):
+        called.append(model)
+        answer = table[model]
+        if isinstance(answer, Exception):
+            raise answer
+        meta["schema_errors"] = answer.get("_errors", [])
+        return {k: v for k, v in answer.items() if k != "_errors"}
+
+    monkeypatch.setattr(model_router, "extract_fields_llm", fake_llm)
+    return table, called
+
+
+def test_default_models_route_a_cheaper_fast_model_to_the_baseline(monkeypatch):
+    monkeypatch.delenv("EXTRACT_MODEL_FAST", raising=False)
+    monkeypatch.delenv("EXTRACT_MODEL_STRONG", raising=False)
+    try:
+        importlib.reload(model_router)
+        router = model_router.ModelRouter()
+        assert (router.fast, router.strong) == ("gpt-4.1-nano", model_router.OPENAI_MODEL)
+        assert model_router.model_cost("gpt-4.1-nano", 1000, 100) < model_router.model_cost("gpt-4o-mini", 1000, 100)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(model_router)
+
+
+def test_fast_model_answers_first_even_for_long_turns(answers):
+    table, called = answers
+    table.update({"fast": GOOD, "strong": GOOD})
+    answer = ModelRouter("fast", "strong").extract("x" * 500, ExtractionResult(), REQUIRED_FIELDS)
+    assert (answer.decision, called) == ("fast", ["fast"])
+
+
+@pytest.mark.parametrize("fast_answer, reason", [
+    ({**GOOD, "_errors": ["booking_id"]}, "schema"),
+    (UNSURE, "low_confidence"),
+])
+def test_escalates_only_on_schema_errors_or_low_confidence(answers, fast_answer, reason):
+    table, called = answers
+    table.update({"fast": fast_answer, "strong": GOOD})
+    answer = ModelRouter("fast", "strong").extract("vé VX123456", local_fields(), REQUIRED_FIELDS)
+    assert answer.decision == f"escalated:{reason}"
+    assert answer.model == "strong" and answer.models == called == ["fast", "strong"]
+
+
+def test_no_escalation_without_budget_or_when_models_match(answers):
+    table, called = answers
+    table.update({"fast": UNSURE, "strong": GOOD})
+    answer = ModelRouter("fast", "strong").extract("VX123456", local_fields(), REQUIRED_FIELDS, timeout=0.5)
+    assert answer.decision == "fast:escalation_skipped_budget:low_confidence"
+    assert ModelRouter("fast", "fast").extract("VX123456", local_fields(), REQUIRED_FIELDS).decision == "fast"
+    assert called == ["fast", "fast"]
+
+
+def test_failed_escalation_keeps_the_fast_answer(answers):
+    table, _ = answers
+    table.update({"fast": UNSURE, "strong": LLMTimeout("slow")})
+    answer = ModelRouter("fast", "strong").extract("VX123456", local_fields(), REQUIRED_FIELDS)
+    assert (answer.decision, answer.data) == ("fast:escalation_failed:low_confidence", UNSURE)
+
+
+def test_metrics_count_decisions_and_cost(answers):
+    table, _ = answers
+    table.update({"fast": UNSURE, "strong": GOOD})
+    router = ModelRouter("fast", "strong")
+    router.extract("VX123456", local_fields(), REQUIRED_FIELDS)
+    metrics = router.metrics()
+    assert metrics["decisions"] == {"escalated:low_confidence": 1}
+    assert metrics["models"]["fast"]["calls"] == metrics["models"]["strong"]["calls"] == 1
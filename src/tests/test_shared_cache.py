@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from src.libs.shared_cache import LockTimeout, SharedCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SharedCache(str(tmp_path / "cache.db"))
+
+
+def test_get_set_ttl(cache):
+    cache.set("a", {"x": 1}, ttl=0.2)
+    assert cache.get("a") == {"x": 1}
+    time.sleep(0.3)
+    assert cache.get("a") is None
+
+
+def test_lease_is_exclusive_until_released(cache):
+    owner = cache.try_acquire("job", ttl=5)
+    assert owner
+    assert cache.try_acquire("job", ttl=5) is None
+    cache.release("job", owner)
+    assert cache.try_acquire("job", ttl=5)
+
+
+def test_expired_lease_can_be_taken_and_old_owner_cannot_renew(cache):
+    owner = cache.try_acquire("job", ttl=0.1)
+    time.sleep(0.2)
+    assert cache.try_acquire("job", ttl=5)
+    assert cache.renew("job", owner, ttl=5) is False
+
+
+def test_lock_timeout(cache):
+    holder = cache.try_acquire("job", ttl=5)
+    assert holder
+    with pytest.raises(LockTimeout):
+        with cache.lock("job", timeout=0.2, poll=0.05):
+            pass
+
+
+def test_renewed_lock_outlives_its_ttl(cache):
+    with cache.lock("build", ttl=0.3, renew=True):
+        time.sleep(1.0)
+        assert cache.try_acquire("build", ttl=5) is None
+    assert cache.try_acquire("build", ttl=5)
+
+
+def test_lock_serializes_threads(cache):
+    inside, overlaps = [], []
+
+    def work():
+        with cache.lock("mutex", ttl=5, poll=0.01):
+            if inside:
+                overlaps.append(True)
+            inside.append(True)
+            time.sleep(0.05)
+            inside.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not overlaps
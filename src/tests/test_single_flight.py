@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from src.libs.single_flight import SingleFlight, SingleFlightTimeout
+from src.orchestrator import nodes, rag_faq
+from src.orchestrator.budget import turn_config
+
+
+def _run_concurrently(n, target):
+    results = [None] * n
+
+    def run(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_calls_share_one_execution():
+    flight, runs = SingleFlight("t"), []
+
+    def slow():
+        runs.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    assert _run_concurrently(5, lambda: flight.do("k", slow)) == ["answer"] * 5
+    assert len(runs) == 1
+    assert flight.metrics()["coalesced"] == 4
+    assert flight.do("k", lambda: "fresh") == "fresh"  # not a cache
+
+
+def test_errors_are_shared_and_followers_can_give_up():
+    flight = SingleFlight("t")
+
+    def boom():
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    results = _run_concurrently(3, lambda: flight.do("k", boom))
+    assert all(isinstance(r, ValueError) for r in results)
+
+    threading.Thread(target=flight.do, args=("slow", lambda: time.sleep(0.5))).start()
+    time.sleep(0.05)
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("slow", lambda: "never", wait=0.05)
+    assert flight.metrics()["wait_timeouts"] == 1
+
+
+def test_async_calls_share_one_task():
+    flight, runs = SingleFlight("t"), []
+
+    async def fetch():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", fetch) for _ in range(4)))
+
+    assert asyncio.run(main()) == [42] * 4
+    assert len(runs) == 1
+
+
+class SlowRag:
+    """FAQ index whose vector search takes `delay` seconds; BM25 answers at once."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.answer_table = SimpleNamespace(lookup=lambda q: None, observe=lambda q, a: False)
+
+    def get_contextual_response(self, query, use_vector=True, timeout=None, meta=None):
+        if use_vector:
+            time.sleep(self.delay)
+            return "vector answer"
+        return "lexical answer"
+
+
+def test_faq_follower_timeout_is_reported_as_faq_lexical(monkeypatch):
+    monkeypatch.setattr(rag_faq, "get_faq_rag", lambda rag=SlowRag(0.5): rag)
+    leader = threading.Thread(target=rag_faq.get_contextual_faq_response, args=("Hành lý bao nhiêu kg?",))
+    leader.start()
+    time.sleep(0.05)
+    meta = {}
+    assert rag_faq.get_contextual_faq_response("hành lý bao nhiêu kg", timeout=0.05, meta=meta) == "lexical answer"
+    assert meta == {"degraded": "faq_lexical"}
+    leader.join()
+
+    state = {"messages": [HumanMessage(content="Hành lý bao nhiêu kg?")]}
+    leader = threading.Thread(target=nodes.faq_node, args=(state,))
+    leader.start()
+    time.sleep(0.05)
+    monkeypatch.setattr(nodes, "FAQ_VECTOR_MIN_BUDGET_S", 0.1)
+    out = nodes.faq_node(state, turn_config("t", budget_s=0.5))  # vector allowed, but not 0.5 s of waiting
+    leader.join()
+    assert out["degradations"] == ["faq_lexical"]
+    assert "lexical answer" in out["messages"][-1].content
+
+
+def test_faq_budget_path_reports_faq_lexical(monkeypatch):
+    monkeypatch.setattr(rag_faq, "get_faq_rag", lambda rag=SlowRag(0.0): rag)
+    meta = {}
+    assert rag_faq.get_contextual_faq_response("hỏi", use_vector=False, meta=meta) == "lexical answer"
+    assert meta == {"degraded": "faq_lexical"}
+    assert rag_faq.get_contextual_faq_response("hỏi", meta={}) == "vector answer"
+
+
+def test_lexical_fallback_after_embedding_failure_is_not_promoted(monkeypatch):
+    rag = rag_faq.get_faq_rag()
+    query = "cho mình hỏi thêm chút thông tin về chuyến đi"
+    assert not rag.is_lexical_decisive(rag.lexical_search(query))
+    observed = []
+    monkeypatch.setattr(rag.answer_table, "lookup", lambda q: None)
+    monkeypatch.setattr(rag.answer_table, "observe", lambda q, a: observed.append(q))
+    monkeypatch.setattr(rag, "get_question_embeddings", lambda questions, timeout=None: [[] for _ in questions])
+    meta = {}
+    assert rag_faq.get_contextual_faq_response(query, meta=meta) != rag_faq.NOT_FOUND_RESPONSE
+    assert meta == {"degraded": "faq_lexical"} and observed == []
+
+    monkeypatch.undo()
+    monkeypatch.setattr(rag.answer_table, "lookup", lambda q: None)
+    monkeypatch.setattr(rag.answer_table, "observe", lambda q, a: observed.append(q))
+    meta = {}
+    rag_faq.get_contextual_faq_response(query, meta=meta)
+    assert meta == {} and observed == [query]
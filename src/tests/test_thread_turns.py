@@ -0,0 +1,106 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from src.app import thread_turns
+from src.app.admission import AdmissionController, AdmissionRejected
+from src.app.thread_turns import ThreadTurns, turn_fingerprint
+from src.libs.shared_cache import get_shared_cache
+
+
+@pytest.fixture
+def thread_id():
+    return f"t-{uuid.uuid4().hex[:8]}"
+
+
+def _in_thread(fn):
+    t = threading.Thread(target=fn, daemon=True)
+    t.start()
+    return t
+
+
+def test_turns_of_one_thread_run_one_at_a_time(thread_id):
+    turns, inside, overlaps = ThreadTurns(), [], []
+
+    def turn():
+        with turns.serialize(thread_id):
+            overlaps.append(bool(inside))
+            inside.append(1)
+            time.sleep(0.05)
+            inside.pop()
+
+    for t in [_in_thread(turn) for _ in range(3)]:
+        t.join()
+    assert overlaps == [False, False, False]
+    assert turns.metrics()["threads_active"] == 0
+
+
+def test_pending_limit_and_lock_timeout(thread_id, monkeypatch):
+    monkeypatch.setattr(thread_turns, "CHAT_THREAD_MAX_PENDING", 2)
+    monkeypatch.setattr(thread_turns, "CHAT_THREAD_LOCK_TIMEOUT_S", 0.2)
+    turns, release = ThreadTurns(), threading.Event()
+
+    def hold():
+        with turns.serialize(thread_id):
+            release.wait()
+
+    def wait_then_give_up():
+        with pytest.raises(AdmissionRejected):
+            with turns.serialize(thread_id):
+                pass
+
+    _in_thread(hold)
+    time.sleep(0.05)
+    waiter = _in_thread(wait_then_give_up)
+    time.sleep(0.05)
+    with pytest.raises(AdmissionRejected) as e:
+        with turns.serialize(thread_id):
+            pass
+    assert (e.value.status_code, e.value.reason) == (429, "thread_pending")
+    waiter.join()
+    assert turns.counts["rejected_thread_busy"] == 1  # the waiter gave up with 409
+    release.set()
+
+
+def test_waiting_turn_does_not_hold_an_admission_slot(thread_id):
+    # Same order as chat_api._run_chat: thread lock first, admission slot second
+    turns, controller = ThreadTurns(), AdmissionController(max_concurrency=1, queue_max=0, queue_timeout=0)
+    release, started = threading.Event(), threading.Event()
+
+    def first_turn():
+        with turns.serialize(thread_id), controller.slot():
+            started.set()
+            release.wait()
+
+    _in_thread(first_turn)
+    started.wait()
+    def second_turn():
+        with turns.serialize(thread_id):
+            pass
+
+    second = _in_thread(second_turn)
+    time.sleep(0.05)
+    assert controller.metrics()["in_flight"] == 1  # the queued same-thread turn holds nothing
+    release.set()
+    second.join()
+
+
+def test_shared_turn_lease_is_renewed_while_the_turn_runs(thread_id, monkeypatch):
+    monkeypatch.setattr(thread_turns, "CHAT_THREAD_LEASE_TTL_S", 0.3)
+    with ThreadTurns(shared=True).serialize(thread_id):
+        time.sleep(0.8)
+        assert get_shared_cache().try_acquire(f"turn:{thread_id}", ttl=5) is None
+    assert get_shared_cache().try_acquire(f"turn:{thread_id}", ttl=5)
+
+
+def test_duplicate_turn_is_collapsed(thread_id):
+    turns = ThreadTurns()
+    fp = turn_fingerprint("Kiểm tra vé VX123456", ["media://abc"], None)
+    assert fp == turn_fingerprint(" Kiểm tra vé VX123456 ", ["media://abc"], None)
+    assert fp != turn_fingerprint("Kiểm tra vé VX123456", [], None)
+    assert turns.recent(thread_id, fp) is None
+    turns.remember(thread_id, fp, {"reply": "ok"})
+    assert turns.recent(thread_id, fp) == {"reply": "ok"}
+    assert turns.recent("other", fp) is None
@@ -0,0 +1,86 @@
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from src.libs.shared_cache import get_shared_cache
+from src.orchestrator.media import vision
+from src.orchestrator.media.vision import OpenAIVisionBackend, VisionBackend, analyze_images
+
+
+def _image_ref(tmp_path, color) -> str:
+    path = tmp_path / f"{uuid.uuid4().hex}.png"
+    Image.new("RGB", (64, 48), color).save(path)
+    return str(path)
+
+
+class FakeResponses:
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = 0
+        self.timeouts = []
+
+    def create(self, **kwargs):
+        self.calls += 1
+        self.timeouts.append(kwargs.get("timeout"))
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return SimpleNamespace(output_text=answer)
+
+
+@pytest.fixture
+def backend():
+    # Unique model name: every test gets its own cache namespace
+    responses = FakeResponses([])
+    b = OpenAIVisionBackend(client=SimpleNamespace(responses=responses), model=uuid.uuid4().hex)
+    return b, responses
+
+
+def test_backend_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        VisionBackend()
+
+
+def test_parsed_answer_is_cached(tmp_path, backend):
+    b, responses = backend
+    ref = _image_ref(tmp_path, (10, 20, 30))
+    responses.answers = [json.dumps({"images": ["Mã vé VX123456 chuyến T001"]})]
+    assert analyze_images([ref], backend=b) == ("Mã vé VX123456 chuyến T001", {"booking_id": "VX123456", "trip_id": "T001"})
+    assert analyze_images([ref], backend=b)[0] == "Mã vé VX123456 chuyến T001"
+    assert responses.calls == 1
+
+
+def test_non_json_answer_is_used_but_not_cached(tmp_path, backend):
+    b, responses = backend
+    refs = [_image_ref(tmp_path, (200, 0, 0)), _image_ref(tmp_path, (0, 200, 0))]
+    responses.answers = ["Xin lỗi, ảnh: VX555555", json.dumps({"images": ["A", "B"]})]
+    assert analyze_images(refs, backend=b)[0] == "Xin lỗi, ảnh: VX555555"
+    assert analyze_images(refs, backend=b)[0] == "A\n\nB"
+    assert responses.calls == 2
+
+
+def test_empty_texts_and_backend_errors_are_not_cached(tmp_path, backend):
+    b, responses = backend
+    refs = [_image_ref(tmp_path, (0, 0, 200)), _image_ref(tmp_path, (90, 90, 0))]
+    responses.answers = [json.dumps({"images": ["only the first"]})]
+    analyze_images(refs, backend=b)
+    keys = [vision._cache_key(b, vision.image_cache_key(open(ref, "rb").read())) for ref in refs]
+    assert list(get_shared_cache().get_many(keys)) == keys[:1]
+
+    responses.answers = [TimeoutError("slow"), json.dumps({"images": ["second"]})]
+    assert analyze_images(refs[1:], backend=b) == ("", {})
+    assert analyze_images(refs[1:], backend=b)[0] == "second"
+    assert responses.calls == 3
+
+
+def test_turn_budget_bounds_the_model_call(tmp_path, backend):
+    b, responses = backend
+    refs = [_image_ref(tmp_path, (1, 2, 3))]
+    responses.answers = [json.dumps({"images": ["VX111111"]})]
+    analyze_images(refs, backend=b, timeout=2.0)
+    assert 0 < responses.timeouts[0] <= 2.0
+    assert analyze_images([_image_ref(tmp_path, (3, 2, 1))], backend=b, timeout=0) == ("", {})
+    assert responses.calls == 1
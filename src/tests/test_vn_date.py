@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+
+from src.libs.vn_date import DATE_CONFIDENCE_THRESHOLD, is_date_only, parse_vn_date
+
+TODAY = date(2025, 9, 5)  # thứ 6
+
+
+@pytest.mark.parametrize("text, expected, min_conf", [
+    ("2025-09-06", "2025-09-06", 1.0),
+    ("sang ngày 6/9", "2025-09-06", 0.9),
+    ("mùng 5 tháng 10 năm 2025", "2025-10-05", 0.95),
+    ("ngày mai", "2025-09-06", 0.95),
+    ("ngày mốt", "2025-09-07", 0.85),
+    ("mốt", "2025-09-07", 0.85),
+    ("Mốt nhé", "2025-09-07", 0.85),
+    ("hôm qua", "2025-09-04", 0.9),
+    ("3 ngày nữa", "2025-09-08", 0.85),
+    ("thứ 7 tuần này", "2025-09-06", 0.9),
+    ("chủ nhật tuần sau", "2025-09-14", 0.9),
+    ("tuần sau thứ 2", "2025-09-08", 0.9),
+    ("ngày thứ 2", "2025-09-08", 0.8),
+    ("sáng thứ hai", "2025-09-08", 0.8),
+])
+def test_dates(text, expected, min_conf):
+    parsed = parse_vn_date(text, TODAY)
+    assert parsed.date == expected
+    assert parsed.confidence >= min_conf
+
+
+@pytest.mark.parametrize("text", [
+    "theo thứ tự",
+    "theo thu tu",
+    "chuyến thứ 2 giá bao nhiêu",
+    "toi muon dat mot ve",
+    "cho toi mot ve",
+])
+def test_no_confident_date_without_date_context(text):
+    parsed = parse_vn_date(text, TODAY)
+    assert parsed is None or parsed.confidence < DATE_CONFIDENCE_THRESHOLD
+
+
+def test_accented_mot_is_not_a_date():
+    assert parse_vn_date("tôi muốn đặt một vé", TODAY) is None
+
+
+def test_time_is_read_outside_the_date():
+    parsed = parse_vn_date("6/9 lúc 7 giờ tối", TODAY)
+    assert (parsed.date, parsed.time) == ("2025-09-06", "19:00")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ngày mai nhé", True),
+    ("còn thứ 7 tuần sau thì sao", True),
+    ("hôm thứ 3 nhé", True),
+    ("mốt nhé", True),
+    ("ngày mai đi Đà Lạt", False),
+])
+def test_is_date_only(text, expected):
+    assert is_date_only(text, parse_vn_date(text, TODAY)) is expected
@@ -0,0 +1,27 @@
+import os
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.app import warmup
+from src.orchestrator.graph import compile_graph
+
+
+def test_graph_pass_runs_on_the_graph_it_is_given(monkeypatch):
+    graph = compile_graph(InMemorySaver())
+    monkeypatch.setattr(warmup, "WARMUP_STEPS", [("graph_pass", warmup._graph_pass, True)])
+    report = warmup.run_warmup(graph)
+    assert report["status"] == "ready"
+    assert report["steps"]["graph_pass"]["turns"] == len(warmup.WARMUP_TURNS)
+    # The warmup conversation is deleted from the worker's checkpointer
+    thread_id = f"warmup-{os.getpid()}"
+    assert graph.checkpointer.get_tuple({"configurable": {"thread_id": thread_id}}) is None
+
+
+def test_failing_required_step_reports_its_error(monkeypatch):
+    def broken():
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(warmup, "WARMUP_STEPS", [("graph_pass", broken, True)])
+    report = warmup.run_warmup(compile_graph(InMemorySaver()))
+    assert report["status"] == "failed"
+    assert report["steps"]["graph_pass"]["error"] == "boom"
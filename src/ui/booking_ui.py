@@ -3,6 +3,8 @@ import requests
 import streamlit as st
 
 DEFAULT_API_URL = os.getenv("API_URL", "http://localhost:8081/chat")
+# API trả lời trong TURN_BUDGET_S (mặc định 8s), chờ thêm một chút cho mạng
+CHAT_TIMEOUT_S = float(os.getenv("CHAT_TIMEOUT_S", "15"))
 
 st.set_page_config(page_title="Vexere Change-Time Bot", page_icon="🚌", layout="centered")
 st.title("🚌 Vexere — Đổi giờ vé (POC)")
@@ -28,8 +30,11 @@ def call_api(msg: str):
     r = requests.post(
         st.session_state.api_url,
         json={"message": msg, "thread_id": st.session_state.thread_id},
-        timeout=60,
+        timeout=CHAT_TIMEOUT_S,
     )
+    if r.status_code in (429, 503):
+        # Admission control của chat_api: gửi quá nhanh / hệ thống quá tải
+        raise RuntimeError(f"{r.json().get('detail', 'Hệ thống đang bận')} – thử lại sau {r.headers.get('Retry-After', '1')}s")
     r.raise_for_status()
     return r.json()
 
@@ -56,9 +61,13 @@ if prompt := st.chat_input("Nhập tin nhắn…"):
                     "date": data.get("date"),
                     "trip_id": data.get("trip_id"),
                     "result": data.get("result"),
+                    "degradations": data.get("degradations"),
                 })
         st.session_state.messages.append(("assistant", reply))
     except requests.RequestException as e:
         with st.chat_message("assistant"):
             st.error(f"Lỗi gọi API: {e}\nKiểm tra API URL và uvicorn đang chạy?")
+    except RuntimeError as e:
+        with st.chat_message("assistant"):
+            st.warning(str(e))
 